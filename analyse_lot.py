@@ -0,0 +1,246 @@
+#!/usr/bin/python
+
+# Bibliothèques **************************************************
+import argparse               # Pour la lecture des arguments de la ligne de commande
+import csv                    # Pour l'écriture des résultats par image
+import json                   # Pour le manifeste des paramètres d'analyse des segments
+import logging                # Pour la gestion avancée des messages de log
+import multiprocessing        # Pour le contexte "spawn" des processus de travail
+import os                     # Pour les chemins et le renommage atomique des fichiers
+from concurrent.futures import ProcessPoolExecutor, as_completed  # Parallélisme par segments
+import cv2                    # Pour la lecture des vidéos
+
+# Configuration du logging ***************************************
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Constantes *****************************************************
+EXTENSIONS_VIDEO = ('.mp4', '.avi', '.mkv', '.mov')  # Extensions reconnues lors du parcours des répertoires
+DUREE_SEGMENT = 600.0  # Durée d'un segment de vidéo traité par un processus (en secondes), grande devant le préchauffage
+PRECHAUFFAGE = 60.0    # Historique (en secondes) analysé avant chaque segment, sans être écrit, pour les indicateurs
+MANIFESTE = 'parametres.json'  # Paramètres d'analyse des segments d'une vidéo, vérifiés à la reprise
+COMPLEXITE_LOT = 1    # model_complexity fixe des analyses par lot (pas de reconstruction de session en cours de segment)
+CHAMPS_RESULTAT = ['flexion_cou', 'flexion_cou_score', 'presence_personne', 'risk_zone', 'num_actions',
+                   'repetitivite_score', 'maintien_posture_score', 'recuperation_score', 'prehension_score']
+
+# Processus de travail *******************************************
+
+_pool_worker = None  # Réserve de sessions propre à chaque processus de travail
+_flux_worker = None  # Flux (session en mode suivi) utilisé par tous les segments du processus
+_complexite_worker = COMPLEXITE_LOT
+
+def init_worker(model_complexity=COMPLEXITE_LOT):
+    """
+    Initialise un processus de travail : MediaPipe n'est importé qu'ici, et la session en mode suivi
+    utilisée par les segments est chargée et préchauffée une seule fois pour tout le processus.
+    """
+    global _pool_worker, _flux_worker, _complexite_worker
+    from sessions_mediapipe import PoolSessions
+    _pool_worker = PoolSessions(taille_max=1)
+    _flux_worker = f"lot-{os.getpid()}"
+    _complexite_worker = model_complexity
+    _pool_worker.prechauffer(model_complexity=model_complexity, flux=_flux_worker)
+
+def analyser_segment(chemin_video, index_segment, debut, fin, fichier_segment, debut_historique=None, pas=1):
+    """
+    Analyse les images [debut, fin[ d'une vidéo et écrit les résultats dans `fichier_segment`.
+    Les images [debut_historique, debut[ sont analysées sans être écrites : elles alimentent l'historique
+    des indicateurs temporels, qui ne repart donc pas de zéro à la frontière du segment.
+    Le fichier n'apparaît qu'une fois complet (écriture dans un fichier temporaire puis renommage),
+    ce qui permet de reprendre un traitement interrompu en sautant les segments déjà présents.
+    """
+    from estimateur_posture import estimateur, creer_indicateurs
+    capture = cv2.VideoCapture(chemin_video)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    debut_historique = debut if debut_historique is None else debut_historique
+    capture.set(cv2.CAP_PROP_POS_FRAMES, debut_historique)
+    indicateurs = creer_indicateurs()  # Historique des indicateurs temporels, reconstruit depuis debut_historique
+    fichier_temporaire = f"{fichier_segment}.tmp"
+    nb_images = 0
+    try:
+        with open(fichier_temporaire, 'w', newline='') as fichier:
+            ecrivain = csv.writer(fichier)
+            for index_image in range(debut_historique, fin):
+                ok = capture.grab()
+                if not ok:
+                    break
+                if (index_image - debut) % pas:
+                    continue
+                ok, image = capture.retrieve()
+                if not ok:
+                    break
+                resultat = estimateur(image, pool=_pool_worker, flux=_flux_worker, indicateurs=indicateurs,
+                                      horodatage=index_image / fps, model_complexity=_complexite_worker)
+                if index_image < debut:
+                    continue  # Préchauffage des indicateurs : résultat non écrit
+                ecrivain.writerow([index_image, round(index_image / fps, 3)] + resultat.strip('_').split('_'))
+                nb_images += 1
+        os.replace(fichier_temporaire, fichier_segment)
+    finally:
+        capture.release()
+        _pool_worker.redemarrer(_flux_worker)  # Le segment suivant repart d'une détection complète
+        if os.path.exists(fichier_temporaire):
+            os.remove(fichier_temporaire)
+    return index_segment, nb_images
+
+# Fonctions du traitement par lot ********************************
+
+def lister_videos(chemins):
+    """
+    Retourne la liste triée des fichiers vidéo désignés par des fichiers ou des répertoires.
+    """
+    videos = []
+    for chemin in chemins:
+        if os.path.isdir(chemin):
+            for racine, _, fichiers in os.walk(chemin):
+                videos.extend(os.path.join(racine, f) for f in fichiers if f.lower().endswith(EXTENSIONS_VIDEO))
+        elif os.path.isfile(chemin):
+            videos.append(chemin)
+        else:
+            logging.warning(f"Chemin ignoré (introuvable): {chemin}")
+    return sorted(videos)
+
+def cles_videos(videos):
+    """
+    Associe à chaque vidéo son chemin relatif (sans extension) à la racine commune des vidéos du lot :
+    des fichiers de même nom dans des répertoires différents ne partagent pas leurs résultats.
+    """
+    if not videos:
+        return {}
+    chemins = [os.path.abspath(v) for v in videos]
+    racine = os.path.commonpath([os.path.dirname(c) for c in chemins])
+    return {video: os.path.splitext(os.path.relpath(chemin, racine))[0] for video, chemin in zip(videos, chemins)}
+
+def decouper_video(chemin_video, duree_segment, prechauffage=0.0):
+    """
+    Découpe une vidéo en segments temporels. Retourne la liste des (debut_historique, debut, fin)
+    en indices d'image, où [debut_historique, debut[ couvre les `prechauffage` secondes précédant le segment.
+    """
+    capture = cv2.VideoCapture(chemin_video)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        nb_images = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        capture.release()
+    taille = max(1, int(round(duree_segment * fps)))
+    historique = int(round(prechauffage * fps))
+    return [(max(0, debut - historique), debut, min(debut + taille, nb_images)) for debut in range(0, nb_images, taille)]
+
+def preparer_segments(repertoire_segments, parametres):
+    """
+    Prépare le répertoire des segments d'une vidéo pour les paramètres d'analyse `parametres`.
+    Les segments d'une exécution précédente ne sont conservés que si son manifeste porte les mêmes
+    paramètres ; sinon (ou sans manifeste) ils sont supprimés, pour ne pas mélanger deux réglages.
+    """
+    os.makedirs(repertoire_segments, exist_ok=True)
+    fichier_manifeste = os.path.join(repertoire_segments, MANIFESTE)
+    try:
+        with open(fichier_manifeste) as fichier:
+            if json.load(fichier) == parametres:
+                return
+    except (OSError, ValueError):
+        pass
+    anciens = [f for f in os.listdir(repertoire_segments) if f.startswith('segment_')]
+    if anciens:
+        logging.info(f"Paramètres modifiés, {len(anciens)} segment(s) à refaire: {repertoire_segments}")
+    for nom in anciens:
+        os.remove(os.path.join(repertoire_segments, nom))
+    fichier_temporaire = f"{fichier_manifeste}.tmp"
+    with open(fichier_temporaire, 'w') as fichier:
+        json.dump(parametres, fichier)
+    os.replace(fichier_temporaire, fichier_manifeste)
+
+def fusionner_segments(fichiers_segments, fichier_sortie):
+    """
+    Concatène, dans l'ordre, les résultats des segments d'une vidéo en un seul fichier CSV.
+    """
+    fichier_temporaire = f"{fichier_sortie}.tmp"
+    with open(fichier_temporaire, 'w', newline='') as sortie:
+        sortie.write(','.join(['index_image', 'temps_s'] + CHAMPS_RESULTAT) + '\n')
+        for fichier_segment in fichiers_segments:
+            with open(fichier_segment) as segment:
+                sortie.write(segment.read())
+    os.replace(fichier_temporaire, fichier_sortie)
+
+def analyser_lot(chemins, repertoire_sortie, duree_segment=DUREE_SEGMENT, nb_workers=None, pas=1,
+                 model_complexity=COMPLEXITE_LOT, prechauffage=PRECHAUFFAGE):
+    """
+    Analyse un lot de vidéos en parallèle, segment par segment, sur un pool de processus.
+    Chaque segment est précédé de `prechauffage` secondes analysées sans être écrites : avec la valeur
+    par défaut, la cadence (fenêtre de 60 s) est complète dès la première image du segment, mais les
+    pourcentages d'exposition (fenêtre de 600 s) ne portent que sur le préchauffage et le début du
+    segment ; `prechauffage=600` donne les mêmes scores qu'en direct, pour un coût d'analyse plus élevé.
+    Chaque vidéo produit un fichier <nom>.csv dans `repertoire_sortie`, où <nom> est son chemin relatif
+    à la racine commune des vidéos (voir cles_videos()) ; les résultats intermédiaires sont conservés
+    dans <nom>.segments/ pour permettre la reprise après un arrêt. Un segment n'est repris que s'il a
+    été produit avec les mêmes paramètres (voir preparer_segments()).
+    """
+    videos = lister_videos(chemins)
+    cles = cles_videos(videos)
+    os.makedirs(repertoire_sortie, exist_ok=True)
+    nb_workers = nb_workers or os.cpu_count() or 1
+    parametres = {'duree_segment': duree_segment, 'prechauffage': prechauffage, 'pas': pas,
+                  'model_complexity': model_complexity}
+
+    taches = []      # (chemin_video, index_segment, debut, fin, fichier_segment, debut_historique)
+    segments = {}    # chemin_video -> liste ordonnée des fichiers de segment
+    for chemin_video in videos:
+        repertoire_segments = os.path.join(repertoire_sortie, f"{cles[chemin_video]}.segments")
+        preparer_segments(repertoire_segments, parametres)
+        segments[chemin_video] = []
+        for index_segment, (debut_historique, debut, fin) in enumerate(decouper_video(chemin_video, duree_segment,
+                                                                                      prechauffage)):
+            fichier_segment = os.path.join(repertoire_segments, f"segment_{index_segment:05d}.csv")
+            segments[chemin_video].append(fichier_segment)
+            if os.path.exists(fichier_segment):
+                continue  # Segment déjà traité, avec les mêmes paramètres, lors d'une exécution précédente
+            taches.append((chemin_video, index_segment, debut, fin, fichier_segment, debut_historique))
+
+    nb_total = sum(len(f) for f in segments.values())
+    logging.info(f"{len(videos)} vidéo(s), {nb_total} segment(s), {len(taches)} à traiter sur {nb_workers} processus.")
+
+    erreurs = 0
+    if taches:
+        contexte = multiprocessing.get_context('spawn')  # MediaPipe ne supporte pas d'être hérité par fork
+        with ProcessPoolExecutor(max_workers=nb_workers, mp_context=contexte, initializer=init_worker,
+                                 initargs=(model_complexity,)) as executeur:
+            futures = {executeur.submit(analyser_segment, *tache, pas=pas): tache for tache in taches}
+            for numero, future in enumerate(as_completed(futures), start=1):
+                chemin_video, index_segment = futures[future][:2]
+                try:
+                    _, nb_images = future.result()
+                    logging.info(f"[{numero}/{len(taches)}] {chemin_video} segment {index_segment}: {nb_images} image(s).")
+                except Exception as e:
+                    erreurs += 1
+                    logging.error(f"analyser_segment() - {chemin_video} segment {index_segment} - Exception: {e}")
+
+    # Fusion, dans l'ordre, des vidéos dont tous les segments sont disponibles
+    for chemin_video, fichiers_segments in segments.items():
+        if all(os.path.exists(f) for f in fichiers_segments):
+            fusionner_segments(fichiers_segments, os.path.join(repertoire_sortie, f"{cles[chemin_video]}.csv"))
+        else:
+            logging.warning(f"Vidéo incomplète, fusion reportée à la prochaine exécution: {chemin_video}")
+    return erreurs
+
+# =======================================================================================================================
+#                                             *** PROGRAMME PRINCIPAL ***
+# =======================================================================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse de posture par lot sur des enregistrements vidéo.")
+    parser.add_argument('chemins', nargs='+', help="Fichiers vidéo ou répertoires à analyser")
+    parser.add_argument('-o', '--sortie', default='resultats', help="Répertoire des résultats (défaut: resultats)")
+    parser.add_argument('-s', '--duree-segment', type=float, default=DUREE_SEGMENT,
+                        help="Durée d'un segment en secondes (défaut: %(default)s)")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="Nombre de processus (défaut: nombre de cœurs)")
+    parser.add_argument('-p', '--pas', type=int, default=1, help="Analyser une image sur N (défaut: 1)")
+    parser.add_argument('-c', '--complexite', type=int, choices=(0, 1, 2), default=COMPLEXITE_LOT,
+                        help="model_complexity MediaPipe, fixe pour tout le lot (défaut: %(default)s)")
+    parser.add_argument('--prechauffage', type=float, default=PRECHAUFFAGE,
+                        help="Secondes analysées avant chaque segment pour l'historique des indicateurs "
+                             "(défaut: %(default)s ; 600 pour des scores identiques au direct)")
+    args = parser.parse_args()
+
+    nb_erreurs = analyser_lot(args.chemins, args.sortie, args.duree_segment, args.workers, args.pas,
+                              args.complexite, args.prechauffage)
+    raise SystemExit(1 if nb_erreurs else 0)
@@ -1,17 +1,17 @@
 import cv2
-from analyse_posture import estimateur
+from estimateur_posture import estimateur, dessiner_resultats
 
 # Charger une image depuis un fichier
 image = cv2.imread('chemin/vers/votre/image.jpg')
 
 # Vérifier que l'image a été correctement chargée
 if image is not None:
-    # Appeler la fonction estimateur
-    resultat = estimateur(image)
-    print("Résultat de l'analyse :", resultat)
-    # Afficher l'image avec les annotations
-    cv2.imshow('Analyse Posture', image)
+    # Appeler la fonction estimateur (résultat structuré pour pouvoir dessiner)
+    analyse = estimateur(image, details=True)
+    print("Résultat de l'analyse :", analyse['result'])
+    # Afficher l'image avec les annotations (dessinées à la demande, sur une copie)
+    cv2.imshow('Analyse Posture', dessiner_resultats(image, analyse))
     cv2.waitKey(0)
     cv2.destroyAllWindows()
 else:
-    print("Erreur : Impossible de charger l'image.")
\ No newline at end of file
+    print("Erreur : Impossible de charger l'image.")
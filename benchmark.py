@@ -0,0 +1,338 @@
+#!/usr/bin/python
+
+# Bibliothèques **************************************************
+import argparse               # Pour la lecture des arguments de la ligne de commande
+import json                   # Pour l'export des résultats
+import logging                # Pour la gestion avancée des messages de log
+import multiprocessing        # Un processus isolé par mesure, pour une mémoire crête non biaisée
+import os                     # Pour le parcours des fichiers d'entrée
+import resource               # Pour la mémoire résidente crête (ru_maxrss)
+import time                   # Horloge haute résolution pour les latences
+import cv2                    # Pour la lecture des images et vidéos enregistrées
+import numpy as np            # Pour les images synthétiques et les percentiles
+
+# Configuration du logging ***************************************
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Constantes *****************************************************
+PROFILS_BENCHMARK = ('pose', 'pose_mains', 'holistique')
+RESOLUTION_DEFAUT = (480, 640)  # (hauteur, largeur) du flux des postes
+NB_IMAGES_DEFAUT = 50
+
+# Fonctions utilitaires ******************************************
+
+def rss_courant_mo():
+    """
+    Mémoire résidente actuelle du processus, en Mo (Linux).
+    """
+    with open('/proc/self/statm') as fichier:
+        return int(fichier.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+def rss_crete_mo():
+    """
+    Mémoire résidente crête du processus depuis son démarrage, en Mo (ru_maxrss est en Ko sous Linux).
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def percentiles_ms(durees):
+    """
+    Résumé statistique d'une liste de durées en secondes : p50/p95/p99, moyenne et images/s.
+    """
+    durees = np.asarray(durees, dtype=np.float64)
+    if durees.size == 0:
+        return {'nb': 0}
+    return {
+        'nb': int(durees.size),
+        'p50_ms': float(np.percentile(durees, 50) * 1e3),
+        'p95_ms': float(np.percentile(durees, 95) * 1e3),
+        'p99_ms': float(np.percentile(durees, 99) * 1e3),
+        'moyenne_ms': float(durees.mean() * 1e3),
+        'images_par_s': float(1.0 / durees.mean()) if durees.mean() > 0 else 0.0,
+    }
+
+def images_synthetiques(nb, resolution=RESOLUTION_DEFAUT, graine=0):
+    """
+    Générer `nb` images BGR synthétiques (fond bruité et silhouette schématique en mouvement).
+    MediaPipe n'y détecte en général personne : ces images mesurent le chemin "sans personne".
+    Pour le chemin complet, utiliser des images ou des vidéos enregistrées.
+    """
+    generateur = np.random.default_rng(graine)
+    hauteur, largeur = resolution
+    fond = generateur.integers(60, 120, size=(hauteur, largeur, 3), dtype=np.uint8)
+    images = []
+    for i in range(nb):
+        image = fond.copy()
+        cx, cy = largeur // 2 + int(20 * np.sin(i / 5)), hauteur // 3
+        unite = hauteur // 10
+        cv2.circle(image, (cx, cy), unite // 2, (200, 180, 160), -1)                   # Tête
+        cv2.line(image, (cx, cy + unite // 2), (cx, cy + 3 * unite), (200, 180, 160), unite // 3)  # Tronc
+        cv2.line(image, (cx, cy + unite), (cx - unite, cy + 2 * unite), (200, 180, 160), unite // 4)
+        cv2.line(image, (cx, cy + unite), (cx + unite, cy + unite + int(unite * np.cos(i / 3))), (200, 180, 160), unite // 4)
+        images.append(image)
+    return images
+
+def charger_images(chemins, nb_max=NB_IMAGES_DEFAUT):
+    """
+    Charger au plus `nb_max` images BGR depuis des fichiers image ou vidéo (ou des répertoires).
+    """
+    images = []
+    fichiers = []
+    for chemin in chemins:
+        if os.path.isdir(chemin):
+            fichiers.extend(sorted(os.path.join(chemin, f) for f in os.listdir(chemin)))
+        else:
+            fichiers.append(chemin)
+    for fichier in fichiers:
+        if len(images) >= nb_max:
+            break
+        image = cv2.imread(fichier)
+        if image is not None:
+            images.append(image)
+            continue
+        capture = cv2.VideoCapture(fichier)
+        while len(images) < nb_max:
+            ok, image = capture.read()
+            if not ok:
+                break
+            images.append(image)
+        capture.release()
+    return images
+
+# Comparaison des profils d'inférence ****************************
+
+def mesurer_profil(profil, images, model_complexity=1):
+    """
+    Mesurer un profil d'inférence dans le processus courant : temps de chargement du modèle,
+    latence de l'inférence seule (mode suivi, comme sur un poste) et mémoire résidente.
+    """
+    rss_depart = rss_courant_mo()
+    from sessions_mediapipe import PoolSessions  # Import de MediaPipe compté dans la mesure
+    rss_import = rss_courant_mo()
+    pool = PoolSessions(profil=profil, taille_max=1)
+    debut = time.perf_counter()
+    pool.prechauffer(model_complexity, flux='benchmark')
+    duree_chargement = time.perf_counter() - debut
+    rss_modele = rss_courant_mo()
+
+    durees = []
+    nb_detections = 0
+    with pool.session(model_complexity, flux='benchmark') as session:
+        for image in images:
+            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            debut = time.perf_counter()
+            resultats = session.process(image_rgb)
+            durees.append(time.perf_counter() - debut)
+            nb_detections += resultats.pose_landmarks is not None
+    pool.close()
+    return {
+        'profil': profil,
+        'model_complexity': model_complexity,
+        'chargement_s': duree_chargement,
+        'inference': percentiles_ms(durees),
+        'taux_detection': nb_detections / len(images) if images else 0.0,
+        'rss_import_mediapipe_mo': rss_import - rss_depart,
+        'rss_modele_mo': rss_modele - rss_import,
+        'rss_crete_mo': rss_crete_mo(),
+    }
+
+def comparer_profils(images, profils=PROFILS_BENCHMARK, model_complexity=1):
+    """
+    Mesurer chaque profil dans un processus neuf, pour que la mémoire d'un profil
+    ne soit pas comptée dans celle du suivant. Retourne la liste des mesures.
+    """
+    contexte = multiprocessing.get_context('spawn')
+    mesures = []
+    for profil in profils:
+        with contexte.Pool(1) as processus:
+            mesure = processus.apply(mesurer_profil, (profil, images, model_complexity))
+        logging.info(f"Profil {profil}: p50={mesure['inference'].get('p50_ms', 0):.1f} ms, "
+                     f"p95={mesure['inference'].get('p95_ms', 0):.1f} ms, "
+                     f"modèle={mesure['rss_modele_mo']:.0f} Mo, crête={mesure['rss_crete_mo']:.0f} Mo")
+        mesures.append(mesure)
+    return mesures
+
+# Mesure par étage de l'estimateur *******************************
+
+def landmarks_synthetiques():
+    """
+    Landmarks (33, 4) d'une personne debout face à la caméra, tous visibles : utilisés pour mesurer
+    les étages qui suivent l'inférence quand MediaPipe ne détecte personne (images synthétiques).
+    """
+    landmarks = np.tile(np.array([0.5, 0.5, 0.0, 1.0], dtype=np.float32), (33, 1))
+    points = {0: (0.50, 0.20), 7: (0.46, 0.21), 8: (0.54, 0.21), 11: (0.42, 0.32), 12: (0.58, 0.32),
+              13: (0.38, 0.45), 14: (0.62, 0.45), 15: (0.40, 0.56), 16: (0.60, 0.56),
+              23: (0.45, 0.60), 24: (0.55, 0.60)}
+    for index, (x, y) in points.items():
+        landmarks[index, :2] = (x, y)
+    return landmarks
+
+def mesurer_etapes(images, profil='pose', model_complexity=1, nom=''):
+    """
+    Mesurer dans le processus courant chaque étage de estimateur() sur une série d'images BGR :
+    prétraitement, qualité d'image, choix du model_complexity, inférence, extraction des landmarks,
+    angles, classification, indicateurs, actions techniques et dessin, puis estimateur() complet.
+    Les étages postérieurs à l'inférence utilisent landmarks_synthetiques() si personne n'est détecté.
+    """
+    import estimateur_posture as ep                    # Import de MediaPipe hors des mesures par image
+    from controle_qualite import ControleurComplexite
+    from suivi_roi import SuiviROI
+
+    debut = time.perf_counter()
+    pool = ep.PoolSessions(profil=profil, taille_max=1)
+    pool.prechauffer(model_complexity, flux='etapes', resolution=images[0].shape[:2])
+    duree_chargement = time.perf_counter() - debut
+
+    etapes = {nom_etape: [] for nom_etape in (
+        'preprocess_image', 'calculate_image_quality', 'decision_complexite', 'inference', 'landmarks_array',
+        'extract_keypoints', 'calculer_angles', 'classify_angles', 'indicateurs', 'detect_actions', 'dessin')}
+    controleur = ControleurComplexite()
+    indicateurs = ep.creer_indicateurs()
+    reference = landmarks_synthetiques()
+    nb_detections = 0
+
+    def dessiner(image, landmarks, actions):
+        # Rendu optionnel (démo, audit), hors du chemin d'analyse d'estimateur()
+        ep.dessiner_resultats(image, dict(ep.resultat_vide(1), landmarks=landmarks, actions=actions))
+
+    def chronometrer(nom_etape, fonction, *args, **kwargs):
+        debut = time.perf_counter()
+        resultat = fonction(*args, **kwargs)
+        etapes[nom_etape].append(time.perf_counter() - debut)
+        return resultat
+
+    with pool.session(model_complexity, flux='etapes') as session:
+        for i, image in enumerate(images):
+            hauteur, largeur = image.shape[:2]
+            pretraitee = chronometrer('preprocess_image', ep.preprocess_image, image)
+            chronometrer('calculate_image_quality', ep.calculate_image_quality, pretraitee)
+            chronometrer('decision_complexite', controleur.decider, image)
+            resultats = chronometrer('inference', lambda: session.process(cv2.cvtColor(pretraitee, cv2.COLOR_BGR2RGB)))
+            if resultats.pose_landmarks is not None:
+                nb_detections += 1
+                landmarks = chronometrer('landmarks_array', lambda: SuiviROI.remapper(
+                    ep.landmarks_array(resultats.pose_landmarks), None, largeur, hauteur))
+                chronometrer('extract_keypoints', ep.extract_keypoints, resultats.pose_landmarks.landmark)
+            else:
+                landmarks = reference
+            angles = chronometrer('calculer_angles', ep.calculer_angles, landmarks, largeur / hauteur)[0]
+            zones = chronometrer('classify_angles', ep.classify_angles, angles)
+            chronometrer('indicateurs', indicateurs.maj, i * 0.25, angles, zones)
+            actions = chronometrer('detect_actions', ep.detect_actions_techniques_in_image, image)
+            chronometrer('dessin', dessiner, image, landmarks, actions)
+    pool.reset('etapes')
+
+    # estimateur() complet, avec sa propre session (mode suivi, préchauffée) au model_complexity mesuré :
+    # la règle de qualité ne peut pas changer de complexité, ni donc reconstruire la session, en cours de série
+    complet = []
+    indicateurs = ep.creer_indicateurs()
+    pool.prechauffer(model_complexity, flux='complet', resolution=images[0].shape[:2])
+    for i, image in enumerate(images):
+        debut = time.perf_counter()
+        ep.estimateur(image, pool=pool, flux='complet', indicateurs=indicateurs, horodatage=i * 0.25,
+                      model_complexity=model_complexity)
+        complet.append(time.perf_counter() - debut)
+    pool.close()
+
+    return {
+        'nom': nom,
+        'resolution': list(images[0].shape[:2]),
+        'profil': profil,
+        'model_complexity': model_complexity,
+        'chargement_s': duree_chargement,
+        'taux_detection': nb_detections / len(images),
+        'etapes': {nom_etape: percentiles_ms(durees) for nom_etape, durees in etapes.items()},
+        'estimateur': percentiles_ms(complet),
+        'rss_crete_mo': rss_crete_mo(),
+    }
+
+def suite_etapes(series, profil='pose', model_complexity=1):
+    """
+    Mesurer chaque série d'images {nom: images} dans un processus neuf (mémoire crête propre à la série).
+    """
+    contexte = multiprocessing.get_context('spawn')
+    mesures = []
+    for nom, images in series.items():
+        with contexte.Pool(1) as processus:
+            mesure = processus.apply(mesurer_etapes, (images, profil, model_complexity, nom))
+        logging.info(f"Série {nom} {mesure['resolution']}: estimateur p50={mesure['estimateur'].get('p50_ms', 0):.1f} ms "
+                     f"({mesure['estimateur'].get('images_par_s', 0):.1f} images/s), "
+                     f"inférence p50={mesure['etapes']['inference'].get('p50_ms', 0):.1f} ms, "
+                     f"crête={mesure['rss_crete_mo']:.0f} Mo")
+        mesures.append(mesure)
+    return mesures
+
+def comparer_reference(resultats, reference, tolerance=0.2, plancher_ms=0.5):
+    """
+    Comparer des résultats à une exécution de référence (même format JSON).
+    Une régression est un p50 ou p95 plus lent de plus de `tolerance` (relatif) et de `plancher_ms`
+    (absolu, pour ignorer le bruit des étages très courts). Retourne la liste des régressions.
+    """
+    def indexer(mesures):
+        valeurs = {}
+        for mesure in mesures.get('etapes', []):
+            for nom_etape, stats in dict(mesure['etapes'], estimateur=mesure['estimateur']).items():
+                valeurs[(mesure['nom'], nom_etape)] = stats
+        for mesure in mesures.get('profils', []):
+            valeurs[(f"profil_{mesure['profil']}", 'inference')] = mesure['inference']
+        return valeurs
+
+    actuelles, anciennes = indexer(resultats), indexer(reference)
+    regressions = []
+    for cle, stats in actuelles.items():
+        ancienne = anciennes.get(cle)
+        if not ancienne or not stats.get('nb') or not ancienne.get('nb'):
+            continue
+        for percentile in ('p50_ms', 'p95_ms'):
+            avant, apres = ancienne[percentile], stats[percentile]
+            if apres > avant * (1 + tolerance) and apres - avant > plancher_ms:
+                regressions.append({'serie': cle[0], 'etape': cle[1], 'percentile': percentile,
+                                    'reference_ms': round(avant, 3), 'mesure_ms': round(apres, 3)})
+    return regressions
+
+# =======================================================================================================================
+#                                             *** PROGRAMME PRINCIPAL ***
+# =======================================================================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesure de latence et de mémoire de l'estimateur (CPU, sans caméra).")
+    parser.add_argument('--mode', default='tout', choices=('profils', 'etapes', 'tout'),
+                        help="Comparaison des profils, mesure par étage, ou les deux (défaut: %(default)s)")
+    parser.add_argument('--profils', nargs='+', default=list(PROFILS_BENCHMARK), choices=PROFILS_BENCHMARK)
+    parser.add_argument('--profil', default='pose', choices=PROFILS_BENCHMARK, help="Profil de la mesure par étage")
+    parser.add_argument('--resolutions', nargs='+', default=['640x480'], help="Images synthétiques LxH (ex. 320x240 1280x720)")
+    parser.add_argument('--entrees', nargs='*', default=[], help="Images, vidéos ou répertoires enregistrés")
+    parser.add_argument('--nb', type=int, default=NB_IMAGES_DEFAUT, help="Nombre d'images (défaut: %(default)s)")
+    parser.add_argument('--complexite', type=int, default=1, choices=(0, 1, 2), help="model_complexity")
+    parser.add_argument('--json', default=None, help="Fichier de sortie JSON")
+    parser.add_argument('--reference', default=None, help="JSON d'une exécution de référence à comparer")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Ralentissement relatif toléré (défaut: %(default)s)")
+    args = parser.parse_args()
+
+    series = {}
+    for resolution in args.resolutions:
+        largeur, hauteur = (int(v) for v in resolution.lower().split('x'))
+        series[f"synthetique_{resolution}"] = images_synthetiques(args.nb, (hauteur, largeur))
+    if args.entrees:
+        series['enregistrees'] = charger_images(args.entrees, args.nb)
+
+    resultats = {}
+    if args.mode in ('profils', 'tout'):
+        images = series['enregistrees'] if args.entrees else next(iter(series.values()))
+        resultats['profils'] = comparer_profils(images, args.profils, args.complexite)
+    if args.mode in ('etapes', 'tout'):
+        resultats['etapes'] = suite_etapes(series, args.profil, args.complexite)
+    sortie = json.dumps(resultats, indent=2, ensure_ascii=False)
+    if args.json:
+        with open(args.json, 'w') as fichier:
+            fichier.write(sortie)
+    print(sortie)
+
+    if args.reference:
+        with open(args.reference) as fichier:
+            regressions = comparer_reference(resultats, json.load(fichier), args.tolerance)
+        for regression in regressions:
+            logging.warning(f"Régression {regression['serie']} / {regression['etape']} {regression['percentile']}: "
+                            f"{regression['reference_ms']} ms -> {regression['mesure_ms']} ms")
+        if regressions:
+            raise SystemExit(1)
+        logging.info("Aucune régression par rapport à la référence.")
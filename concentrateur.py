@@ -0,0 +1,345 @@
+#!/usr/bin/python
+
+# Bibliothèques **************************************************
+import argparse               # Pour la lecture des arguments de la ligne de commande
+import asyncio                # Serveur asynchrone : un seul processus pour tous les postes
+import json                   # Format structuré des messages et instantanés
+import logging                # Pour la gestion avancée des messages de log
+import os                     # Pour l'écriture atomique de l'instantané
+import time                   # Horloges (murale pour les équipes, monotone pour l'inactivité)
+from datetime import datetime  # Heure des derniers messages
+from transport import LecteurTrames, PORT_CONCENTRATEUR  # Trames émises par les postes
+from transport import ECART_MAX, MOTIF_HERITE, debut_equipe, decoder_message, equipe, message_herite  # Format des messages
+
+# Configuration du logging ***************************************
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Constantes *****************************************************
+PORT_ETAT = 50001  # Port HTTP de consultation de l'instantané agrégé
+CHAMPS_SCORES = ['repetitivite_score', 'maintien_posture_score', 'recuperation_score', 'prehension_score']
+DELAI_INACTIVITE = 15.0  # Secondes sans changement de mdv au-delà desquelles un poste est déclaré inactif
+
+# Agrégation *****************************************************
+
+class CumulEquipe:
+    """
+    Cumuls d'exposition d'un poste sur une équipe, mis à jour en O(1) à chaque message :
+    temps observé, temps de présence, temps par zone de risque et par score de flexion du cou,
+    moyennes pondérées par le temps du nombre d'actions techniques par image et des scores temporels
+    (une grandeur par image n'est jamais sommée sur les messages : le résultat dépendrait de leur fréquence).
+    Les versions de message reçues sont conservées : le sens de flexion_cou change avec la version
+    (voir transport.VERSION_MESSAGE), et le temps mesuré par rapport à la verticale de l'image est compté à part.
+    """
+
+    def __init__(self, debut=None):
+        self.debut = debut                                  # Début de l'équipe (epoch), pour l'ordre des équipes
+        self.nb_messages = 0
+        self.duree = 0.0
+        self.duree_presence = 0.0
+        self.duree_zones = [0.0, 0.0, 0.0, 0.0]             # risk_zone 0 (non classé) à 3 (rouge)
+        self.duree_flexion_cou = [0.0, 0.0, 0.0, 0.0]       # flexion_cou_score 0 à 3
+        self.somme_actions = 0.0                            # Pondérée par la durée de présence
+        self.somme_scores = [0.0] * len(CHAMPS_SCORES)      # Pondérées par la durée de présence
+        self.max_scores = [0] * len(CHAMPS_SCORES)
+        self.versions = set()                               # Versions de message reçues (sens de flexion_cou)
+        self.duree_cou_verticale = 0.0                      # Présence avec le cou mesuré sur la verticale de l'image
+
+    def ajouter(self, resultat, duree, version=1, cou_verticale=0):
+        self.nb_messages += 1
+        self.duree += duree
+        self.versions.add(version)
+        if not resultat['presence_personne']:
+            return
+        self.duree_presence += duree
+        if cou_verticale:
+            self.duree_cou_verticale += duree
+        self.duree_zones[min(max(resultat['risk_zone'], 0), 3)] += duree
+        self.duree_flexion_cou[min(max(resultat['flexion_cou_score'], 0), 3)] += duree
+        self.somme_actions += resultat['num_actions'] * duree
+        for i, champ in enumerate(CHAMPS_SCORES):
+            self.somme_scores[i] += resultat[champ] * duree
+            self.max_scores[i] = max(self.max_scores[i], resultat[champ])
+
+    def resume(self):
+        presence = self.duree_presence
+        return {
+            'messages': self.nb_messages,
+            'duree_s': round(self.duree, 1),
+            'presence_pct': round(100.0 * presence / self.duree, 1) if self.duree else 0.0,
+            'zones_pct': [round(100.0 * d / presence, 1) if presence else 0.0 for d in self.duree_zones],
+            'flexion_cou_pct': [round(100.0 * d / presence, 1) if presence else 0.0 for d in self.duree_flexion_cou],
+            'cou_verticale_pct': round(100.0 * self.duree_cou_verticale / presence, 1) if presence else 0.0,
+            'versions_message': sorted(self.versions),
+            'actions_moyen': round(self.somme_actions / presence, 1) if presence else 0.0,
+            'scores_moyens': {champ: round(s / presence, 2) if presence else 0.0
+                              for champ, s in zip(CHAMPS_SCORES, self.somme_scores)},
+            'scores_max': dict(zip(CHAMPS_SCORES, self.max_scores)),
+        }
+
+class EtatPoste:
+    """
+    État glissant d'un poste : dernier message, battement de cœur (compteur mdv) et cumuls par équipe.
+    Un poste est inactif si son compteur mdv n'a pas changé depuis `delai_inactivite` secondes,
+    qu'il continue ou non d'envoyer des messages (application figée mais connexion ouverte).
+    """
+
+    def __init__(self, poste, delai_inactivite=DELAI_INACTIVITE, nb_equipes=6):
+        self.poste = poste
+        self.delai_inactivite = delai_inactivite
+        self.nb_equipes = nb_equipes        # Nombre d'équipes conservées en mémoire
+        self.dernier = None                 # Dernier message décodé
+        self.t_dernier = None               # Heure (epoch) du dernier message
+        self.mdv = None
+        self.t_battement = None             # Instant (monotone) du dernier changement de mdv
+        self.inactif = False
+        self.nb_messages = 0
+        self.nb_doublons = 0                # Messages au mdv inchangé
+        self.equipes = {}                   # clé d'équipe -> CumulEquipe (les plus anciennes évincées en premier)
+
+    def maj(self, message, t, maintenant):
+        self.nb_messages += 1
+        if message['mdv'] != self.mdv or self.t_battement is None:
+            self.mdv = message['mdv']
+            self.t_battement = maintenant
+            if self.inactif:
+                logging.info(f"Poste {self.poste} de nouveau actif.")
+            self.inactif = False
+        else:
+            self.nb_doublons += 1
+        duree = 0.0 if self.t_dernier is None else min(max(t - self.t_dernier, 0.0), ECART_MAX)
+        self.dernier = message
+        self.t_dernier = t
+        cle = equipe(t)
+        cumul = self.equipes.get(cle)
+        if cumul is None:
+            cumul = self.equipes[cle] = CumulEquipe(debut_equipe(t)[1])
+            # Éviction par heure de début réelle (l'ordre des clés ne suit pas celui des équipes d'une journée)
+            for ancienne in sorted(self.equipes, key=lambda c: self.equipes[c].debut)[:-self.nb_equipes]:
+                del self.equipes[ancienne]
+        cumul.ajouter(message['resultat'], duree, message['version'], message['cou_verticale'])
+
+    def verifier(self, maintenant):
+        """
+        Mettre à jour l'indicateur d'inactivité ; retourne True si le poste vient de devenir inactif.
+        """
+        if self.inactif or self.t_battement is None:
+            return False
+        if maintenant - self.t_battement > self.delai_inactivite:
+            self.inactif = True
+            return True
+        return False
+
+    def resume(self):
+        return {
+            'poste': self.poste,
+            'inactif': self.inactif,
+            'mdv': self.mdv,
+            'dernier_message': datetime.fromtimestamp(self.t_dernier).isoformat(timespec='seconds')
+                               if self.t_dernier else None,
+            'app': self.dernier['app'] if self.dernier else None,
+            'camera': self.dernier['camera'] if self.dernier else None,
+            'resultat': self.dernier['resultat'] if self.dernier else None,
+            'version': self.dernier['version'] if self.dernier else None,
+            'cou_verticale': self.dernier['cou_verticale'] if self.dernier else None,
+            'messages': self.nb_messages,
+            'doublons_mdv': self.nb_doublons,
+            'equipes': {cle: cumul.resume() for cle, cumul in self.equipes.items()},
+        }
+
+# Serveur ********************************************************
+
+class Concentrateur:
+    """
+    Réception des messages de tous les postes dans une seule boucle asyncio.
+
+    Chaque connexion est lue par une coroutine : le premier octet distingue les postes tramés
+    (transport.py : longueur sur 4 octets, donc un premier octet nul) des postes hérités qui envoient
+    les chaînes brutes, redécoupées ici au mieux selon leur motif. Le décodage et la mise à jour
+    de l'état sont en O(1) par message, sans I/O : un seul processus suffit pour des milliers
+    de messages par seconde. L'instantané agrégé est servi en JSON sur `port_etat` (HTTP GET /,
+    ou /postes/<numéro>) et peut être écrit périodiquement dans `fichier_instantane`.
+    """
+
+    def __init__(self, hote='0.0.0.0', port=PORT_CONCENTRATEUR, port_etat=PORT_ETAT,
+                 delai_inactivite=DELAI_INACTIVITE, fichier_instantane=None, periode_instantane=60.0):
+        self.hote = hote
+        self.port = port
+        self.port_etat = port_etat
+        self.delai_inactivite = delai_inactivite
+        self.fichier_instantane = fichier_instantane
+        self.periode_instantane = periode_instantane
+        self.postes = {}                    # numéro de poste -> EtatPoste
+        self.nb_messages = 0
+        self.nb_invalides = 0
+        self.nb_connexions = 0
+        self.t_demarrage = time.time()
+        self._serveurs = []
+        self._connexions = {}               # Coroutine de lecture -> connexion de poste ouverte
+        self._surveillance = None
+
+    def traiter(self, charge, t=None):
+        """
+        Décoder et intégrer un message (bytes). Retourne le message décodé, ou None s'il est invalide.
+        """
+        try:
+            message = decoder_message(charge)
+        except (ValueError, KeyError, TypeError) as e:
+            self.nb_invalides += 1
+            logging.debug(f"Message ignoré: {e}")
+            return None
+        self._integrer(message, t)
+        return message
+
+    def _integrer(self, message, t=None):
+        self.nb_messages += 1
+        poste = self.postes.get(message['poste'])
+        if poste is None:
+            poste = self.postes[message['poste']] = EtatPoste(message['poste'], self.delai_inactivite)
+            logging.info(f"Nouveau poste: {message['poste']}")
+        t = message['t'] or t or time.time()
+        poste.maj(message, t, time.monotonic())
+
+    def _traiter_herite(self, tampon):
+        """
+        Extraire les messages hérités complets d'un tampon d'octets non tramés ; retourne le reste.
+        """
+        fin = 0
+        for correspondance in MOTIF_HERITE.finditer(tampon):
+            if correspondance.start() != fin:
+                self.nb_invalides += 1  # Octets non reconnus entre deux messages
+            self._integrer(message_herite(correspondance))
+            fin = correspondance.end()
+        return tampon[fin:]
+
+    async def _connexion_poste(self, lecteur, ecrivain):
+        pair = ecrivain.get_extra_info('peername')
+        self.nb_connexions += 1
+        self._connexions[asyncio.current_task()] = ecrivain
+        logging.info(f"Connexion de {pair}")
+        try:
+            donnees = await lecteur.read(65536)
+            if donnees[:1] == b'\x00':
+                trames = LecteurTrames()
+                while donnees:
+                    t = time.time()
+                    for charge in trames.alimenter(donnees):
+                        self.traiter(charge, t)
+                    donnees = await lecteur.read(65536)
+            else:
+                tampon = b''
+                while donnees:
+                    tampon = self._traiter_herite(tampon + donnees)[-256:]
+                    donnees = await lecteur.read(65536)
+        except (ConnectionError, ValueError) as e:
+            logging.warning(f"Connexion {pair} interrompue: {e}")
+        finally:
+            self._connexions.pop(asyncio.current_task(), None)
+            ecrivain.close()
+            logging.info(f"Déconnexion de {pair}")
+
+    def instantane(self, poste=None):
+        """
+        Instantané agrégé : état de chaque poste (ou d'un seul) et cumuls par équipe.
+        """
+        if poste is not None:
+            etat = self.postes.get(poste)
+            return etat.resume() if etat is not None else None
+        return {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'equipe': equipe(time.time()),
+            'messages': self.nb_messages,
+            'invalides': self.nb_invalides,
+            'connexions': self.nb_connexions,
+            'debit_moyen': round(self.nb_messages / max(time.time() - self.t_demarrage, 1.0), 1),
+            'postes_inactifs': sorted(p for p, e in self.postes.items() if e.inactif),
+            'postes': {p: e.resume() for p, e in sorted(self.postes.items())},
+        }
+
+    async def _connexion_etat(self, lecteur, ecrivain):
+        try:
+            requete = await asyncio.wait_for(lecteur.readline(), timeout=5.0)
+            chemin = requete.split()[1].decode() if len(requete.split()) > 1 else '/'
+            morceaux = [m for m in chemin.split('/') if m]
+            if len(morceaux) == 2 and morceaux[0] == 'postes':
+                corps = self.instantane(morceaux[1])
+            else:
+                corps = self.instantane()
+            statut = b'200 OK' if corps is not None else b'404 Not Found'
+            contenu = json.dumps(corps, ensure_ascii=False).encode()
+            ecrivain.write(b'HTTP/1.0 ' + statut + b'\r\nContent-Type: application/json\r\n'
+                           b'Content-Length: ' + str(len(contenu)).encode() + b'\r\n\r\n' + contenu)
+            await ecrivain.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logging.debug(f"Requête d'état interrompue: {e}")
+        finally:
+            ecrivain.close()
+
+    def ecrire_instantane(self):
+        fichier_temporaire = f"{self.fichier_instantane}.tmp"
+        with open(fichier_temporaire, 'w') as fichier:
+            json.dump(self.instantane(), fichier, ensure_ascii=False, indent=1)
+        os.replace(fichier_temporaire, self.fichier_instantane)
+
+    async def _surveiller(self):
+        """
+        Détection des postes inactifs (chaque seconde) et écriture périodique de l'instantané.
+        """
+        derniere_ecriture = time.monotonic()
+        while True:
+            await asyncio.sleep(1.0)
+            maintenant = time.monotonic()
+            for etat in self.postes.values():
+                if etat.verifier(maintenant):
+                    logging.warning(f"Poste {etat.poste} inactif: mdv figé à {etat.mdv} "
+                                    f"depuis plus de {self.delai_inactivite:.0f} s.")
+            if self.fichier_instantane and maintenant - derniere_ecriture >= self.periode_instantane:
+                self.ecrire_instantane()
+                derniere_ecriture = maintenant
+
+    async def demarrer(self):
+        self._serveurs.append(await asyncio.start_server(self._connexion_poste, self.hote, self.port))
+        if self.port_etat is not None:
+            self._serveurs.append(await asyncio.start_server(self._connexion_etat, self.hote, self.port_etat))
+        self._surveillance = asyncio.ensure_future(self._surveiller())
+        logging.info(f"Concentrateur en écoute sur {self.hote}:{self.port} (état sur le port {self.port_etat}).")
+
+    async def arreter(self):
+        self._surveillance.cancel()
+        for serveur in self._serveurs:
+            serveur.close()
+        connexions = dict(self._connexions)
+        for ecrivain in connexions.values():
+            ecrivain.close()  # Fin de lecture pour les coroutines des postes encore connectés
+        await asyncio.gather(*connexions, return_exceptions=True)
+        for serveur in self._serveurs:
+            await serveur.wait_closed()
+        self._serveurs = []
+        if self.fichier_instantane:
+            self.ecrire_instantane()
+
+    async def executer(self):
+        await self.demarrer()
+        try:
+            await asyncio.Event().wait()  # Jusqu'à l'interruption
+        finally:
+            await self.arreter()
+
+# =======================================================================================================================
+#                                             *** PROGRAMME PRINCIPAL ***
+# =======================================================================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concentrateur : réception et agrégation des messages des postes.")
+    parser.add_argument('--hote', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=PORT_CONCENTRATEUR, help="Port des postes (défaut: %(default)s)")
+    parser.add_argument('--port-etat', type=int, default=PORT_ETAT, help="Port HTTP de l'instantané (défaut: %(default)s)")
+    parser.add_argument('--delai-inactivite', type=float, default=DELAI_INACTIVITE,
+                        help="Secondes sans changement de mdv avant alerte (défaut: %(default)s)")
+    parser.add_argument('--instantane', default=None, help="Fichier JSON de l'instantané, réécrit périodiquement")
+    args = parser.parse_args()
+
+    concentrateur = Concentrateur(args.hote, args.port, args.port_etat, args.delai_inactivite, args.instantane)
+    try:
+        asyncio.run(concentrateur.executer())
+    except KeyboardInterrupt:
+        logging.info("Arrêt du concentrateur.")
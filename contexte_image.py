@@ -0,0 +1,65 @@
+import threading              # Contexte propre à chaque thread d'analyse
+import cv2                    # Conversion en niveaux de gris dans un tampon réutilisé
+import numpy as np            # Réserves de mémoire des tampons
+
+# CONTEXTE D'IMAGE ------------------------------------------------------------------------------------------------------------
+
+class ContexteImage:
+    """
+    Tampons de travail réutilisés d'une image à la suivante par le prétraitement, la mesure de qualité
+    et la détection des actions : les appels OpenCV y écrivent leur résultat (paramètre `dst=`)
+    au lieu d'allouer une nouvelle image à chaque appel.
+
+    Chaque tampon nommé est une réserve à une dimension, agrandie seulement quand une image plus grande
+    se présente ; tampon() en retourne une vue contiguë de la forme demandée. Une ROI de taille variable
+    ou un changement de résolution vers le bas ne provoquent donc aucune allocation.
+    Le contenu d'un tampon n'est valable que jusqu'à l'image suivante, et un contexte ne doit servir
+    qu'à un seul thread à la fois (voir contexte_thread()).
+    """
+
+    def __init__(self):
+        self._reserves = {}           # (nom, dtype) -> tableau 1D
+        self.nb_allocations = 0
+
+    def tampon(self, nom, forme, dtype=np.uint8):
+        """
+        Vue contiguë de forme `forme` sur la réserve `nom` (contenu non initialisé).
+        """
+        dtype = np.dtype(dtype)
+        taille = 1
+        for dimension in forme:
+            taille *= dimension
+        reserve = self._reserves.get((nom, dtype))
+        if reserve is None or reserve.size < taille:
+            reserve = self._reserves[(nom, dtype)] = np.empty(taille, dtype=dtype)
+            self.nb_allocations += 1
+        return reserve[:taille].reshape(forme)
+
+    def gris(self, image, rgb=False):
+        """
+        Image en niveaux de gris (tampon 'gris'), calculée une fois par image et partagée entre les étapes.
+        Une image déjà en niveaux de gris est retournée telle quelle.
+        """
+        if image.ndim == 2:
+            return image
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY if rgb else cv2.COLOR_BGR2GRAY,
+                            dst=self.tampon('gris', image.shape[:2]))
+
+    def statistiques(self):
+        return {
+            'tampons': len(self._reserves),
+            'octets': sum(reserve.nbytes for reserve in self._reserves.values()),
+            'allocations': self.nb_allocations,
+        }
+
+_local = threading.local()
+
+def contexte_thread():
+    """
+    Contexte du thread appelant, créé à sa première utilisation : un thread n'analysant qu'une image
+    à la fois, ses tampons peuvent être réutilisés sans verrou quel que soit le flux analysé.
+    """
+    contexte = getattr(_local, 'contexte', None)
+    if contexte is None:
+        contexte = _local.contexte = ContexteImage()
+    return contexte
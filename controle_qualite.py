@@ -0,0 +1,92 @@
+import logging                # Journalisation de chaque décision, pour le réglage sur site
+import time                   # Horloge monotone pour le temps de maintien minimal
+import cv2                    # Réduction de l'image et Laplacien
+import numpy as np            # Statistiques sur la vignette
+
+# CONTRÔLEUR DE COMPLEXITÉ ----------------------------------------------------------------------------------------------------
+
+class ControleurComplexite:
+    """
+    Choix adaptatif du model_complexity MediaPipe, image après image.
+
+    La qualité (luminosité et netteté) est estimée sur une vignette en niveaux de gris, puis lissée
+    dans le temps (moyenne exponentielle). Le passage de 1 à 2 se fait au-dessus de `seuil_haut` et
+    le retour de 2 à 1 sous `seuil_bas` (hystérésis). Aucun changement n'a lieu moins de `duree_min`
+    secondes après le précédent. Si un budget de latence est fixé, le contrôleur descend à
+    la complexité 0 dès que le temps d'analyse lissé dépasse ce budget. Il remonte quand ce temps
+    repasse sous `marge_retour` × budget.
+    """
+
+    def __init__(self, taille=(80, 60), lissage=0.2, seuil_haut=0.55, seuil_bas=0.45, duree_min=10.0,
+                 budget_latence=None, lissage_latence=0.3, marge_retour=0.7, complexite_initiale=1):
+        self.taille = taille                      # Taille (largeur, hauteur) de la vignette d'estimation
+        self.lissage = lissage                    # Poids de la nouvelle mesure dans la moyenne exponentielle
+        self.seuil_haut = seuil_haut
+        self.seuil_bas = seuil_bas
+        self.duree_min = duree_min                # Temps de maintien minimal (s) entre deux changements
+        self.budget_latence = budget_latence      # Temps d'analyse cible (s), None pour l'ignorer
+        self.lissage_latence = lissage_latence
+        self.marge_retour = marge_retour
+        self.complexite = complexite_initiale
+        self.qualite = None                       # Qualité lissée
+        self.latence = None                       # Temps d'analyse lissé
+        self._t_changement = None
+
+    def mesurer(self, image, rgb=False):
+        """
+        Estimer (luminosité, netteté, qualité) sur une vignette en niveaux de gris.
+        La qualité combine les deux mesures comme calculate_image_quality(), entre 0 et 1.
+        """
+        vignette = cv2.resize(image, self.taille, interpolation=cv2.INTER_AREA)
+        if vignette.ndim == 3:
+            vignette = cv2.cvtColor(vignette, cv2.COLOR_RGB2GRAY if rgb else cv2.COLOR_BGR2GRAY)
+        luminosite = float(np.mean(vignette)) / 255.0
+        nettete = float(cv2.Laplacian(vignette, cv2.CV_32F).var()) / 100.0
+        qualite = min(1.0, max(0.0, 0.5 * luminosite + 0.5 * (nettete / (nettete + 1))))
+        return luminosite, nettete, qualite
+
+    def observer_latence(self, duree):
+        """
+        Signaler la durée (en secondes) de la dernière analyse.
+        """
+        if self.latence is None:
+            self.latence = duree
+        else:
+            self.latence += self.lissage_latence * (duree - self.latence)
+
+    def decider(self, image, rgb=False, t=None):
+        """
+        Retourner le model_complexity à utiliser pour cette image.
+        """
+        t = time.monotonic() if t is None else t
+        luminosite, nettete, qualite = self.mesurer(image, rgb=rgb)
+        self.qualite = qualite if self.qualite is None else self.qualite + self.lissage * (qualite - self.qualite)
+        if self._t_changement is None:
+            self._t_changement = t
+
+        surcharge = self.budget_latence is not None and self.latence is not None and self.latence > self.budget_latence
+        if surcharge:
+            cible, raison = 0, "latence au-dessus du budget"
+        elif self.complexite == 0 and self.budget_latence is not None and self.latence is not None \
+                and self.latence > self.marge_retour * self.budget_latence:
+            cible, raison = 0, "latence pas encore revenue sous la marge de retour"
+        elif self.complexite <= 1 and self.qualite > self.seuil_haut:
+            cible, raison = 2, "qualité au-dessus du seuil haut"
+        elif self.complexite >= 2 and self.qualite < self.seuil_bas:
+            cible, raison = 1, "qualité sous le seuil bas"
+        else:
+            cible, raison = max(self.complexite, 1), "dans la bande d'hystérésis"
+
+        if cible != self.complexite and t - self._t_changement < self.duree_min:
+            raison += f" (changement différé, maintien minimal {self.duree_min:g} s)"
+            cible = self.complexite
+        if cible != self.complexite:
+            logging.info(f"ControleurComplexite - complexité {self.complexite} -> {cible}: {raison}")
+            self.complexite = cible
+            self._t_changement = t
+
+        latence = f"{self.latence:.3f}" if self.latence is not None else "-"
+        logging.debug(f"ControleurComplexite - luminosité={luminosite:.3f} netteté={nettete:.2f} "
+                      f"qualité={qualite:.3f} lissée={self.qualite:.3f} latence={latence} "
+                      f"complexité={self.complexite} ({raison})")
+        return self.complexite
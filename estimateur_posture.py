@@ -1,12 +1,48 @@
+import logging                # Messages par image au niveau DEBUG (pas de sortie console dans le chemin critique)
+import threading              # Verrou de création des réserves de sessions par profil
+import time                   # Horloge monotone pour l'horodatage des indicateurs temporels
 import numpy as np            # Importation de la bibliothèque NumPy pour les opérations mathématiques avancées
 import cv2                    # Importation de la bibliothèque OpenCV pour le traitement d'images
 import mediapipe as mp        # Importation de MediaPipe pour la détection et le suivi des poses humaines
+from sessions_mediapipe import PoolSessions, PROFILS  # Réserve de sessions gardées chaudes entre les images
+from moteur_angles import calculer_angles, angles_au_sommet, ARTICULATIONS, INDEX_ARTICULATION, SEUIL_VISIBILITE  # Calcul vectorisé des angles
+from tables_zones import compiler_seuils_articulations, compiler_seuils_pourcentage  # Tables de seuils compilées
+from controle_qualite import ControleurComplexite  # Choix adaptatif du model_complexity (hystérésis, latence)
+from prediction_keypoints import PredicteurKeypoints  # Landmarks prédits entre deux inférences
+from journal_landmarks import JournalLandmarks  # Journal binaire des landmarks, angles et zones
+from porte_mouvement import PorteMouvement  # Réutilisation du dernier résultat quand la scène est statique
+from suivi_roi import SuiviROI  # Recadrage de l'analyse autour de la personne suivie
+from metriques import REGISTRE  # Compteurs et histogrammes de latence (inactifs par défaut)
+from indicateurs import IndicateursGlissants  # Indicateurs temporels (répétitivité, maintien, récupération...)
+from contexte_image import ContexteImage, contexte_thread  # Tampons de travail réutilisés d'une image à l'autre
 
 # VARIABLES GLOBALES ----------------------------------------------------------------------------------------------------------
 
 # Initialisation des modules MediaPipe pour la détection des poses et le dessin des landmarks
 mp_holistic = mp.solutions.holistic          # Module Holistic pour la détection de la posture complète
-mp_drawing = mp.solutions.drawing_utils      # Utilitaires pour le dessin des points clés (landmarks) détectés
+
+# Profil d'inférence utilisé quand l'appelant n'en précise pas ('pose', 'pose_mains' ou 'holistique')
+PROFIL_DEFAUT = 'holistique'
+
+# Réserve partagée de sessions Holistic : le graphe et le modèle ne sont chargés qu'une fois par model_complexity
+pool_sessions = PoolSessions(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+# Réserves partagées par profil d'inférence, créées à la première utilisation
+pools_profils = {'holistique': pool_sessions}
+_verrou_pools = threading.Lock()
+
+# Paramètres de la détection des actions techniques (voir detect_actions_techniques_in_image)
+ECHELLE_ACTIONS = 0.5        # Facteur de réduction de l'image avant la recherche des pics
+RAYON_NMS_ACTIONS = 2        # Rayon (en pixels réduits) de la suppression des non-maxima
+K_MAX_ACTIONS = 256          # Nombre maximal de coordonnées de pics retournées (le comptage n'est pas plafonné)
+FACTEUR_ACTIONS = 3.43       # Rapport ancien comptage / pics après NMS, mesuré avec calibrer_actions() sur des images de poste
+NOYAU_VOISINS_ACTIONS = np.array([[0, 1, 0], [1, 0, 1], [0, 1, 0]], dtype=np.uint8)  # 4 voisins, sans le centre
+NOYAU_NMS_ACTIONS = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * RAYON_NMS_ACTIONS + 1, 2 * RAYON_NMS_ACTIONS + 1))
+
+# Paramètres de la détection de la préhension sur les landmarks des mains (voir detecter_prehension)
+PHALANGES_DOIGTS = [6, 10, 14, 18]  # Articulation intermédiaire (PIP) de l'index, du majeur, de l'annulaire, de l'auriculaire
+EXTREMITES_DOIGTS = [8, 12, 16, 20]  # Extrémité de ces quatre doigts
+DOIGTS_FLECHIS_PREHENSION = 3       # Doigts fléchis à partir desquels une main est considérée fermée sur un objet
 
 # SEUILS DE CLASSIFICATION ERGONOMIQUE ----------------------------------------------------------------------------------------
 
@@ -73,16 +109,51 @@ effort_prehension_thresholds = {
     'rouge': (0, 25)               # Moins de 25% du temps (effort élevé)
 }
 
+# TABLES DE SEUILS COMPILÉES --------------------------------------------------------------------------------------------------
+
+# Compilées une seule fois au chargement (et validées : recouvrements, trous, plages placeholder)
+tables_angles = compiler_seuils_articulations(thresholds, ARTICULATIONS)  # Une table par colonne de la matrice d'angles
+tables_repetitivite = compiler_seuils_pourcentage(repetitivite_thresholds, 'repetitivite')
+tables_maintien_posture = compiler_seuils_pourcentage(maintien_posture_thresholds, 'maintien_posture')
+tables_recuperation_musculaire = compiler_seuils_pourcentage(recuperation_musculaire_thresholds, 'recuperation_musculaire')
+tables_effort_prehension = compiler_seuils_pourcentage(effort_prehension_thresholds, 'effort_prehension')
+
+# Tables utilisées pour convertir en scores les pourcentages de temps des indicateurs temporels
+tables_scores = {
+    'repetitivite': tables_repetitivite,
+    'maintien_posture': tables_maintien_posture,
+    'recuperation': tables_recuperation_musculaire,
+    'prehension': tables_effort_prehension,
+}
+
+# MÉTRIQUES -------------------------------------------------------------------------------------------------------------------
+
+images_total = REGISTRE.compteur('images_total', "Images passées à estimateur()")
+images_reutilisees = REGISTRE.compteur('images_reutilisees_total', "Images servies par la porte de mouvement")
+images_predites = REGISTRE.compteur('images_predites_total', "Images analysées sur des landmarks prédits")
+images_sans_personne = REGISTRE.compteur('images_sans_personne_total', "Inférences sans personne détectée")
+images_incompletes = REGISTRE.compteur('images_incompletes_total', "Personnes détectées sans flexion du cou calculable")
+erreurs_analyse = REGISTRE.compteur('erreurs_analyse_total', "Exceptions pendant l'analyse d'une image")
+latence_pretraitement = REGISTRE.histogramme('pretraitement_secondes', "Recadrage, choix de la complexité et prétraitement")
+latence_inference = REGISTRE.histogramme('inference_secondes', "Inférence MediaPipe")
+latence_analyse = REGISTRE.histogramme('analyse_secondes', "Landmarks, actions, angles, zones, indicateurs et dessin")
+latence_estimateur = REGISTRE.histogramme('estimateur_secondes', "Durée totale de estimateur() hors porte de mouvement")
+
 # FONCTIONS UTILITAIRES -------------------------------------------------------------------------------------------------------
 
-def calculate_image_quality(image):
+def calculate_image_quality(image, contexte=None, gris=None):
     """
     Calculer la qualité de l'image en fonction de la luminosité et de la netteté.
     Utilisé pour ajuster la complexité du modèle MediaPipe.
+    Si `gris` (niveaux de gris de `image`) est fourni, il n'est pas recalculé ; les images intermédiaires
+    sont écrites dans les tampons de `contexte` (ContexteImage).
     """
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)  # Conversion en niveaux de gris
-    brightness = np.mean(gray) / 255.0              # Calcul de la luminosité moyenne normalisée (entre 0 et 1)
-    sharpness = cv2.Laplacian(gray, cv2.CV_64F).var() / 100.0  # Calcul de la netteté (variance du Laplacien)
+    contexte = ContexteImage() if contexte is None else contexte
+    gray = contexte.gris(image) if gris is None else gris  # Conversion en niveaux de gris
+    brightness = cv2.mean(gray)[0] / 255.0          # Calcul de la luminosité moyenne normalisée (entre 0 et 1)
+    # Calcul de la netteté (variance du Laplacien, exacte en float32 pour une image 8 bits)
+    laplacien = cv2.Laplacian(gray, cv2.CV_32F, dst=contexte.tampon('laplacien', gray.shape, np.float32))
+    sharpness = float(cv2.meanStdDev(laplacien)[1][0, 0]) ** 2 / 100.0
     # Combinaison de la luminosité et de la netteté pour obtenir un score de qualité entre 0 et 1
     quality = min(1.0, max(0.0, 0.5 * brightness + 0.5 * (sharpness / (sharpness + 1))))
     return quality
@@ -91,38 +162,37 @@ def calculate_angle(a, b, c):
     """
     Calculer l'angle en degrés formé par trois points a, b, c.
     L'angle est au point b entre les segments ba et bc.
+    Version scalaire conservée pour compatibilité : l'analyse utilise calculer_angles() (moteur_angles).
     """
-    ba = np.array(a) - np.array(b)  # Vecteur ba (de b à a)
-    bc = np.array(c) - np.array(b)  # Vecteur bc (de b à c)
-    # Calcul du produit scalaire et des normes des vecteurs
-    dot_product = np.dot(ba, bc)
-    norm_ba = np.linalg.norm(ba)
-    norm_bc = np.linalg.norm(bc)
-    # Vérification pour éviter une division par zéro
-    if norm_ba == 0 or norm_bc == 0:
-        return 0
-    # Calcul du cosinus de l'angle
-    cos_angle = dot_product / (norm_ba * norm_bc)
-    # Limitation du cosinus pour éviter les erreurs numériques
-    cos_angle = np.clip(cos_angle, -1.0, 1.0)
-    # Conversion en angle en degrés
-    angle = int(np.degrees(np.arccos(cos_angle)))
-    return angle
-
-def preprocess_image(image):
+    angle = angles_au_sommet(np.asarray(a, dtype=float), np.asarray(b, dtype=float), np.asarray(c, dtype=float))
+    # Segment de longueur nulle : angle indéfini, 0 par convention
+    return 0 if np.isnan(angle) else int(angle)
+
+def egaliser_flouter(gray, contexte):
+    """
+    Étapes en niveaux de gris du prétraitement, écrites dans les tampons de `contexte`.
+    """
+    equalized = cv2.equalizeHist(gray, dst=contexte.tampon('egalisee', gray.shape))  # Égalisation de l'histogramme pour améliorer le contraste
+    return cv2.GaussianBlur(equalized, (5, 5), 0, dst=contexte.tampon('floue', gray.shape))  # Flou gaussien pour réduire le bruit
+
+def preprocess_image(image, rgb=False, contexte=None, gris=None):
     """
     Prétraiter l'image pour améliorer la détection des points clés.
     Applique une égalisation d'histogramme et un flou gaussien.
+    `rgb` indique que l'image est en ordre RGB (flux OpenNI) plutôt qu'en BGR (OpenCV).
+    Avec `contexte` (ContexteImage), le résultat est un tampon du contexte, valable jusqu'à l'image suivante ;
+    `gris` évite de recalculer les niveaux de gris de `image`.
     """
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)        # Conversion en niveaux de gris
-    equalized = cv2.equalizeHist(gray)                    # Égalisation de l'histogramme pour améliorer le contraste
-    blurred = cv2.GaussianBlur(equalized, (5, 5), 0)      # Application d'un flou gaussien pour réduire le bruit
-    processed_image = cv2.cvtColor(blurred, cv2.COLOR_GRAY2BGR)  # Conversion en BGR pour compatibilité avec MediaPipe
-    return processed_image
+    contexte = ContexteImage() if contexte is None else contexte
+    gray = contexte.gris(image, rgb=rgb) if gris is None else gris  # Conversion en niveaux de gris
+    blurred = egaliser_flouter(gray, contexte)
+    # Conversion en BGR pour compatibilité avec MediaPipe
+    return cv2.cvtColor(blurred, cv2.COLOR_GRAY2BGR, dst=contexte.tampon('pretraitee', gray.shape + (3,)))
 
 def classify_angle(angle, thresholds):
     """
     Classer un angle donné dans une zone de risque (1: vert, 2: orange, 3: rouge) selon les seuils fournis.
+    Version scalaire de référence : pour une matrice d'angles, utiliser classify_angles().
     """
     if thresholds['green'][0] <= angle <= thresholds['green'][1]:
         return 1  # Zone verte : angle dans la plage acceptable
@@ -133,6 +203,13 @@ def classify_angle(angle, thresholds):
     else:
         return 0  # Non classé : angle hors des plages définies
 
+def classify_angles(angles):
+    """
+    Classer en une seule recherche une matrice d'angles (images, articulations) issue de calculer_angles().
+    Retourne une matrice uint8 de codes de zone (0: non classé, 1: vert, 2: orange, 3: rouge).
+    """
+    return tables_angles.classer(angles)
+
 def extract_keypoints(landmarks):
     """
     Extraire les points clés nécessaires des landmarks détectés par MediaPipe.
@@ -169,6 +246,50 @@ def extract_keypoints(landmarks):
 
     return keypoints
 
+def pool_profil(profil):
+    """
+    Retourner la réserve de sessions partagée du profil d'inférence demandé (voir PROFILS).
+    """
+    with _verrou_pools:
+        if profil not in pools_profils:
+            pools_profils[profil] = PoolSessions(min_detection_confidence=0.5, min_tracking_confidence=0.5, profil=profil)
+        return pools_profils[profil]
+
+def creer_indicateurs(**options):
+    """
+    Créer l'état des indicateurs temporels d'un flux (un par caméra), à passer à estimateur().
+    Les options sont transmises à IndicateursGlissants (fenetre, fenetre_cadence, duree_maintien...).
+    La récupération ne porte que sur les articulations dont la zone verte est une vraie plage
+    (pas sur un placeholder comme (0, 0)).
+    """
+    options.setdefault('articulations_recuperation',
+                       [thresholds[cle]['green'][0] < thresholds[cle]['green'][1] for _, cle in ARTICULATIONS])
+    return IndicateursGlissants(len(ARTICULATIONS), tables_scores, **options)
+
+def detecter_prehension(resultats):
+    """
+    Effort de préhension détecté sur les landmarks des mains (profils 'pose_mains' et 'holistique') :
+    une main est fermée sur un objet quand au moins DOIGTS_FLECHIS_PREHENSION de ses quatre doigts longs
+    sont fléchis (extrémité plus proche du poignet que l'articulation intermédiaire).
+    Retourne True ou False, ou None si aucune main n'est visible (profil 'pose', mains hors champ).
+    """
+    mains = [getattr(resultats, nom, None) for nom in ('left_hand_landmarks', 'right_hand_landmarks')]
+    mains = [main for main in mains if main is not None]
+    if not mains:
+        return None
+    for main in mains:
+        points = np.array([(p.x, p.y, p.z) for p in main.landmark], dtype=np.float32)
+        distances = np.linalg.norm(points - points[0], axis=1)  # Distance au poignet (landmark 0)
+        if np.count_nonzero(distances[EXTREMITES_DOIGTS] < distances[PHALANGES_DOIGTS]) >= DOIGTS_FLECHIS_PREHENSION:
+            return True
+    return False
+
+def landmarks_array(pose_landmarks):
+    """
+    Convertir les landmarks de pose MediaPipe en tableau float32 (33, 4) : x, y, z, visibilité.
+    """
+    return np.array([(l.x, l.y, l.z, l.visibility) for l in pose_landmarks.landmark], dtype=np.float32)
+
 def display_results(image, presence_personne, ergonomic_indicator, risk_zone, result):
     """
     Afficher les résultats de l'analyse sur l'image en superposant du texte.
@@ -183,121 +304,400 @@ def display_results(image, presence_personne, ergonomic_indicator, risk_zone, re
     cv2.putText(image, f'Résultat: {result}', (10, 110),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
 
-def detect_actions_techniques_in_image(image):
+def detect_actions_techniques_in_image(image, rgb=False, echelle=ECHELLE_ACTIONS, rayon_nms=RAYON_NMS_ACTIONS,
+                                       k_max=K_MAX_ACTIONS, calibration=False, contexte=None, gris=None,
+                                       avec_nombre=False):
     """
     Détecter des "actions techniques" dans l'image.
     Cette fonction est simplifiée et sert de placeholder pour une implémentation plus avancée.
-    """
-    if len(image.shape) == 3:
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)  # Conversion en niveaux de gris si nécessaire
 
-    image_normalized = image / 255.0  # Normalisation des valeurs de pixel entre 0 et 1
-
-    actions_mask = np.zeros_like(image_normalized)  # Création d'un masque vide pour les actions techniques
-
-    # Détection des pixels locaux maximaux (pic) en comparant avec les voisins
-    actions_mask[1:-1, 1:-1] = (
-        (image_normalized[1:-1, 1:-1] > image_normalized[:-2, 1:-1]) &  # Supérieur au pixel au-dessus
-        (image_normalized[1:-1, 1:-1] > image_normalized[2:, 1:-1]) &    # Supérieur au pixel en dessous
-        (image_normalized[1:-1, 1:-1] > image_normalized[1:-1, :-2]) &   # Supérieur au pixel à gauche
-        (image_normalized[1:-1, 1:-1] > image_normalized[1:-1, 2:])      # Supérieur au pixel à droite
-    )
-
-    actions = np.argwhere(actions_mask)  # Extraction des coordonnées des actions techniques détectées
-    actions = [(i, j) for i, j in actions]  # Conversion en liste de tuples (ligne, colonne)
+    Un pixel est un pic s'il est strictement supérieur à ses 4 voisins (haut, bas, gauche, droite).
+    Le calcul reste en uint8 : le maximum des voisins est obtenu par une dilatation.
+    Par défaut, l'image est réduite d'un facteur `echelle`. Seuls les pics maximaux dans un voisinage
+    de rayon `rayon_nms` sont conservés (suppression des non-maxima), et au plus `k_max` pics,
+    les plus intenses, sont retournés.
+    Retourne un tableau int32 (N, 2) de coordonnées (ligne, colonne) dans l'image d'origine ; avec
+    `avec_nombre=True`, retourne (coordonnées, nombre de pics) où le nombre est compté après la
+    suppression des non-maxima et avant le plafond `k_max`, qui ne limite que les coordonnées.
+
+    Mode calibration (`calibration=True`) : pleine résolution, sans suppression ni plafond.
+    Il reproduit exactement le comptage de l'ancienne implémentation. calibrer_actions() compare les
+    deux modes sur des images du poste pour régler FACTEUR_ACTIONS, afin que num_actions reste comparable.
+
+    Les images intermédiaires sont écrites dans les tampons de `contexte` (ContexteImage) ;
+    `gris` (niveaux de gris de `image`) évite de recalculer la conversion.
+    """
+    contexte = ContexteImage() if contexte is None else contexte
+    image = contexte.gris(image, rgb=rgb) if gris is None else gris  # Conversion en niveaux de gris si nécessaire
+    if calibration:
+        echelle, rayon_nms, k_max = 1.0, 0, None
+
+    hauteur, largeur = image.shape[:2]
+    if echelle < 1.0:
+        # Réduction de l'image (moyenne par zone) avant la recherche des pics
+        taille = (max(3, int(largeur * echelle)), max(3, int(hauteur * echelle)))
+        image = cv2.resize(image, taille, dst=contexte.tampon('actions_reduite', (taille[1], taille[0])),
+                           interpolation=cv2.INTER_AREA)
+
+    # Maximum des 4 voisins de chaque pixel, puis comparaison stricte (masque 0 / 255)
+    voisins = cv2.dilate(image, NOYAU_VOISINS_ACTIONS, dst=contexte.tampon('actions_voisins', image.shape))
+    actions_mask = cv2.compare(image, voisins, cv2.CMP_GT, dst=contexte.tampon('actions_masque', image.shape))
+    actions_mask[0, :] = actions_mask[-1, :] = 0  # Les bords ne sont pas considérés (voisinage incomplet)
+    actions_mask[:, 0] = actions_mask[:, -1] = 0
+
+    # Suppression des non-maxima : seul le pic le plus haut d'un voisinage est conservé
+    if rayon_nms > 0:
+        taille = 2 * rayon_nms + 1
+        noyau = NOYAU_NMS_ACTIONS if rayon_nms == RAYON_NMS_ACTIONS else \
+            cv2.getStructuringElement(cv2.MORPH_RECT, (taille, taille))
+        maxima = cv2.dilate(image, noyau, dst=contexte.tampon('actions_voisins', image.shape))
+        cv2.bitwise_and(actions_mask, cv2.compare(image, maxima, cv2.CMP_GE, dst=maxima), dst=actions_mask)
+
+    actions = np.argwhere(actions_mask).astype(np.int32)  # Coordonnées (ligne, colonne) des pics
+    nb_pics = len(actions)
+    if k_max is not None and len(actions) > k_max:
+        # Conservation des k_max pics les plus intenses
+        intensites = image[actions[:, 0], actions[:, 1]]
+        actions = actions[np.argpartition(intensites, len(actions) - k_max)[-k_max:]]
+
+    if image.shape[0] != hauteur or image.shape[1] != largeur:
+        # Retour aux coordonnées de l'image d'origine
+        actions = (actions * [hauteur / image.shape[0], largeur / image.shape[1]]).astype(np.int32)
+    return (actions, nb_pics) if avec_nombre else actions
+
+def calibrer_actions(images, rgb=False, **options):
+    """
+    Comparer, sur un échantillon d'images, le nombre de pics du mode calibration (ancien comptage)
+    et celui du mode rapide avec les `options` données (nombre de pics avant le plafond `k_max`).
+    Retourne le rapport moyen ancien / rapide, à reporter dans FACTEUR_ACTIONS.
+    """
+    rapports = []
+    for image in images:
+        nb_rapide = detect_actions_techniques_in_image(image, rgb=rgb, avec_nombre=True, **options)[1]
+        nb_reference = len(detect_actions_techniques_in_image(image, rgb=rgb, calibration=True))
+        if nb_rapide:
+            rapports.append(nb_reference / nb_rapide)
+    return float(np.mean(rapports)) if rapports else 1.0
+
+def analyser_landmarks(landmarks, rapport_aspect=1.0, indicateurs=None, horodatage=None, num_actions=0,
+                       presence_personne=1, prehension=None):
+    """
+    Calculer angles, zones et scores à partir de landmarks normalisés de l'image entière (33, 2|3|4).
+    Utilisé pour les landmarks issus de l'inférence comme pour des landmarks prédits ou rejoués.
+    `prehension` : signal de detecter_prehension() (None si les mains ne sont pas analysées).
+    Retourne un dictionnaire (angles, zones, scores et chaîne `result`), ou None si la flexion du cou
+    ne peut pas être calculée.
+    """
+    # Calcul en une passe de tous les angles articulaires (NaN si non calculable)
+    angles, cou_verticale = calculer_angles(landmarks, rapport_aspect=rapport_aspect, avec_reference=True)
+    angles, cou_verticale = angles[0], int(cou_verticale[0])
+
+    # Angle de flexion du cou : inclinaison de la tête par rapport à l'axe du tronc
+    if np.isnan(angles[INDEX_ARTICULATION['flexion_cou']]):
+        return None
+    flexion_cou = int(angles[INDEX_ARTICULATION['flexion_cou']])
+
+    # Classification de toutes les articulations selon les tables de seuils compilées ;
+    # le cou est classé sur la valeur entière transmise dans le message
+    angles_classes = angles.copy()
+    angles_classes[INDEX_ARTICULATION['flexion_cou']] = flexion_cou
+    zones = classify_angles(angles_classes)
+    flexion_cou_score = int(zones[INDEX_ARTICULATION['flexion_cou']])
+
+    # Calcul de l'indicateur ergonomique basé sur le score de flexion du cou
+    ergonomic_indicator = flexion_cou_score
+
+    # Détermination de la zone de risque globale (zone du cou ; les autres articulations sont dans `zones`)
+    risk_zone = 1 if ergonomic_indicator == 1 else 2 if ergonomic_indicator == 2 else 3
+
+    analyse = {
+        'angles': angles,
+        'zones': zones,
+        'flexion_cou': flexion_cou,
+        'flexion_cou_score': flexion_cou_score,
+        'cou_verticale': cou_verticale,  # 1 : cou mesuré par rapport à la verticale de l'image (hanches absentes)
+        'presence_personne': presence_personne,
+        'ergonomic_indicator': ergonomic_indicator,
+        'risk_zone': risk_zone,
+        'num_actions': num_actions,
+        'prehension': prehension,
+    }
+    # Scores des facteurs ergonomiques temporels (1 par défaut, sans historique)
+    analyse.update(scores_temporels(indicateurs, horodatage, angles, zones, prehension))
+    analyse['result'] = chaine_resultat(analyse)
+    return analyse
 
-    return actions
+def scores_temporels(indicateurs, horodatage, angles, zones, prehension=None):
+    """
+    Intégrer une image (angles, zones et signal de préhension) dans `indicateurs` à l'instant `horodatage`
+    et retourner les scores
+    temporels, avec la cadence par articulation une fois la fenêtre de cadence remplie (None avant).
+    Sans `indicateurs`, les scores valent 1.
+    """
+    scores = {
+        'cycles_par_minute': None,       # Cadence par articulation, connue une fois la fenêtre de cadence remplie
+        'repetitivite_score': 1,         # Score de répétitivité des mouvements
+        'maintien_posture_score': 1,     # Score de maintien des postures à risque
+        'recuperation_score': 1,         # Score de récupération musculaire
+        'prehension_score': 1,           # Score de l'effort de préhension
+    }
+    if indicateurs is not None:
+        valeurs = indicateurs.maj(time.monotonic() if horodatage is None else horodatage, angles, zones, prehension)
+        if valeurs['cadence_complete']:
+            scores['cycles_par_minute'] = valeurs['cycles_par_minute']
+        for champ in ('repetitivite_score', 'maintien_posture_score', 'recuperation_score', 'prehension_score'):
+            scores[champ] = valeurs[champ]
+    return scores
+
+def chaine_resultat(analyse):
+    """
+    Chaîne de résultats transmise au concentrateur, construite à partir des valeurs calculées.
+    """
+    return (f"_{analyse['flexion_cou']}_{analyse['flexion_cou_score']}_{analyse['presence_personne']}"
+            f"_{analyse['risk_zone']}_{analyse['num_actions']}_{analyse['repetitivite_score']}"
+            f"_{analyse['maintien_posture_score']}_{analyse['recuperation_score']}_{analyse['prehension_score']}")
 
-def estimateur(image):
+def reutiliser_resultat(analyse, indicateurs=None, horodatage=None, journal=None):
+    """
+    Résultat d'une image servie par la porte de mouvement (scène statique) : la posture du dernier résultat
+    est supposée maintenue. Ses angles et zones alimentent les indicateurs à l'instant de cette image,
+    pour que le temps d'exposition et de maintien continue de courir, et sont enregistrés dans le journal
+    comme des landmarks obtenus sans inférence. Le dernier résultat n'est pas modifié.
+    """
+    if journal is not None:
+        presence = 0 if analyse.get('landmarks') is None else 1
+        journal.ajouter(analyse.get('landmarks'), analyse.get('angles'), analyse.get('zones'), t=horodatage,
+                        presence=presence, predit=bool(presence))
+    if indicateurs is None or analyse.get('angles') is None:
+        return analyse
+    analyse = dict(analyse, **scores_temporels(indicateurs, horodatage, analyse['angles'], analyse['zones'],
+                                               analyse.get('prehension')))
+    analyse['result'] = chaine_resultat(analyse)
+    return analyse
+
+def estimateur(image, pool=None, flux=None, rgb=False, indicateurs=None, horodatage=None, controleur=None,
+               profil=None, roi=None, porte=None, predicteur=None, journal=None, details=False, contexte=None,
+               model_complexity=None):
     """
     Fonction principale pour analyser la posture dans une image donnée.
+    La session MediaPipe est empruntée à `pool`, ou à défaut à la réserve partagée du profil
+    d'inférence `profil` ('pose', 'pose_mains' ou 'holistique' ; PROFIL_DEFAUT si non précisé).
+    Si `flux` identifie une caméra, la session dédiée à ce flux est réutilisée en mode suivi
+    d'une image à la suivante ; sinon chaque image est traitée indépendamment.
+    L'image n'est jamais modifiée : elle peut être une vue directe sur le tampon de la caméra
+    (ordre RGB, `rgb=True`) sans copie préalable.
+    Si `indicateurs` (voir creer_indicateurs()) est fourni, les scores de répétitivité, de maintien,
+    de récupération et de préhension sont calculés sur l'historique du flux, à l'instant `horodatage`
+    (en secondes, horloge monotone par défaut) ; sinon ils restent à 1. Les postes passent l'heure
+    de capture (secondes depuis l'epoch), qui horodate aussi les enregistrements du journal.
+    Si `controleur` (ControleurComplexite, un par flux) est fourni, il choisit le model_complexity
+    à partir d'une vignette de l'image et du temps d'analyse ; sinon le choix se fait image par image.
+    Un `model_complexity` fixé (0, 1 ou 2) l'emporte sur les deux : la session d'un flux n'est alors
+    jamais reconstruite pour un changement de complexité.
+    Si `roi` (SuiviROI, un par flux) est fourni, le prétraitement et l'inférence ne portent que sur
+    la région entourant la personne à l'image précédente ; les landmarks sont ramenés dans l'image entière.
+    Si `porte` (PorteMouvement, une par flux) est fournie et que la scène n'a pas bougé depuis la dernière
+    inférence, le dernier résultat est réutilisé sans prétraitement ni inférence ; ses angles et zones
+    alimentent les indicateurs à l'instant de l'image (voir reutiliser_resultat()).
+    Si `predicteur` (PredicteurKeypoints, un par flux) est fourni, l'inférence n'est faite que lorsqu'il
+    la demande ; sur les autres images, les angles et indicateurs sont calculés sur les landmarks prédits.
+    Si `journal` (JournalLandmarks, un par flux) est fourni, les landmarks, angles et zones de chaque image
+    analysée ou prédite y sont enregistrés (voir journal_landmarks.rejouer()).
+    Avec `details=True`, le résultat structuré (dictionnaire, voir resultat_vide()) est retourné
+    à la place de la chaîne ; il contient les landmarks et actions nécessaires à dessiner_resultats().
+    Aucun dessin n'est fait ici.
+    Les images intermédiaires (niveaux de gris, prétraitement, détection des actions) sont écrites dans
+    les tampons de `contexte` (ContexteImage), par défaut celui du thread appelant : en régime établi,
+    l'analyse d'une image n'alloue plus d'image complète.
     """
-    image_original = image.copy()  # Copie de l'image originale pour la détection des actions techniques
-    image = preprocess_image(image)  # Prétraitement de l'image pour améliorer la détection
-
-    # Calcul de la qualité de l'image pour ajuster la complexité du modèle
-    image_quality = calculate_image_quality(image)
-    model_complexity = 1 if image_quality < 0.5 else 2  # Modèle plus simple pour les images de moindre qualité
-
-    result = "_0_0_0_0_0_0_0_0_0_"  # Initialisation du résultat par défaut
-
-    # Initialisation du modèle MediaPipe Holistic avec les paramètres appropriés
-    with mp_holistic.Holistic(
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5,
-        model_complexity=model_complexity
-    ) as holistic:
-        try:
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)  # Conversion en RGB pour MediaPipe
-            results = holistic.process(image_rgb)  # Traitement de l'image pour la détection des poses
-
-            presence_personne = 1 if results.pose_landmarks else 0  # Vérification de la présence d'une personne
-
-            if not presence_personne:
-                print("Aucune personne détectée.")
-                return result  # Retourner le résultat par défaut si aucune personne n'est détectée
-
-            landmarks = results.pose_landmarks.landmark  # Extraction des landmarks détectés
-
-            # Dessiner les landmarks sur l'image pour visualisation
-            mp_drawing.draw_landmarks(
-                image, results.pose_landmarks, mp_holistic.POSE_CONNECTIONS)
-
-            keypoints = extract_keypoints(landmarks)  # Extraction des points clés nécessaires
-
-            # Vérification de la validité des points clés extraits
-            for key, value in keypoints.items():
-                if value is None or not isinstance(value, list) or len(value) != 2:
-                    print(f"Erreur: Point clé '{key}' invalide ou manquant.")
-                    return result  # Retourner le résultat par défaut en cas d'erreur
-
-            required_keys = ['neck', 'shoulder_left', 'shoulder_right']
-            if not all(keypoints[key] is not None for key in required_keys):
-                print("Erreur: Points clés manquants. Impossible de continuer l'analyse.")
-                return result
-
-            # Calcul de l'angle de flexion du cou
-            flexion_cou = calculate_angle(
-                keypoints['shoulder_left'], keypoints['neck'], keypoints['shoulder_right'])
-
-            # Classification de l'angle de flexion du cou selon les seuils
-            flexion_cou_score = classify_angle(flexion_cou, thresholds['flexion_cou'])
-
-            # Calcul de l'indicateur ergonomique basé sur le score de flexion du cou
-            ergonomic_indicator = flexion_cou_score
-
-            # Détermination de la zone de risque globale
-            risk_zone = 1 if ergonomic_indicator == 1 else 2 if ergonomic_indicator == 2 else 3
-
-            # Détection des actions techniques dans l'image originale
-            detected_actions = detect_actions_techniques_in_image(image_original)
-            num_actions = len(detected_actions)  # Nombre d'actions techniques détectées
-
-            # Initialisation des scores pour les autres facteurs ergonomiques (placeholder)
-            repetitivite_score = 1         # Score de répétitivité des mouvements
-            maintien_posture_score = 1     # Score de maintien des postures à risque
-            recuperation_score = 1         # Score de récupération musculaire
-            prehension_score = 1           # Score de l'effort de préhension
-
-            # Construction de la chaîne de résultats avec les valeurs calculées
-            result = f'_{flexion_cou}_{flexion_cou_score}_{presence_personne}_{risk_zone}_{num_actions}_{repetitivite_score}_{maintien_posture_score}_{recuperation_score}_{prehension_score}'
-
-            # Affichage des résultats sur l'image
-            display_results(image, presence_personne, ergonomic_indicator, risk_zone, result)
-
-            # Affichage des actions techniques détectées en dessinant des cercles rouges
-            for (i, j) in detected_actions:
-                cv2.circle(image, (j, i), 5, (0, 0, 255), -1)
-
-            print(result)  # Affichage du résultat dans la console pour suivi
-
-        except (TypeError, ValueError) as e:
-            # Gestion des erreurs lors du calcul de l'angle ou de l'extraction des points clés
-            print(f"Erreur lors du calcul de l'angle: {e}. Cela peut être dû à des points clés manquants ou incorrects.")
-            return result
-        except Exception as e:
-            # Gestion des autres exceptions éventuelles
-            print(f"Erreur lors du traitement de l'image: {e}")
-            return result
+    images_total.inc()
+    if porte is not None and not porte.ouverte(image, rgb=rgb):
+        images_reutilisees.inc()
+        # Scène statique : réutilisation du dernier résultat, dont la posture continue d'alimenter les indicateurs
+        analyse = reutiliser_resultat(porte.dernier_resultat, indicateurs, horodatage, journal)
+    else:
+        debut = time.monotonic()
+        analyse = _analyser_image(image, pool, flux, rgb, indicateurs, horodatage, controleur, profil, roi,
+                                  predicteur, journal, contexte_thread() if contexte is None else contexte,
+                                  model_complexity)
+        latence_estimateur.observer(time.monotonic() - debut)
+        if porte is not None:
+            if analyse.get('erreur'):
+                porte.reinitialiser()  # Un résultat en erreur n'est jamais réutilisé
+            else:
+                porte.memoriser(analyse)
+    return analyse if details else analyse['result']
+
+def resultat_vide(presence_personne=0, erreur=False):
+    """
+    Résultat structuré par défaut (aucune personne, ou analyse impossible) ; sa chaîne `result`
+    est le résultat par défaut historique. `erreur` distingue une analyse en échec (exception
+    interceptée) d'une image sans personne.
+    """
+    return {
+        'result': "_0_0_0_0_0_0_0_0_0_",
+        'presence_personne': presence_personne,
+        'erreur': erreur,
+        'cou_verticale': 0,
+        'landmarks': None,           # (33, 4) normalisés dans l'image entière
+        'predit': False,             # Landmarks prédits sans inférence
+        'actions': np.zeros((0, 2), dtype=np.int32),  # (ligne, colonne) des actions techniques
+        'angles': None,
+        'zones': None,
+        'ergonomic_indicator': 0,
+        'risk_zone': 0,
+    }
 
-    return result  # Retourner le résultat de l'analyse
\ No newline at end of file
+def _analyser_image(image, pool, flux, rgb, indicateurs, horodatage, controleur, profil, roi, predicteur, journal,
+                    contexte, model_complexity=None):
+    """
+    Analyse d'une image par estimateur(), une fois passée la porte de mouvement.
+    Retourne le résultat structuré.
+    """
+    if pool is None:
+        pool = pool_profil(profil or PROFIL_DEFAUT)
+    debut_analyse = time.monotonic()
+    t_journal = horodatage  # Heure de capture (epoch) enregistrée dans le journal ; à défaut, heure d'écriture
+    horodatage = debut_analyse if horodatage is None else horodatage
+    image_original = image  # Le prétraitement écrit dans les tampons du contexte : l'originale reste intacte
+    hauteur, largeur = image_original.shape[:2]
+    gris = contexte.gris(image_original, rgb=rgb)  # Niveaux de gris calculés une fois, partagés par les étapes
+
+    if predicteur is not None and not predicteur.doit_inferer(horodatage):
+        # Image sans inférence : landmarks prédits par le modèle de mouvement
+        landmarks, _ = predicteur.predire(horodatage)
+        detected_actions, nb_pics = detect_actions_techniques_in_image(image_original, rgb=rgb, contexte=contexte,
+                                                                       gris=gris, avec_nombre=True)
+        num_actions = int(round(nb_pics * FACTEUR_ACTIONS))
+        analyse = analyser_landmarks(landmarks, largeur / hauteur, indicateurs, horodatage, num_actions)
+        if journal is not None:
+            angles, zones = (analyse['angles'], analyse['zones']) if analyse is not None else (None, None)
+            journal.ajouter(landmarks, angles, zones, t=t_journal, predit=True)
+        images_predites.inc()
+        if analyse is None:
+            return resultat_vide(presence_personne=1)
+        analyse.update(landmarks=landmarks, predit=True, actions=detected_actions)
+        logging.debug(analyse['result'])
+        return analyse
+
+    zone_roi = None
+    gris_analyse = gris
+    if roi is not None:
+        _, zone_roi = roi.recadrer(image_original)  # Région d'intérêt (None = image entière)
+        if zone_roi is not None:
+            x0, y0, x1, y1 = zone_roi
+            gris_analyse = gris[y0:y1, x0:x1]  # Vue, sans copie
+
+    # Prétraitement de l'image pour améliorer la détection (égalisation et flou en niveaux de gris).
+    # L'image prétraitée a trois canaux identiques : elle est directement en RGB pour MediaPipe.
+    flou = egaliser_flouter(gris_analyse, contexte)
+    image = cv2.cvtColor(flou, cv2.COLOR_GRAY2RGB, dst=contexte.tampon('entree_modele', flou.shape + (3,)))
+    if model_complexity is not None:
+        model_complexity = int(model_complexity)  # Complexité imposée par l'appelant
+    elif controleur is not None:
+        # Qualité estimée sur une vignette, lissée, avec hystérésis et temps de maintien minimal
+        model_complexity = controleur.decider(image_original, rgb=rgb)
+    else:
+        # Calcul de la qualité de l'image pour ajuster la complexité du modèle
+        image_quality = calculate_image_quality(image, contexte=contexte, gris=flou)
+        model_complexity = 1 if image_quality < 0.5 else 2  # Modèle plus simple pour les images de moindre qualité
+    latence_pretraitement.observer(time.monotonic() - debut_analyse)
+
+    # Emprunt d'une session MediaPipe déjà chargée pour la complexité demandée. L'exception est interceptée
+    # hors du bloc "with" : elle le traverse, et la session en échec est fermée au lieu d'être remise en réserve.
+    try:
+        with pool.session(model_complexity, flux) as holistic:
+            debut_inference = time.monotonic()
+            results = holistic.process(image)  # Traitement de l'image pour la détection des poses
+            fin_inference = time.monotonic()
+        latence_inference.observer(fin_inference - debut_inference)
+        if controleur is not None:
+            controleur.observer_latence(fin_inference - debut_analyse)  # Temps de prétraitement + inférence
+    except Exception as e:
+        # Gestion des exceptions de l'inférence
+        erreurs_analyse.inc()
+        logging.warning(f"Erreur lors du traitement de l'image: {e}")
+        return resultat_vide(erreur=True)
+
+    try:
+        presence_personne = 1 if results.pose_landmarks else 0  # Vérification de la présence d'une personne
+
+        if not presence_personne:
+            if roi is not None:
+                roi.maj(None)  # Personne perdue : l'image entière sera analysée à la prochaine image
+            if predicteur is not None:
+                predicteur.reinitialiser()  # Plus rien à extrapoler : inférence à la prochaine image
+            if journal is not None:
+                journal.ajouter(t=t_journal, presence=0)
+            images_sans_personne.inc()
+            logging.debug("Aucune personne détectée.")
+            return resultat_vide()  # Résultat par défaut si aucune personne n'est détectée
+
+        # Landmarks en coordonnées normalisées de l'image entière (recalage si l'analyse portait sur la ROI)
+        landmarks = SuiviROI.remapper(landmarks_array(results.pose_landmarks), zone_roi, largeur, hauteur)
+        if roi is not None:
+            roi.maj(landmarks)
+        if predicteur is not None:
+            predicteur.corriger(horodatage, landmarks)
+
+        # Détection des actions techniques dans l'image originale
+        detected_actions, nb_pics = detect_actions_techniques_in_image(image_original, rgb=rgb, contexte=contexte,
+                                                                       gris=gris, avec_nombre=True)
+        num_actions = int(round(nb_pics * FACTEUR_ACTIONS))  # Nombre d'actions techniques détectées
+
+        # Angles, zones et scores calculés à partir des landmarks
+        analyse = analyser_landmarks(landmarks, largeur / hauteur, indicateurs, horodatage, num_actions,
+                                     presence_personne, detecter_prehension(results))
+        if journal is not None:
+            angles, zones = (analyse['angles'], analyse['zones']) if analyse is not None else (None, None)
+            journal.ajouter(landmarks, angles, zones, t=t_journal)
+        if analyse is None:
+            images_incompletes.inc()
+            logging.debug("Points clés manquants : flexion du cou non calculable.")
+            return dict(resultat_vide(presence_personne=1), landmarks=landmarks)
+        analyse.update(landmarks=landmarks, predit=False, actions=detected_actions)
+
+        latence_analyse.observer(time.monotonic() - fin_inference)
+        logging.debug(analyse['result'])
+        return analyse
+
+    except (TypeError, ValueError) as e:
+        # Gestion des erreurs lors du calcul de l'angle ou de l'extraction des points clés
+        erreurs_analyse.inc()
+        logging.warning(f"Erreur lors du calcul de l'angle: {e}. Cela peut être dû à des points clés manquants ou incorrects.")
+        return resultat_vide(erreur=True)
+    except Exception as e:
+        # Gestion des autres exceptions éventuelles
+        erreurs_analyse.inc()
+        logging.warning(f"Erreur lors du traitement de l'image: {e}")
+        return resultat_vide(erreur=True)
+
+# RENDU (OPTIONNEL) -----------------------------------------------------------------------------------------------------------
+
+def dessiner_resultats(image, analyse, rgb=False, copie=True):
+    """
+    Annoter une image avec un résultat structuré de estimateur(..., details=True) :
+    squelette (landmarks de l'image entière), textes de display_results() et actions techniques.
+    Appelée uniquement par les consommateurs qui affichent ou conservent l'image (démo, audit) ;
+    l'image est copiée sauf si `copie=False`. Retourne l'image annotée.
+    """
+    if copie:
+        image = image.copy()
+    hauteur, largeur = image.shape[:2]
+    landmarks = analyse.get('landmarks')
+    if landmarks is not None:
+        visibles = landmarks[:, 3] >= SEUIL_VISIBILITE
+        points = np.round(landmarks[:, :2] * (largeur, hauteur)).astype(np.int32)
+        couleur_os = (0, 255, 255) if analyse.get('predit') else (255, 255, 255)  # Jaune si prédit
+        for debut, fin in mp_holistic.POSE_CONNECTIONS:
+            if visibles[debut] and visibles[fin]:
+                cv2.line(image, tuple(map(int, points[debut])), tuple(map(int, points[fin])), couleur_os, 2)
+        for x, y in points[visibles]:
+            cv2.circle(image, (int(x), int(y)), 3, (0, 0, 255) if not rgb else (255, 0, 0), -1)
+    display_results(image, analyse['presence_personne'], analyse['ergonomic_indicator'], analyse['risk_zone'],
+                    analyse['result'])
+    # Actions techniques détectées : cercles rouges
+    rouge = (255, 0, 0) if rgb else (0, 0, 255)
+    for (i, j) in analyse['actions']:
+        cv2.circle(image, (int(j), int(i)), 5, rouge, -1)
+    return image
@@ -0,0 +1,374 @@
+import argparse               # Pour la lecture des arguments de la ligne de commande
+import csv                    # Export journalier tabulaire
+import glob                   # Pour le parcours des équipes et des postes d'un jour
+import json                   # Description des colonnes, cumuls et export journalier
+import logging                # Pour signaler les reprises et les exports
+import os                     # Pour les chemins, la troncature et le renommage atomique des fichiers
+import time                   # Horodatage des lignes (temps réel, comme le journal des landmarks)
+import numpy as np            # Lots de lignes et cumuls vectorisés
+# Même découpage en équipes, même durée par image et même sens de flexion_cou que le concentrateur
+from transport import ECART_MAX, VERSION_MESSAGE, equipe
+from moteur_angles import NOMS_ARTICULATIONS
+
+# CONSTANTES ------------------------------------------------------------------------------------------------------------------
+
+NB_ARTICULATIONS = len(NOMS_ARTICULATIONS)
+CHAMPS_SCORES = ('repetitivite_score', 'maintien_posture_score', 'recuperation_score', 'prehension_score')
+
+# Colonnes de l'export : (nom, type, forme d'une ligne). Chaque colonne est un fichier binaire `<nom>.bin`
+# auquel les lignes sont ajoutées par lots, sans jamais être réécrites.
+COLONNES = (
+    ('t', '<f8', ()),                               # Horodatage (secondes depuis l'epoch)
+    ('presence', 'u1', ()),                         # 1 si une personne est détectée
+    ('risk_zone', 'u1', ()),                        # Zone de risque (cou) de la ligne (0 non classé, 1 vert, 2 orange, 3 rouge)
+    ('num_actions', '<u2', ()),                     # Actions techniques détectées sur l'image
+    ('cou_verticale', 'u1', ()),                    # 1 si le cou est mesuré sur la verticale de l'image (hanches absentes)
+    ('angles', '<f4', (NB_ARTICULATIONS,)),         # Angles en degrés (NaN si non calculable)
+    ('cycles', '<f4', (NB_ARTICULATIONS,)),         # Cycles/min par articulation (fenêtre de cadence, NaN si inconnus)
+    ('zones', 'u1', (NB_ARTICULATIONS,)),           # Codes de zone par articulation
+    ('scores', 'u1', (len(CHAMPS_SCORES),)),        # Scores temporels (ordre de CHAMPS_SCORES)
+)
+DTYPE_LIGNE = np.dtype([(nom, type_, forme) for nom, type_, forme in COLONNES])
+
+TAILLE_LOT = 600              # Lignes par lot écrit sur disque (1 min à 10 images/s)
+ZONE_HORS_LIMITE = 3          # Zone comptée comme "hors zone" (événements et exposition)
+
+# CUMULS ----------------------------------------------------------------------------------------------------------------------
+
+class CumulsExport:
+    """
+    Cumuls d'un poste sur une équipe, mis à jour lot par lot en O(articulations) de mémoire :
+    durée observée et de présence, temps par zone (globale et par articulation), événements
+    "hors zone" (entrées en zone rouge) par articulation, cadence, actions techniques et scores temporels.
+    Chaque ligne compte pour l'écart à la ligne précédente, plafonné à ECART_MAX (comme le concentrateur) :
+    les grandeurs par image (actions, cycles/min) sont moyennées sur le temps, jamais sommées sur les lignes,
+    et ne dépendent donc pas de la fréquence d'images.
+    """
+
+    def __init__(self, etat=None):
+        self.lignes = 0
+        self.t_premier = None
+        self.t_dernier = None
+        self.duree = 0.0
+        self.duree_presence = 0.0
+        self.duree_zones = np.zeros(4)                                  # risk_zone 0 à 3
+        self.duree_zones_articulations = np.zeros((NB_ARTICULATIONS, 4))
+        self.evenements_hors_zone = np.zeros(NB_ARTICULATIONS, dtype=np.int64)
+        self.derniere_hors_zone = np.zeros(NB_ARTICULATIONS, dtype=bool)  # État à la dernière ligne
+        self.somme_angles = np.zeros(NB_ARTICULATIONS)                  # Pondérée par la durée
+        self.duree_angles = np.zeros(NB_ARTICULATIONS)                  # Durée où l'angle est calculable
+        self.max_angles = np.full(NB_ARTICULATIONS, np.nan)
+        self.somme_actions = 0.0                                        # Pondérée par la durée de présence
+        self.somme_cycles = np.zeros(NB_ARTICULATIONS)                  # Pondérée par la durée
+        self.duree_cycles = np.zeros(NB_ARTICULATIONS)                  # Durée où la cadence est connue
+        self.somme_scores = np.zeros(len(CHAMPS_SCORES))                # Pondérées par la durée de présence
+        self.max_scores = np.zeros(len(CHAMPS_SCORES), dtype=np.int64)
+        if etat is not None:
+            for nom, valeur in etat.items():
+                courant = getattr(self, nom)
+                setattr(self, nom, np.array(valeur, dtype=courant.dtype) if isinstance(courant, np.ndarray) else valeur)
+
+    def ajouter_lot(self, lot):
+        """
+        Ajouter un lot de lignes (tableau DTYPE_LIGNE, dans l'ordre chronologique).
+        """
+        if not len(lot):
+            return
+        t = lot['t']
+        precedent = np.concatenate(([t[0] if self.t_dernier is None else self.t_dernier], t[:-1]))
+        durees = np.clip(t - precedent, 0.0, ECART_MAX)
+        presence = lot['presence'].astype(bool)
+        durees_presence = durees * presence
+
+        self.lignes += len(lot)
+        self.t_premier = float(t[0]) if self.t_premier is None else self.t_premier
+        self.t_dernier = float(t[-1])
+        self.duree += float(durees.sum())
+        self.duree_presence += float(durees_presence.sum())
+        self.duree_zones += np.bincount(np.minimum(lot['risk_zone'], 3), weights=durees_presence, minlength=4)
+
+        zones = np.minimum(lot['zones'], 3)
+        for z in range(4):
+            self.duree_zones_articulations[:, z] += ((zones == z) * durees_presence[:, None]).sum(axis=0)
+
+        # Entrées en zone rouge : passage à "hors zone" par rapport à la ligne précédente (même d'un lot à l'autre)
+        hors_zone = (zones == ZONE_HORS_LIMITE) & presence[:, None]
+        avant = np.vstack((self.derniere_hors_zone[None, :], hors_zone[:-1]))
+        self.evenements_hors_zone += (hors_zone & ~avant).sum(axis=0)
+        self.derniere_hors_zone = hors_zone[-1].copy()
+
+        angles = lot['angles'].astype(np.float64)
+        valides = ~np.isnan(angles) & presence[:, None]
+        self.somme_angles += np.where(valides, angles * durees[:, None], 0.0).sum(axis=0)
+        self.duree_angles += (valides * durees[:, None]).sum(axis=0)
+        maximum = np.where(valides, angles, -np.inf).max(axis=0)
+        self.max_angles = np.fmax(self.max_angles, np.where(np.isinf(maximum), np.nan, maximum))
+
+        cycles = lot['cycles'].astype(np.float64)
+        connus = ~np.isnan(cycles) & presence[:, None]
+        self.somme_cycles += np.where(connus, cycles * durees[:, None], 0.0).sum(axis=0)
+        self.duree_cycles += (connus * durees[:, None]).sum(axis=0)
+
+        self.somme_actions += float((lot['num_actions'] * durees_presence).sum())
+        self.somme_scores += (lot['scores'] * durees_presence[:, None]).sum(axis=0)
+        if presence.any():
+            self.max_scores = np.maximum(self.max_scores, lot['scores'][presence].max(axis=0))
+
+    def etat(self):
+        """
+        Sommes brutes, sérialisables en JSON, pour reprendre les cumuls à la réouverture.
+        """
+        return {nom: valeur.tolist() if isinstance(valeur, np.ndarray) else valeur
+                for nom, valeur in vars(self).items()}
+
+    def resume(self):
+        """
+        Indicateurs TMS / DUER de l'équipe : pourcentages d'exposition, événements "hors zone", cadence.
+        La cadence d'une articulation est la moyenne, pondérée par le temps, de ses cycles/min ;
+        celle du poste est la plus élevée des articulations.
+        """
+        presence = self.duree_presence
+        cadences = np.divide(self.somme_cycles, self.duree_cycles, out=np.full(NB_ARTICULATIONS, np.nan),
+                             where=self.duree_cycles > 0)
+
+        def pct(duree):
+            return round(100.0 * float(duree) / presence, 1) if presence else 0.0
+
+        articulations = {}
+        for j, nom in enumerate(NOMS_ARTICULATIONS):
+            articulations[nom] = {
+                'zones_pct': [pct(d) for d in self.duree_zones_articulations[j]],
+                'hors_zone_pct': pct(self.duree_zones_articulations[j, ZONE_HORS_LIMITE]),
+                'evenements_hors_zone': int(self.evenements_hors_zone[j]),
+                'angle_moyen': round(float(self.somme_angles[j] / self.duree_angles[j]), 1) if self.duree_angles[j] else None,
+                'angle_max': None if np.isnan(self.max_angles[j]) else round(float(self.max_angles[j]), 1),
+                'cadence_par_min': None if np.isnan(cadences[j]) else round(float(cadences[j]), 1),
+            }
+        return {
+            'lignes': self.lignes,
+            'debut': self.t_premier,
+            'fin': self.t_dernier,
+            'duree_s': round(self.duree, 1),
+            'presence_pct': round(100.0 * presence / self.duree, 1) if self.duree else 0.0,
+            'zones_pct': [pct(d) for d in self.duree_zones],
+            'actions_moyen': round(self.somme_actions / presence, 1) if presence else 0.0,
+            'cadence_par_min': None if np.isnan(cadences).all() else round(float(np.nanmax(cadences)), 1),
+            'scores_moyens': {champ: round(float(s) / presence, 2) if presence else 0.0
+                              for champ, s in zip(CHAMPS_SCORES, self.somme_scores)},
+            'scores_max': {champ: int(m) for champ, m in zip(CHAMPS_SCORES, self.max_scores)},
+            'articulations': articulations,
+        }
+
+# ÉCRITURE --------------------------------------------------------------------------------------------------------------------
+
+def chemin_equipe(repertoire, cle_equipe, num_poste):
+    return os.path.join(repertoire, cle_equipe, f"poste{num_poste}")
+
+def ecrire_json(chemin, contenu):
+    temporaire = f"{chemin}.tmp"
+    with open(temporaire, 'w') as fichier:
+        json.dump(contenu, fichier, indent=1, ensure_ascii=False)
+    os.replace(temporaire, chemin)
+
+class ExportPoste:
+    """
+    Export en colonnes d'un poste, par équipe : `<repertoire>/<AAAA-MM-JJ_equipe>/poste<N>/`
+    contient un fichier binaire par colonne (COLONNES), complété par lots de `taille_lot` lignes,
+    et `cumuls.json`, réécrit (atomiquement) après chaque lot.
+
+    Seul le lot en cours est gardé en mémoire. `cumuls.json` n'est réécrit qu'après l'ajout du lot
+    à toutes les colonnes et fait foi sur le nombre de lignes : à la réouverture, les colonnes sont
+    tronquées à ce nombre (lot interrompu par un arrêt brutal) et les cumuls repris là où ils étaient.
+    """
+
+    def __init__(self, repertoire, num_poste, taille_lot=TAILLE_LOT):
+        self.repertoire = repertoire
+        self.num_poste = str(num_poste)
+        self.taille_lot = taille_lot
+        self.nb_lignes = 0
+        self._lot = np.zeros(taille_lot, dtype=DTYPE_LIGNE)
+        self._position = 0
+        self._equipe = None           # Clé de l'équipe en cours
+        self._dossier = None
+        self._fichiers = {}
+        self._cumuls = None
+
+    def _ouvrir(self, cle_equipe):
+        """
+        Ouvrir (ou reprendre) les colonnes et les cumuls du poste pour l'équipe `cle_equipe`.
+        """
+        self._fermer_equipe()
+        self._dossier = chemin_equipe(self.repertoire, cle_equipe, self.num_poste)
+        os.makedirs(self._dossier, exist_ok=True)
+        chemin_cumuls = os.path.join(self._dossier, 'cumuls.json')
+        lignes = 0
+        if os.path.exists(chemin_cumuls):
+            with open(chemin_cumuls) as fichier:
+                etat = json.load(fichier)['etat']
+            self._cumuls = CumulsExport(etat)
+            lignes = self._cumuls.lignes
+            logging.info(f"Export {self._dossier}: reprise à la ligne {lignes}.")
+        else:
+            self._cumuls = CumulsExport()
+            ecrire_json(os.path.join(self._dossier, 'colonnes.json'), {
+                'poste': self.num_poste,
+                'equipe': cle_equipe,
+                'colonnes': [[nom, type_, list(forme)] for nom, type_, forme in COLONNES],
+                'articulations': list(NOMS_ARTICULATIONS),
+                'scores': list(CHAMPS_SCORES),
+                # Sens de flexion_cou (voir transport.VERSION_MESSAGE) : angle signé de la tête par rapport au tronc
+                'version_message': VERSION_MESSAGE,
+            })
+        for nom, _, _ in COLONNES:
+            chemin = os.path.join(self._dossier, f"{nom}.bin")
+            fichier = open(chemin, 'ab')
+            taille = lignes * DTYPE_LIGNE[nom].itemsize
+            if fichier.tell() != taille:
+                fichier.truncate(taille)  # Lignes d'un lot non validé par cumuls.json
+            self._fichiers[nom] = fichier
+        self._equipe = cle_equipe
+
+    def _fermer_equipe(self):
+        self.vider()
+        for fichier in self._fichiers.values():
+            fichier.close()
+        self._fichiers = {}
+        self._equipe = None
+
+    def ajouter(self, analyse, t=None):
+        """
+        Ajouter une image analysée : `analyse` est le résultat structuré de estimateur(..., details=True).
+        `t` : secondes depuis l'epoch (heure courante par défaut).
+        """
+        t = time.time() if t is None else t
+        cle_equipe = equipe(t)
+        if cle_equipe != self._equipe:
+            self._ouvrir(cle_equipe)  # Changement d'équipe : le lot en cours est écrit dans l'équipe précédente
+        ligne = self._lot[self._position]
+        ligne['t'] = t
+        ligne['presence'] = analyse.get('presence_personne', 0)
+        ligne['risk_zone'] = analyse.get('risk_zone', 0)
+        ligne['num_actions'] = min(analyse.get('num_actions', 0), 65535)
+        ligne['cou_verticale'] = analyse.get('cou_verticale', 0)
+        ligne['angles'] = np.nan if analyse.get('angles') is None else analyse['angles']
+        ligne['cycles'] = np.nan if analyse.get('cycles_par_minute') is None else analyse['cycles_par_minute']
+        ligne['zones'] = 0 if analyse.get('zones') is None else analyse['zones']
+        ligne['scores'] = [analyse.get(champ, 0) for champ in CHAMPS_SCORES]
+        self._position += 1
+        self.nb_lignes += 1
+        if self._position >= self.taille_lot:
+            self.vider()
+
+    def vider(self):
+        """
+        Écrire le lot en cours à la fin de chaque colonne, puis mettre à jour les cumuls.
+        """
+        if not self._position or self._equipe is None:
+            return
+        lot = self._lot[:self._position]
+        for nom, fichier in self._fichiers.items():
+            fichier.write(np.ascontiguousarray(lot[nom]).tobytes())
+            fichier.flush()
+        self._cumuls.ajouter_lot(lot)
+        ecrire_json(os.path.join(self._dossier, 'cumuls.json'),
+                    {'resume': self._cumuls.resume(), 'etat': self._cumuls.etat()})
+        self._position = 0
+
+    def close(self):
+        self._fermer_equipe()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# RELECTURE ET EXPORT JOURNALIER ----------------------------------------------------------------------------------------------
+
+def lire_colonnes(dossier, colonnes=None):
+    """
+    Colonnes d'un poste sur une équipe, mappées en mémoire (lecture seule, sans copie),
+    limitées aux lignes validées par cumuls.json.
+    """
+    with open(os.path.join(dossier, 'cumuls.json')) as fichier:
+        lignes = json.load(fichier)['etat']['lignes']
+    resultat = {}
+    for nom, type_, forme in COLONNES:
+        if colonnes is not None and nom not in colonnes:
+            continue
+        resultat[nom] = np.memmap(os.path.join(dossier, f"{nom}.bin"), dtype=type_, mode='r',
+                                  shape=(lignes,) + forme) if lignes else np.zeros((0,) + forme, dtype=type_)
+    return resultat
+
+def recalculer_cumuls(dossier, taille_lot=100000):
+    """
+    Recalculer les cumuls d'un poste sur une équipe à partir de ses colonnes (après une évolution
+    de CumulsExport), lot par lot, et réécrire cumuls.json. Retourne le résumé.
+    """
+    colonnes = lire_colonnes(dossier)
+    nb = len(colonnes['t'])
+    cumuls = CumulsExport()
+    lot = np.zeros(min(taille_lot, nb), dtype=DTYPE_LIGNE)
+    for debut in range(0, nb, taille_lot):
+        fin = min(debut + taille_lot, nb)
+        for nom in DTYPE_LIGNE.names:
+            lot[nom][:fin - debut] = colonnes[nom][debut:fin]
+        cumuls.ajouter_lot(lot[:fin - debut])
+    resume = cumuls.resume()
+    ecrire_json(os.path.join(dossier, 'cumuls.json'), {'resume': resume, 'etat': cumuls.etat()})
+    return resume
+
+def finaliser_jour(repertoire, jour, sortie=None, recalculer=False):
+    """
+    Export journalier de tous les postes : une ligne par poste et par équipe commencée le jour `jour`
+    ("AAAA-MM-JJ"), écrite dans `<sortie>/export_<jour>.csv` et `.json`.
+    Les cumuls étant tenus à jour au fil de l'eau, seuls les fichiers cumuls.json sont lus
+    (sauf `recalculer=True`). Le lot non encore écrit d'un poste en cours d'enregistrement n'est pas compté.
+    Retourne le chemin du fichier CSV.
+    """
+    sortie = sortie or repertoire
+    os.makedirs(sortie, exist_ok=True)
+    lignes = []
+    for dossier in sorted(glob.glob(os.path.join(repertoire, f"{jour}_*", 'poste*'))):
+        if not os.path.exists(os.path.join(dossier, 'cumuls.json')):
+            continue
+        if recalculer:
+            resume = recalculer_cumuls(dossier)
+        else:
+            with open(os.path.join(dossier, 'cumuls.json')) as fichier:
+                resume = json.load(fichier)['resume']
+        nom_equipe = os.path.basename(os.path.dirname(dossier))[len(jour) + 1:]
+        lignes.append({'date': jour, 'equipe': nom_equipe, 'poste': os.path.basename(dossier)[5:], **resume})
+
+    champs = ['date', 'equipe', 'poste', 'duree_s', 'presence_pct', 'actions_moyen', 'cadence_par_min']
+    champs += [f"zone{z}_pct" for z in range(4)]
+    champs += [f"{nom}_{indicateur}" for nom in NOMS_ARTICULATIONS
+               for indicateur in ('hors_zone_pct', 'evenements_hors_zone', 'angle_moyen', 'angle_max',
+                                  'cadence_par_min')]
+    champs += [f"{champ}_moyen" for champ in CHAMPS_SCORES]
+    chemin_csv = os.path.join(sortie, f"export_{jour}.csv")
+    with open(f"{chemin_csv}.tmp", 'w', newline='') as fichier:
+        ecrivain = csv.writer(fichier)
+        ecrivain.writerow(champs)
+        for ligne in lignes:
+            valeurs = [ligne[c] for c in champs[:7]] + ligne['zones_pct']
+            for nom in NOMS_ARTICULATIONS:
+                articulation = ligne['articulations'][nom]
+                valeurs += [articulation['hors_zone_pct'], articulation['evenements_hors_zone'],
+                            articulation['angle_moyen'], articulation['angle_max'], articulation['cadence_par_min']]
+            valeurs += [ligne['scores_moyens'][champ] for champ in CHAMPS_SCORES]
+            ecrivain.writerow(['' if v is None else v for v in valeurs])
+    os.replace(f"{chemin_csv}.tmp", chemin_csv)
+    ecrire_json(os.path.join(sortie, f"export_{jour}.json"), lignes)
+    logging.info(f"Export du {jour}: {len(lignes)} poste(s) × équipe(s) dans {chemin_csv}.")
+    return chemin_csv
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Export journalier TMS / DUER de tous les postes.")
+    parser.add_argument('jour', help="Jour à exporter (AAAA-MM-JJ)")
+    parser.add_argument('--repertoire', default="/home/Share/Exports/", help="Répertoire des exports des postes")
+    parser.add_argument('--sortie', default=None, help="Répertoire du fichier journalier (défaut: --repertoire)")
+    parser.add_argument('--recalculer', action='store_true', help="Recalculer les cumuls à partir des colonnes")
+    args = parser.parse_args()
+    finaliser_jour(args.repertoire, args.jour, args.sortie, args.recalculer)
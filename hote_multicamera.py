@@ -0,0 +1,460 @@
+#!/usr/bin/python
+
+# Bibliothèques **************************************************
+import argparse               # Pour la lecture des arguments de la ligne de commande
+import logging                # Pour la gestion avancée des messages de log
+import os                     # Pour le nombre de cœurs et les chemins des journaux
+import threading              # Threads de capture (un par caméra) et d'inférence (réserve partagée)
+import time                   # Horloge monotone pour la mesure des étages, heure des captures
+from collections import deque # File des caméras prêtes, servie à tour de rôle
+from contextlib import ExitStack  # Emprunt simultané de plusieurs sessions pour le préchauffage
+import numpy as np            # Pour les vues sur les tampons OpenNI et l'image de préchauffage
+import cv2                    # Pour les sources vidéo (fichiers, webcams, flux réseau)
+from estimateur_posture import (estimateur, creer_indicateurs, JournalLandmarks, PorteMouvement,
+                                PredicteurKeypoints, SuiviROI)
+from sessions_mediapipe import PoolSessions  # Réserve de sessions partagée par toutes les caméras
+from pipeline_station import TamponCirculaire  # Dernière image de chaque caméra (drop-oldest)
+from transport import ClientConcentrateur  # Une seule connexion au concentrateur pour tout l'hôte
+from transport import encoder_message  # Message structuré, horodaté à la capture
+from metriques import REGISTRE  # Métriques de l'hôte (activées par POSTURE_METRIQUES=1)
+
+# Configuration du logging ***************************************
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Constantes *****************************************************
+IP_CONCENTRATEUR = "10.10.10.70"  # Adresse du concentrateur
+PORT_CONCENTRATEUR = 50000
+REPERTOIRE_SPOOL = "/var/tmp/spool_concentrateur/"  # Messages conservés sur disque local pendant une coupure
+REPERTOIRE_JOURNAL = "/home/Share/Journaux/"  # Journaux binaires par poste ("" = désactivé)
+PROFIL_INFERENCE = os.environ.get("POSTURE_PROFIL", "pose")  # 'pose', 'pose_mains' ou 'holistique'
+SUIVI_ROI = True  # Analyse limitée à la région entourant l'opérateur à l'image précédente
+SEUIL_MOUVEMENT = 2.0  # Différence moyenne sous laquelle le dernier résultat est réutilisé (0 = désactivé)
+ANCIENNETE_MAX = 10  # Nombre maximal d'images consécutives servies par le dernier résultat
+PREDICTION_UNE_SUR = 3  # Inférence réelle au plus 1 image sur N par caméra (1 = désactivé)
+SUIVI_MEDIAPIPE = True  # Une session MediaPipe en mode suivi par caméra (False = sessions en mode image par thread)
+COMPLEXITE_HOTE = 1  # model_complexity fixe de toutes les caméras : une seule session par caméra ou par thread
+ERREURS_CONSECUTIVES_MAX = 10  # Erreurs d'analyse consécutives au-delà desquelles une caméra est arrêtée
+PERIODE_ENVOI = 1.0  # Un message par caméra et par période (s) ; les images intermédiaires alimentent les indicateurs
+LARGEUR_IMAGE = 640  # Résolution des flux couleur OpenNI
+HAUTEUR_IMAGE = 480
+PORT_METRIQUES = 9101  # Port local de l'exposition texte des métriques (si POSTURE_METRIQUES=1)
+
+# Sources d'images ***********************************************
+
+class SourceOpenNI:
+    """
+    Flux couleur d'une caméra OpenNI (URI donnée par openni2.Device.enumerate_uris()).
+    lire() retourne une vue RGB sur le tampon de la frame, gardée avec elle : aucune copie.
+    """
+    rgb = True
+
+    def __init__(self, uri, largeur=LARGEUR_IMAGE, hauteur=HAUTEUR_IMAGE):
+        from openni import openni2, _openni2 as c_api  # Importé seulement si une caméra OpenNI est utilisée
+        self.uri = uri
+        self.largeur, self.hauteur = largeur, hauteur
+        self._device = openni2.Device(uri)
+        self._flux = self._device.create_color_stream()
+        self._flux.set_video_mode(c_api.OniVideoMode(
+            pixelFormat=c_api.OniPixelFormat.ONI_PIXEL_FORMAT_RGB888,
+            resolutionX=largeur, resolutionY=hauteur, fps=30))
+        self._flux.start()
+
+    def lire(self):
+        """
+        Retourne (image, frame), ou None en cas d'échec.
+        """
+        frame = self._flux.read_frame()
+        image = np.frombuffer(frame.get_buffer_as_uint8(), dtype=np.uint8)
+        return image.reshape(self.hauteur, self.largeur, 3), frame  # Vue sur le tampon, sans copie
+
+    def fermer(self):
+        self._flux.stop()
+        self._device.close()
+
+    def __str__(self):
+        return f"openni:{self.uri}"
+
+class SourceVideo:
+    """
+    Source lue par OpenCV : index de webcam, fichier vidéo ou flux réseau (ordre BGR).
+    """
+    rgb = False
+
+    def __init__(self, source):
+        self.source = int(source) if str(source).isdigit() else source
+        self._capture = cv2.VideoCapture(self.source)
+        if not self._capture.isOpened():
+            raise RuntimeError(f"Source vidéo impossible à ouvrir: {source}")
+
+    def lire(self):
+        ok, image = self._capture.read()
+        return (image, None) if ok else None
+
+    def fermer(self):
+        self._capture.release()
+
+    def __str__(self):
+        return f"video:{self.source}"
+
+def lister_openni():
+    """
+    Initialiser OpenNI et retourner les URI des caméras connectées, dans l'ordre d'énumération.
+    """
+    from openni import openni2
+    openni2.initialize()
+    return list(openni2.Device.enumerate_uris())
+
+# État par caméra ************************************************
+
+class EtatCamera:
+    """
+    État propre à une caméra : source, dernière image capturée (tampon de capacité 1), suivi
+    (ROI, porte de mouvement, prédiction), indicateurs temporels, journal et compteur mdv.
+    Une caméra n'a jamais plus d'une image en cours d'analyse : son état est utilisé par un seul
+    thread d'inférence à la fois, et ses résultats sont produits dans l'ordre de capture.
+    Au plus un message est envoyé par `periode_envoi` secondes (None = un par image analysée).
+    """
+
+    def __init__(self, num_poste, source, repertoire_journal=REPERTOIRE_JOURNAL, periode_envoi=PERIODE_ENVOI):
+        self.num_poste = str(num_poste)
+        self.source = source
+        self.rgb = source.rgb
+        self.tampon = TamponCirculaire(1, f"camera{num_poste}")  # Seule la dernière image compte
+        self.indicateurs = creer_indicateurs()
+        self.roi = SuiviROI() if SUIVI_ROI else None
+        self.porte = PorteMouvement(seuil=SEUIL_MOUVEMENT, anciennete_max=ANCIENNETE_MAX) if SEUIL_MOUVEMENT > 0 else None
+        self.predicteur = PredicteurKeypoints(une_sur=PREDICTION_UNE_SUR) if PREDICTION_UNE_SUR > 1 else None
+        self.journal = None
+        if repertoire_journal:
+            self.journal = JournalLandmarks(os.path.join(repertoire_journal, f"poste{self.num_poste}"),
+                                            rapport_aspect=LARGEUR_IMAGE / HAUTEUR_IMAGE)
+        self.mdv = 0
+        self.pres_cam = "yes"
+        self.periode_envoi = periode_envoi
+        self._prochain_envoi = None
+        self.en_cours = False   # Une image de la caméra est en cours d'analyse
+        self.en_file = False    # La caméra attend un thread d'inférence
+        self.arretee = False    # Caméra arrêtée après trop d'erreurs d'analyse consécutives
+        self.nb_captures = 0
+        self.nb_analyses = 0
+        self.nb_erreurs = 0
+        self.erreurs_consecutives = 0
+        self.duree_analyse = 0.0
+        self.latence = REGISTRE.histogramme(f"camera{self.num_poste}_analyse_secondes",
+                                            f"Analyse d'une image de la caméra du poste {self.num_poste}")
+        self.erreurs = REGISTRE.compteur(f"camera{self.num_poste}_erreurs_total",
+                                         f"Erreurs d'analyse de la caméra du poste {self.num_poste}")
+
+    def doit_envoyer(self, maintenant=None):
+        """
+        Vrai si l'échéance d'envoi est atteinte (l'échéance suivante est alors programmée).
+        """
+        if self.periode_envoi is None:
+            return True
+        maintenant = time.monotonic() if maintenant is None else maintenant
+        if self._prochain_envoi is not None and maintenant < self._prochain_envoi:
+            return False
+        prochain = (maintenant if self._prochain_envoi is None else self._prochain_envoi) + self.periode_envoi
+        self._prochain_envoi = prochain if prochain > maintenant else maintenant + self.periode_envoi
+        return True
+
+    def message(self, analyse, t_capture):
+        """
+        Message du poste pour le concentrateur, horodaté à la capture (mdv incrémenté à chaque message).
+        """
+        self.mdv = (self.mdv + 1) % 60
+        return encoder_message(self.num_poste, "yes", "yes", self.pres_cam, self.mdv, t_capture, analyse)
+
+    def statistiques(self):
+        tampon = self.tampon.statistiques()
+        return {
+            'source': str(self.source),
+            'captures': self.nb_captures,
+            'analyses': self.nb_analyses,
+            'erreurs': self.nb_erreurs,
+            'arretee': self.arretee,
+            'ecrasees': tampon['ecrases'],     # Images remplacées par une plus récente avant analyse
+            'duree_moyenne': self.duree_analyse / self.nb_analyses if self.nb_analyses else 0.0,
+        }
+
+    def fermer(self):
+        self.tampon.fermer()
+        self.source.fermer()
+        if self.journal is not None:
+            self.journal.close()
+
+# Ordonnancement *************************************************
+
+class Ordonnanceur:
+    """
+    Attribution des caméras aux threads d'inférence, à tour de rôle.
+    Une caméra entre dans la file quand une image l'attend et qu'elle n'est ni en cours d'analyse
+    ni déjà en file ; elle y reprend sa place en fin de file après chaque analyse. Chaque caméra
+    prête obtient donc une analyse par tour, quel que soit le débit de sa source.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._file = deque()
+        self._ferme = False
+        self._profondeur = REGISTRE.jauge('cameras_en_attente', "Caméras dont une image attend un thread d'inférence")
+
+    def _mettre_en_file(self, etat):
+        etat.en_file = True
+        self._file.append(etat)
+        self._profondeur.fixer(len(self._file))
+        self._condition.notify()
+
+    def signaler(self, etat):
+        """
+        Une image vient d'être déposée dans le tampon de `etat`.
+        """
+        with self._condition:
+            if not etat.en_cours and not etat.en_file and not etat.arretee:
+                self._mettre_en_file(etat)
+
+    def suivante(self, timeout=None):
+        """
+        Retirer la prochaine caméra à analyser (marquée en cours), ou None si le délai expire.
+        """
+        with self._condition:
+            if not self._file and not self._ferme:
+                self._condition.wait(timeout)
+            if not self._file:
+                return None
+            etat = self._file.popleft()
+            self._profondeur.fixer(len(self._file))
+            etat.en_file = False
+            etat.en_cours = True
+            return etat
+
+    def terminer(self, etat):
+        """
+        Fin de l'analyse d'une image de `etat` : la caméra repasse en fin de file si une image l'attend
+        (sauf si elle a été arrêtée).
+        """
+        with self._condition:
+            etat.en_cours = False
+            if len(etat.tampon) and not self._ferme and not etat.arretee:
+                self._mettre_en_file(etat)
+
+    def fermer(self):
+        with self._condition:
+            self._ferme = True
+            self._file.clear()
+            self._condition.notify_all()
+
+# Hôte multi-caméras *********************************************
+
+class HoteMultiCamera:
+    """
+    Service d'un hôte équipé de plusieurs caméras : un thread de capture par caméra, et une réserve
+    fixe de `nb_workers` threads d'inférence partageant un même processus et les mêmes modèles chargés.
+    Par défaut (`suivi_mediapipe=True`), chaque caméra garde sa session MediaPipe en mode suivi, qui
+    ne refait pas la détection complète à chaque image : une session par caméra. Avec
+    `suivi_mediapipe=False`, les threads empruntent des sessions en mode image (une par thread au plus,
+    sans suivi d'une image à la suivante). Le model_complexity est fixé pour tout l'hôte, pour que le
+    nombre de sessions ne soit pas multiplié par les complexités choisies au fil des images.
+    MediaPipe et OpenCV relâchent le GIL pendant l'inférence et le prétraitement.
+    Une erreur d'analyse (exception, ou résultat marqué 'erreur' par estimateur()) n'affecte que sa
+    caméra : elle est journalisée et comptée, et la caméra n'est arrêtée qu'après ERREURS_CONSECUTIVES_MAX
+    erreurs consécutives ; l'hôte ne s'arrête que si toutes ses caméras le sont.
+    """
+
+    def __init__(self, cameras, envoyer, nb_workers=None, profil=PROFIL_INFERENCE, suivi_mediapipe=SUIVI_MEDIAPIPE,
+                 model_complexity=COMPLEXITE_HOTE):
+        self.cameras = cameras            # Liste d'EtatCamera
+        self.envoyer = envoyer            # envoyer(message) : mise en file vers le concentrateur
+        self.nb_workers = nb_workers or os.cpu_count() or 1
+        self.suivi_mediapipe = suivi_mediapipe
+        self.model_complexity = model_complexity
+        self.pool = PoolSessions(profil=profil, taille_max=self.nb_workers)
+        self.ordonnanceur = Ordonnanceur()
+        self._arret = threading.Event()
+        self._erreur = None
+        self._threads = []
+
+    def prechauffer(self, resolution=(HAUTEUR_IMAGE, LARGEUR_IMAGE)):
+        """
+        Charger à l'avance la session de chaque caméra (ou, en mode image, une session par thread
+        d'inférence), pour que les premières images ne paient pas l'initialisation des graphes.
+        """
+        if self.suivi_mediapipe:
+            for etat in self.cameras:
+                self.pool.prechauffer(self.model_complexity, flux=etat.num_poste, resolution=resolution)
+            return
+        image = np.zeros((resolution[0], resolution[1], 3), dtype=np.uint8)
+        with ExitStack() as pile:
+            sessions = [pile.enter_context(self.pool.session(self.model_complexity)) for _ in range(self.nb_workers)]
+            for session in sessions:
+                session.process(image)
+
+    def _capturer(self, etat):
+        while not self._arret.is_set() and not etat.arretee:
+            try:
+                capture = etat.source.lire()
+            except Exception as e:
+                logging.error(f"Poste {etat.num_poste} - capture - Exception: {e}")
+                capture = None
+            if capture is None:
+                etat.pres_cam = "no"
+                self._arret.wait(0.1)  # Évite de boucler à vide si la caméra ne répond plus
+                continue
+            etat.pres_cam = "yes"
+            etat.nb_captures += 1
+            etat.tampon.deposer((time.time(), capture))  # Écrase l'image précédente si elle n'a pas encore été prise
+            self.ordonnanceur.signaler(etat)
+
+    def _analyser(self):
+        while not self._arret.is_set():
+            etat = self.ordonnanceur.suivante(timeout=0.5)
+            if etat is None:
+                continue
+            try:
+                element = etat.tampon.retirer(timeout=0)
+                if element is None:
+                    continue
+                t_capture, (image, frame) = element
+                del element
+                debut = time.monotonic()
+                analyse = estimateur(image, pool=self.pool, flux=etat.num_poste if self.suivi_mediapipe else None,
+                                     rgb=etat.rgb, indicateurs=etat.indicateurs, horodatage=t_capture,
+                                     roi=etat.roi, porte=etat.porte, predicteur=etat.predicteur,
+                                     journal=etat.journal, details=True, model_complexity=self.model_complexity)
+                del image, frame  # Libération au plus tôt du tampon caméra
+                duree = time.monotonic() - debut
+                etat.nb_analyses += 1
+                etat.duree_analyse += duree
+                etat.latence.observer(duree)
+                if analyse.get('erreur'):
+                    # Erreur interceptée par estimateur() (déjà journalisée) : résultat par défaut envoyé
+                    self._compter_erreur(etat, RuntimeError(f"Poste {etat.num_poste} - analyse en erreur"))
+                else:
+                    etat.erreurs_consecutives = 0
+                if etat.doit_envoyer():
+                    self.envoyer(etat.message(analyse, t_capture))
+            except Exception as e:
+                logging.error(f"Poste {etat.num_poste} - analyse - Exception: {e}")
+                self._compter_erreur(etat, e)
+            finally:
+                self.ordonnanceur.terminer(etat)
+
+    def _compter_erreur(self, etat, erreur):
+        """
+        Compter une erreur d'analyse de `etat` ; la caméra est arrêtée après ERREURS_CONSECUTIVES_MAX
+        erreurs consécutives.
+        """
+        etat.nb_erreurs += 1
+        etat.erreurs_consecutives += 1
+        etat.erreurs.inc()
+        if etat.erreurs_consecutives >= ERREURS_CONSECUTIVES_MAX:
+            self._arreter_camera(etat, erreur)
+
+    def _arreter_camera(self, etat, erreur):
+        """
+        Arrêter une caméra en échec (sa capture s'interrompt, elle n'est plus ordonnancée) ;
+        l'hôte s'arrête avec `erreur` si plus aucune caméra ne fonctionne.
+        """
+        if etat.arretee:
+            return
+        etat.arretee = True
+        logging.error(f"Poste {etat.num_poste} - {etat.erreurs_consecutives} erreurs d'analyse consécutives : "
+                      f"caméra arrêtée.")
+        if all(camera.arretee for camera in self.cameras):
+            self._erreur = erreur
+            self.arreter()
+
+    def demarrer(self):
+        """
+        Démarrer un thread de capture par caméra et les threads d'inférence.
+        """
+        for etat in self.cameras:
+            thread = threading.Thread(target=self._capturer, args=(etat,), name=f"capture-{etat.num_poste}",
+                                      daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        for numero in range(self.nb_workers):
+            thread = threading.Thread(target=self._analyser, name=f"inference-{numero}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logging.info(f"{len(self.cameras)} caméra(s), {self.nb_workers} thread(s) d'inférence.")
+
+    def arreter(self):
+        self._arret.set()
+        self.ordonnanceur.fermer()
+
+    def executer(self):
+        """
+        Démarrer l'hôte et bloquer jusqu'à son arrêt (Ctrl+C, ou toutes les caméras arrêtées sur erreur).
+        Relance l'exception qui a provoqué l'arrêt, le cas échéant.
+        """
+        self.demarrer()
+        try:
+            while not self._arret.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            logging.info("Arrêt demandé.")
+        finally:
+            self.arreter()
+            for thread in self._threads:
+                thread.join(timeout=5.0)
+            for etat in self.cameras:
+                etat.fermer()
+            self.pool.close()
+        if self._erreur is not None:
+            raise self._erreur
+
+    def statistiques(self):
+        return {etat.num_poste: etat.statistiques() for etat in self.cameras}
+
+# =======================================================================================================================
+#                                             *** PROGRAMME PRINCIPAL ***
+# =======================================================================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse de posture de plusieurs caméras sur un même hôte.")
+    parser.add_argument('--openni', nargs='*', default=[], metavar='POSTE',
+                        help="Numéros de poste des caméras OpenNI, dans l'ordre d'énumération des périphériques")
+    parser.add_argument('--video', action='append', default=[], metavar='POSTE=SOURCE',
+                        help="Source OpenCV d'un poste : index de webcam, fichier ou URL (répétable)")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="Nombre de threads d'inférence (défaut: nombre de cœurs)")
+    parser.add_argument('--profil', default=PROFIL_INFERENCE, help="Profil d'inférence (défaut: %(default)s)")
+    parser.add_argument('--sans-suivi-mediapipe', dest='suivi_mediapipe', action='store_false',
+                        help="Sessions en mode image partagées par les threads, au lieu d'une session en mode suivi "
+                             "par caméra (moins de mémoire, détection complète à chaque image)")
+    parser.add_argument('-c', '--complexite', type=int, choices=(0, 1, 2), default=COMPLEXITE_HOTE,
+                        help="model_complexity MediaPipe, fixe pour toutes les caméras (défaut: %(default)s)")
+    parser.add_argument('--concentrateur', default=IP_CONCENTRATEUR, help="Adresse du concentrateur")
+    parser.add_argument('--port', type=int, default=PORT_CONCENTRATEUR, help="Port du concentrateur")
+    parser.add_argument('--journal', default=REPERTOIRE_JOURNAL, help="Répertoire des journaux (\"\" = désactivé)")
+    parser.add_argument('--periode-envoi', type=float, default=PERIODE_ENVOI,
+                        help="Secondes entre deux messages d'une caméra (défaut: %(default)s ; 0 = à chaque image)")
+    args = parser.parse_args()
+
+    cameras = []
+    if args.openni:
+        uris = lister_openni()
+        if len(uris) < len(args.openni):
+            logging.warning(f"{len(uris)} caméra(s) OpenNI détectée(s) pour {len(args.openni)} poste(s).")
+        for num_poste, uri in zip(args.openni, uris):
+            cameras.append(EtatCamera(num_poste, SourceOpenNI(uri), args.journal, args.periode_envoi or None))
+    for definition in args.video:
+        num_poste, _, source = definition.partition('=')
+        cameras.append(EtatCamera(num_poste, SourceVideo(source), args.journal, args.periode_envoi or None))
+    if not cameras:
+        parser.error("aucune caméra (--openni ou --video)")
+
+    client_concentrateur = ClientConcentrateur(args.concentrateur, args.port, repertoire_spool=REPERTOIRE_SPOOL)
+    if REGISTRE.actif:
+        REGISTRE.servir(PORT_METRIQUES)
+
+    hote = HoteMultiCamera(cameras, client_concentrateur.envoyer, args.workers, args.profil, args.suivi_mediapipe,
+                           args.complexite)
+    hote.prechauffer()
+    try:
+        hote.executer()
+    finally:
+        logging.info(f"Statistiques par caméra: {hote.statistiques()}")
+        logging.info(f"Statistiques du transport: {client_concentrateur.statistiques()}")
+        client_concentrateur.fermer()  # Derniers messages envoyés ou conservés dans le spool
@@ -0,0 +1,176 @@
+import math                   # Pour le dimensionnement des fenêtres
+import numpy as np            # Importation de NumPy pour les mises à jour vectorisées par articulation
+
+# CONSTANTES ------------------------------------------------------------------------------------------------------------------
+
+NB_ZONES = 4                  # Codes de zone : 0 non classé, 1 vert, 2 orange, 3 rouge
+
+# FENÊTRE GLISSANTE -----------------------------------------------------------------------------------------------------------
+
+class FenetreGlissante:
+    """
+    Somme glissante d'un vecteur de compteurs sur les `duree` dernières secondes.
+    Le temps est découpé en cases de `duree_case` secondes stockées dans un tableau circulaire :
+    la mémoire est fixe quelle que soit la durée du poste, et chaque ajout coûte O(1) amorti
+    (les cases expirées sont soustraites du total au moment où elles sont réutilisées).
+    """
+
+    def __init__(self, duree, largeur, duree_case=1.0):
+        self.duree_case = duree_case
+        self.nb_cases = max(1, math.ceil(duree / duree_case))
+        self.cases = np.zeros((self.nb_cases, largeur), dtype=np.float64)
+        self.total = np.zeros(largeur, dtype=np.float64)
+        self._case_courante = None    # Numéro absolu (t // duree_case) de la case en cours
+
+    def _avancer(self, case):
+        if self._case_courante is None:
+            self._case_courante = case
+            return
+        if case <= self._case_courante:
+            return                    # Horodatage non croissant : ajout dans la case en cours
+        for numero in range(self._case_courante + 1, self._case_courante + 1 + min(case - self._case_courante, self.nb_cases)):
+            index = numero % self.nb_cases
+            self.total -= self.cases[index]
+            self.cases[index] = 0.0
+            if index == 0:
+                self.total = self.cases.sum(axis=0)  # Recalage périodique contre la dérive des arrondis
+        self._case_courante = case
+
+    def ajouter(self, t, valeurs):
+        """
+        Ajouter `valeurs` à l'instant t (en secondes) et retourner le total glissant.
+        """
+        self._avancer(int(t // self.duree_case))
+        self.cases[self._case_courante % self.nb_cases] += valeurs
+        self.total += valeurs
+        return self.total
+
+# INDICATEURS TEMPORELS -------------------------------------------------------------------------------------------------------
+
+class IndicateursGlissants:
+    """
+    Indicateurs temporels calculés au fil de l'eau, image par image, à partir des angles et des zones :
+    - exposition : % du temps passé dans chaque zone, par articulation ;
+    - répétitivité : cycles par minute par articulation, et % du temps où une articulation dépasse
+      `cadence_repetitive` cycles/min. Les cycles sont toujours rapportés à la durée de la fenêtre de
+      cadence : tant qu'elle n'est pas remplie (début de flux), la cadence est une borne basse et n'est
+      pas extrapolée à partir des premiers cycles ('cadence_complete' indique quand elle l'est) ;
+    - maintien : durée de la posture à risque en cours par articulation, et % du temps où une
+      articulation est restée hors zone verte depuis plus de `duree_maintien` secondes ;
+    - récupération : % du temps sans aucune articulation hors zone verte, parmi `articulations_recuperation`
+      (masque des articulations dont la zone verte est une vraie plage ; toutes par défaut) ;
+    - préhension : % du temps sans effort de préhension, rapporté au seul temps où le signal est fourni
+      par l'appelant ; sans signal (profil sans les mains), le pourcentage reste à 100 et le score constant.
+    Les pourcentages sont convertis en scores par les tables compilées de `tables_scores`
+    (clés 'repetitivite', 'maintien_posture', 'recuperation', 'prehension').
+    """
+
+    def __init__(self, nb_articulations, tables_scores, fenetre=600.0, fenetre_cadence=60.0,
+                 amplitude_cycle=10.0, cadence_repetitive=10.0, duree_maintien=4.0, ecart_max=5.0,
+                 articulations_recuperation=None):
+        self.nb_articulations = nb_articulations
+        self.tables_scores = tables_scores
+        self.fenetre_cadence = fenetre_cadence
+        self.amplitude_cycle = amplitude_cycle        # Amplitude minimale (en degrés) d'un demi-cycle
+        self.cadence_repetitive = cadence_repetitive  # Cycles/min au-delà desquels une articulation est "répétitive"
+        self.duree_maintien = duree_maintien          # Durée (s) au-delà de laquelle une posture est "maintenue"
+        self.ecart_max = ecart_max                    # Écart maximal (s) compté entre deux images (absence, pause)
+        self.articulations_recuperation = np.ones(nb_articulations, dtype=bool) if articulations_recuperation is None \
+            else np.asarray(articulations_recuperation, dtype=bool)
+        # Temps pondéré : [durée totale, durée par (articulation, zone)..., répétitif, maintenu, récupération,
+        #                  sans effort, préhension connue]
+        self._exposition = FenetreGlissante(fenetre, 1 + nb_articulations * NB_ZONES + 5)
+        self._cadence = FenetreGlissante(fenetre_cadence, nb_articulations)  # Inversions de sens par articulation
+        self._t_debut = None
+        self._t_precedent = None
+        # Détection des cycles : extremum courant et sens du mouvement (+1, -1, 0 = indéterminé)
+        self._extremum = np.full(nb_articulations, np.nan)
+        self._sens = np.zeros(nb_articulations, dtype=np.int8)
+        # Maintien : zone et instant de début de la posture en cours
+        self._zone_courante = np.zeros(nb_articulations, dtype=np.uint8)
+        self._debut_zone = np.zeros(nb_articulations, dtype=np.float64)
+        self._increment = np.zeros(1 + nb_articulations * NB_ZONES + 5, dtype=np.float64)
+        self._index_zones = 1 + np.arange(nb_articulations) * NB_ZONES
+
+    def _inversions(self, angles):
+        """
+        Mettre à jour le détecteur d'inversions de sens (avec hystérésis `amplitude_cycle`).
+        Retourne un vecteur 0/1 des articulations qui viennent de changer de sens.
+        """
+        valides = ~np.isnan(angles)
+        inconnu = valides & np.isnan(self._extremum)
+        self._extremum[inconnu] = angles[inconnu]
+        ecart = np.where(valides, angles - self._extremum, 0.0)
+        montee, descente = self._sens > 0, self._sens < 0
+        # Prolongement du mouvement en cours : l'extremum suit la valeur
+        prolonge = (montee & (ecart > 0)) | (descente & (ecart < 0))
+        # Inversion : retour en arrière d'au moins l'amplitude minimale depuis l'extremum
+        inversion = (montee & (ecart <= -self.amplitude_cycle)) | (descente & (ecart >= self.amplitude_cycle))
+        # Premier mouvement franc : le sens est fixé sans compter d'inversion
+        depart = (self._sens == 0) & (np.abs(ecart) >= self.amplitude_cycle)
+        change = prolonge | inversion | depart
+        self._extremum[change] = angles[change]
+        self._sens[inversion | depart] = np.sign(ecart[inversion | depart]).astype(np.int8)
+        return inversion.astype(np.float64)
+
+    def maj(self, t, angles, zones, prehension=None):
+        """
+        Intégrer une image analysée à l'instant t (en secondes, horloge croissante).
+        `angles` : vecteur (articulations,) en degrés ; `zones` : codes de zone correspondants ;
+        `prehension` : True si un effort de préhension est détecté, None si l'information n'est pas disponible.
+        Retourne un dictionnaire des pourcentages, cadences, durées de maintien et des quatre scores.
+        """
+        angles = np.asarray(angles, dtype=np.float64)
+        zones = np.asarray(zones, dtype=np.uint8)
+        if self._t_debut is None:
+            self._t_debut = t
+        duree = 0.0 if self._t_precedent is None else min(max(t - self._t_precedent, 0.0), self.ecart_max)
+        self._t_precedent = t
+
+        # Cadence : demi-cycles (inversions de sens) comptés sur la fenêtre de cadence
+        inversions = self._cadence.ajouter(t, self._inversions(angles))
+        cycles_par_minute = inversions / 2.0 / (self.fenetre_cadence / 60.0)
+        cadence_complete = t - self._t_debut >= self.fenetre_cadence
+
+        # Maintien : durée de la posture hors zone verte en cours, par articulation
+        nouvelle_zone = zones != self._zone_courante
+        self._zone_courante[nouvelle_zone] = zones[nouvelle_zone]
+        self._debut_zone[nouvelle_zone] = t
+        duree_maintien = np.where(zones >= 2, t - self._debut_zone, 0.0)
+
+        zones_recuperation = zones[self.articulations_recuperation]
+        increment = self._increment
+        increment[:] = 0.0
+        increment[0] = duree
+        increment[self._index_zones + zones] = duree
+        increment[-5] = duree * bool((cycles_par_minute >= self.cadence_repetitive).any())
+        increment[-4] = duree * bool((duree_maintien >= self.duree_maintien).any())
+        increment[-3] = duree * bool((zones_recuperation > 0).any() and not (zones_recuperation >= 2).any())
+        if prehension is not None:
+            increment[-2] = duree * (not prehension)
+            increment[-1] = duree
+        total = self._exposition.ajouter(t, increment)
+
+        temps_total = total[0]
+        if temps_total > 0:
+            repetitivite_pct, maintien_pct, recuperation_pct = 100.0 * total[-5:-2] / temps_total
+            exposition = 100.0 * total[1:-5].reshape(self.nb_articulations, NB_ZONES) / temps_total
+        else:
+            repetitivite_pct, maintien_pct, recuperation_pct = 0.0, 0.0, 100.0  # Aucune durée encore observée
+            exposition = np.zeros((self.nb_articulations, NB_ZONES))
+        sans_effort_pct = 100.0 * total[-2] / total[-1] if total[-1] > 0 else 100.0  # Sur le temps où le signal existe
+
+        return {
+            'exposition_pct': exposition,                 # (articulations, zones) en % du temps
+            'cycles_par_minute': cycles_par_minute,       # (articulations,)
+            'cadence_complete': cadence_complete,         # Fenêtre de cadence remplie
+            'duree_maintien': duree_maintien,             # (articulations,) en secondes
+            'repetitivite_pct': repetitivite_pct,
+            'maintien_posture_pct': maintien_pct,
+            'recuperation_pct': recuperation_pct,
+            'prehension_pct': sans_effort_pct,
+            'repetitivite_score': int(self.tables_scores['repetitivite'].classer(repetitivite_pct)),
+            'maintien_posture_score': int(self.tables_scores['maintien_posture'].classer(maintien_pct)),
+            'recuperation_score': int(self.tables_scores['recuperation'].classer(recuperation_pct)),
+            'prehension_score': int(self.tables_scores['prehension'].classer(sans_effort_pct)),
+        }
@@ -0,0 +1,233 @@
+import glob                   # Pour le parcours des blocs d'un journal
+import json                   # Pour le fichier de description du journal
+import logging                # Pour signaler les reprises et les rotations de blocs
+import os                     # Pour les chemins et le renommage atomique des fichiers
+import time                   # Horodatage des enregistrements (temps réel, comparable d'un jour à l'autre)
+import numpy as np            # Importation de NumPy pour les enregistrements structurés en mémoire mappée
+from moteur_angles import NB_LANDMARKS, NOMS_ARTICULATIONS, INDEX_ARTICULATION, calculer_angles
+
+# CONSTANTES ------------------------------------------------------------------------------------------------------------------
+
+VERSION_JOURNAL = 1
+NB_ARTICULATIONS = len(NOMS_ARTICULATIONS)
+
+# Enregistrement de taille fixe (une image analysée). `valide` est écrit en dernier : un enregistrement
+# interrompu par un arrêt brutal reste à 0 et est ignoré à la relecture.
+DTYPE_ENREGISTREMENT = np.dtype([
+    ('t', '<f8'),                                   # Horodatage (secondes depuis l'epoch)
+    ('valide', 'u1'),                               # 1 une fois l'enregistrement entièrement écrit
+    ('presence', 'u1'),                             # 1 si une personne est détectée
+    ('predit', 'u1'),                               # 1 si les landmarks sont prédits (sans inférence)
+    ('landmarks', '<f4', (NB_LANDMARKS, 4)),        # x, y, z, visibilité (image entière, normalisés)
+    ('angles', '<f4', (NB_ARTICULATIONS,)),         # Angles en degrés (NaN si non calculable)
+    ('zones', 'u1', (NB_ARTICULATIONS,)),           # Codes de zone (0 non classé, 1 vert, 2 orange, 3 rouge)
+])
+
+CAPACITE_BLOC = 36000         # Enregistrements par bloc (1 h à 10 images/s, environ 21 Mo)
+SYNCHRO_TOUTES = 100          # Écriture sur disque (msync) toutes les N images
+
+# ÉCRITURE --------------------------------------------------------------------------------------------------------------------
+
+class JournalLandmarks:
+    """
+    Journal binaire d'une session : pour chaque image analysée, horodatage, 33 landmarks de pose,
+    angles articulaires et codes de zone, dans des blocs `bloc_NNNNNN.npy` de taille fixe.
+
+    Chaque bloc est un tableau NumPy structuré (DTYPE_ENREGISTREMENT) préalloué puis mappé en mémoire :
+    un ajout est une simple écriture dans la page, sans sérialisation. Le bloc n'apparaît sous son nom
+    définitif qu'une fois son en-tête écrit (renommage atomique) ; les enregistrements ne sont jamais
+    réécrits. Après un arrêt du processus, les enregistrements déjà écrits sont conservés ; après une
+    coupure de courant, au moins ceux antérieurs à la dernière synchronisation. À la réouverture,
+    l'écriture reprend après le dernier enregistrement valide du dernier bloc.
+    """
+
+    def __init__(self, repertoire, capacite_bloc=CAPACITE_BLOC, synchro_toutes=SYNCHRO_TOUTES, rapport_aspect=1.0):
+        self.repertoire = repertoire
+        self.capacite_bloc = capacite_bloc
+        self.synchro_toutes = synchro_toutes
+        self.nb_enregistrements = 0
+        self._bloc = None             # Tableau mappé du bloc courant
+        self._numero = -1             # Numéro du bloc courant
+        self._position = 0            # Prochain enregistrement à écrire dans le bloc courant
+        self._non_synchronises = 0
+        os.makedirs(repertoire, exist_ok=True)
+        self._ecrire_description(rapport_aspect)
+        self._reprendre()
+
+    def _ecrire_description(self, rapport_aspect):
+        chemin = os.path.join(self.repertoire, 'journal.json')
+        if os.path.exists(chemin):
+            return
+        description = {
+            'version': VERSION_JOURNAL,
+            'articulations': list(NOMS_ARTICULATIONS),
+            'rapport_aspect': rapport_aspect,   # Largeur / hauteur de l'image, pour recalculer les angles
+            'dtype': str(DTYPE_ENREGISTREMENT.descr),
+        }
+        with open(chemin + '.tmp', 'w') as fichier:
+            json.dump(description, fichier, indent=2, ensure_ascii=False)
+        os.replace(chemin + '.tmp', chemin)
+
+    def _reprendre(self):
+        """
+        Rouvrir le dernier bloc existant et se placer après son dernier enregistrement valide.
+        """
+        blocs = lister_blocs(self.repertoire)
+        if not blocs:
+            self._ouvrir(0)
+            return
+        dernier = blocs[-1]
+        numero = int(os.path.basename(dernier)[5:11])
+        bloc = np.load(dernier, mmap_mode='r+')
+        position = nb_valides(bloc)
+        if position >= len(bloc):
+            del bloc
+            self._ouvrir(numero + 1)
+            return
+        self._bloc, self._numero, self._position = bloc, numero, position
+        logging.info(f"Journal {self.repertoire}: reprise du bloc {numero} à l'enregistrement {position}.")
+
+    def _ouvrir(self, numero):
+        """
+        Créer le bloc `numero` (préalloué, enregistrements à 0) et le mapper en mémoire.
+        """
+        self._fermer_bloc()
+        chemin = chemin_bloc(self.repertoire, numero)
+        temporaire = chemin + '.tmp'
+        bloc = np.lib.format.open_memmap(temporaire, mode='w+', dtype=DTYPE_ENREGISTREMENT,
+                                         shape=(self.capacite_bloc,))
+        bloc.flush()
+        os.replace(temporaire, chemin)  # Le mappage reste valide après le renommage
+        self._bloc, self._numero, self._position = bloc, numero, 0
+        logging.info(f"Journal {self.repertoire}: nouveau bloc {numero}.")
+
+    def _fermer_bloc(self):
+        if self._bloc is not None:
+            self._bloc.flush()
+            self._bloc = None
+            self._non_synchronises = 0
+
+    def ajouter(self, landmarks=None, angles=None, zones=None, t=None, presence=1, predit=False):
+        """
+        Ajouter l'enregistrement d'une image. `landmarks` (33, 4), `angles` et `zones` (articulations,)
+        valent NaN / 0 s'ils sont absents (aucune personne détectée). `t` : secondes depuis l'epoch.
+        """
+        if self._bloc is None:
+            raise RuntimeError("Journal fermé.")
+        if self._position >= len(self._bloc):
+            self._ouvrir(self._numero + 1)
+        enregistrement = self._bloc[self._position]
+        enregistrement['t'] = time.time() if t is None else t
+        enregistrement['presence'] = presence
+        enregistrement['predit'] = predit
+        enregistrement['landmarks'] = np.nan if landmarks is None else landmarks
+        enregistrement['angles'] = np.nan if angles is None else angles
+        enregistrement['zones'] = 0 if zones is None else zones
+        enregistrement['valide'] = 1   # En dernier : l'enregistrement est complet
+        self._position += 1
+        self.nb_enregistrements += 1
+        self._non_synchronises += 1
+        if self._non_synchronises >= self.synchro_toutes:
+            self.synchroniser()
+
+    def synchroniser(self):
+        """
+        Forcer l'écriture sur disque des enregistrements du bloc courant.
+        """
+        if self._bloc is not None:
+            self._bloc.flush()
+        self._non_synchronises = 0
+
+    def close(self):
+        self._fermer_bloc()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# RELECTURE -------------------------------------------------------------------------------------------------------------------
+
+def chemin_bloc(repertoire, numero):
+    return os.path.join(repertoire, f"bloc_{numero:06d}.npy")
+
+def lister_blocs(repertoire):
+    """
+    Chemins des blocs d'un journal, dans l'ordre d'écriture (les blocs en cours de création sont ignorés).
+    """
+    return sorted(glob.glob(os.path.join(repertoire, 'bloc_[0-9][0-9][0-9][0-9][0-9][0-9].npy')))
+
+def nb_valides(bloc):
+    """
+    Nombre d'enregistrements valides en tête de bloc (l'écriture étant séquentielle, ils sont contigus).
+    """
+    invalides = np.flatnonzero(bloc['valide'] == 0)
+    return int(invalides[0]) if invalides.size else len(bloc)
+
+def lire_description(repertoire):
+    with open(os.path.join(repertoire, 'journal.json')) as fichier:
+        return json.load(fichier)
+
+def lire_journal(repertoire, debut=None, fin=None):
+    """
+    Parcourir les enregistrements valides d'un journal, bloc par bloc : chaque élément produit est une vue
+    en lecture seule (mappée, sans copie) sur les enregistrements du bloc compris dans [debut, fin[.
+    """
+    for chemin in lister_blocs(repertoire):
+        bloc = np.load(chemin, mmap_mode='r')
+        bloc = bloc[:nb_valides(bloc)]
+        if len(bloc) == 0:
+            continue
+        if (debut is not None and bloc['t'][-1] < debut) or (fin is not None and bloc['t'][0] >= fin):
+            continue  # Bloc entièrement hors de l'intervalle demandé
+        if debut is not None or fin is not None:
+            t = bloc['t']
+            bloc = bloc[(t >= (-np.inf if debut is None else debut)) & (t < (np.inf if fin is None else fin))]
+        yield bloc
+
+def charger_journal(repertoire, debut=None, fin=None):
+    """
+    Enregistrements valides de [debut, fin[ réunis en un seul tableau structuré (copie en mémoire).
+    """
+    blocs = list(lire_journal(repertoire, debut, fin))
+    if not blocs:
+        return np.zeros(0, dtype=DTYPE_ENREGISTREMENT)
+    return np.concatenate(blocs)
+
+def rejouer(repertoire, tables=None, indicateurs=None, recalculer_angles=False, debut=None, fin=None):
+    """
+    Rejouer un journal avec d'autres seuils ou une autre logique d'indicateurs, sans vidéo ni MediaPipe.
+
+    `tables` : TableColonnes (voir tables_zones.compiler_seuils_articulations) pour reclasser les angles,
+    ou None pour garder les zones enregistrées ; `indicateurs` : IndicateursGlissants neuf, mis à jour
+    image par image sur les horodatages enregistrés ; `recalculer_angles` : recalculer les angles à partir
+    des landmarks (après une évolution de moteur_angles).
+    Retourne un dictionnaire : 't', 'presence', 'angles', 'zones' et, si `indicateurs` est fourni,
+    'scores' (images, 4) dans l'ordre répétitivité, maintien, récupération, préhension.
+    Comme en direct, seules les images avec une personne et une flexion du cou calculable alimentent
+    les indicateurs ; les scores des autres restent à 0.
+    """
+    enregistrements = charger_journal(repertoire, debut, fin)
+    presence = enregistrements['presence'].astype(bool)
+    if recalculer_angles and len(enregistrements):
+        rapport_aspect = lire_description(repertoire).get('rapport_aspect', 1.0)
+        angles = calculer_angles(enregistrements['landmarks'], rapport_aspect=rapport_aspect)
+        angles[~presence] = np.nan
+    else:
+        angles = enregistrements['angles']
+    if tables is not None:
+        zones = tables.classer(angles)
+    else:
+        zones = enregistrements['zones']
+    resultat = {'t': enregistrements['t'], 'presence': presence, 'angles': angles, 'zones': zones}
+
+    if indicateurs is not None:
+        scores = np.zeros((len(enregistrements), 4), dtype=np.uint8)
+        analysees = presence & ~np.isnan(angles[:, INDEX_ARTICULATION['flexion_cou']])
+        for i in np.flatnonzero(analysees):
+            valeurs = indicateurs.maj(enregistrements['t'][i], angles[i], zones[i])
+            scores[i] = (valeurs['repetitivite_score'], valeurs['maintien_posture_score'],
+                         valeurs['recuperation_score'], valeurs['prehension_score'])
+        resultat['scores'] = scores
+    return resultat
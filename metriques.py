@@ -0,0 +1,249 @@
+import bisect                 # Recherche de la case d'un histogramme
+import http.server            # Point d'accès texte local
+import json                   # Fichier de statistiques
+import logging                # Pour signaler les erreurs d'exposition
+import os                     # Variable d'environnement d'activation et écriture atomique
+import threading              # Threads du serveur et de l'écriture périodique
+import time                   # Horloge monotone des chronomètres
+from contextlib import contextmanager  # Chronomètre sous forme de bloc "with"
+
+# CONSTANTES ------------------------------------------------------------------------------------------------------------------
+
+PREFIXE = 'posture_'
+# Bornes supérieures (en secondes) des cases des histogrammes de latence, fixes pour toutes les mesures
+BORNES_LATENCE = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+# MÉTRIQUES -------------------------------------------------------------------------------------------------------------------
+
+class Compteur:
+    """
+    Compteur croissant (images traitées, erreurs...).
+    """
+
+    def __init__(self, registre, nom, aide=""):
+        self._registre = registre
+        self.nom = nom
+        self.aide = aide
+        self.valeur = 0
+        self._verrou = threading.Lock()
+
+    def inc(self, n=1):
+        if self._registre.actif:
+            with self._verrou:
+                self.valeur += n
+
+class Jauge:
+    """
+    Valeur instantanée (profondeur d'une file, état d'une connexion...).
+    """
+
+    def __init__(self, registre, nom, aide=""):
+        self._registre = registre
+        self.nom = nom
+        self.aide = aide
+        self.valeur = 0.0
+
+    def fixer(self, valeur):
+        if self._registre.actif:
+            self.valeur = valeur
+
+class Histogramme:
+    """
+    Histogramme de latences à cases fixes (BORNES_LATENCE) : mémoire constante, ajout en O(log cases),
+    percentiles estimés par la borne supérieure de la case qui les contient.
+    """
+
+    def __init__(self, registre, nom, aide="", bornes=BORNES_LATENCE):
+        self._registre = registre
+        self.nom = nom
+        self.aide = aide
+        self.bornes = tuple(bornes)
+        self.cases = [0] * (len(self.bornes) + 1)   # Dernière case : au-delà de la plus grande borne
+        self.nb = 0
+        self.somme = 0.0
+        self.maximum = 0.0
+        self._verrou = threading.Lock()
+
+    def observer(self, duree):
+        """
+        Ajouter une durée en secondes.
+        """
+        if not self._registre.actif:
+            return
+        case = bisect.bisect_left(self.bornes, duree)
+        with self._verrou:
+            self.cases[case] += 1
+            self.nb += 1
+            self.somme += duree
+            if duree > self.maximum:
+                self.maximum = duree
+
+    def copie(self):
+        """
+        (cases, nb, somme, maximum) lus ensemble, pour une exposition cohérente.
+        """
+        with self._verrou:
+            return list(self.cases), self.nb, self.somme, self.maximum
+
+    def percentile(self, p, copie=None):
+        cases, nb, _, maximum = self.copie() if copie is None else copie
+        if not nb:
+            return 0.0
+        rang = p / 100.0 * nb
+        cumul = 0
+        for borne, nb_case in zip(self.bornes + (maximum,), cases):
+            cumul += nb_case
+            if cumul >= rang:
+                return min(borne, maximum)
+        return maximum
+
+    def resume(self):
+        copie = self.copie()
+        _, nb, somme, maximum = copie
+        return {
+            'nb': nb,
+            'moyenne_ms': 1e3 * somme / nb if nb else 0.0,
+            'p50_ms': 1e3 * self.percentile(50, copie),
+            'p95_ms': 1e3 * self.percentile(95, copie),
+            'p99_ms': 1e3 * self.percentile(99, copie),
+            'max_ms': 1e3 * maximum,
+        }
+
+# REGISTRE --------------------------------------------------------------------------------------------------------------------
+
+class Registre:
+    """
+    Ensemble des métriques d'un processus, exposées au format texte (type Prometheus) sur un port local
+    ou écrites périodiquement dans un fichier JSON.
+    Désactivé, chaque mise à jour se réduit à un test booléen : les métriques peuvent rester
+    dans le chemin critique. Activé, compteurs et histogrammes prennent un verrou propre à la métrique
+    (non contendu dans le cas courant) : une même métrique peut être mise à jour par plusieurs threads,
+    comme images_total par les threads d'inférence de l'hôte multi-caméras.
+    """
+
+    def __init__(self, actif=False):
+        self.actif = actif
+        self._metriques = {}
+        self._verrou = threading.Lock()
+        self._serveur = None
+        self._arret = threading.Event()
+        self.t_demarrage = time.time()
+
+    def _obtenir(self, classe, nom, *args):
+        with self._verrou:
+            metrique = self._metriques.get(nom)
+            if metrique is None:
+                metrique = self._metriques[nom] = classe(self, nom, *args)
+            return metrique
+
+    def compteur(self, nom, aide=""):
+        return self._obtenir(Compteur, nom, aide)
+
+    def jauge(self, nom, aide=""):
+        return self._obtenir(Jauge, nom, aide)
+
+    def histogramme(self, nom, aide="", bornes=BORNES_LATENCE):
+        return self._obtenir(Histogramme, nom, aide, bornes)
+
+    @contextmanager
+    def chrono(self, histogramme):
+        """
+        Mesurer la durée du bloc "with" (horloge monotone) dans `histogramme`.
+        """
+        if not self.actif:
+            yield
+            return
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogramme.observer(time.perf_counter() - debut)
+
+    def texte(self):
+        """
+        Exposition texte de toutes les métriques (format Prometheus).
+        """
+        lignes = []
+        with self._verrou:
+            metriques = list(self._metriques.values())
+        for metrique in metriques:
+            nom = PREFIXE + metrique.nom
+            if metrique.aide:
+                lignes.append(f"# HELP {nom} {metrique.aide}")
+            if isinstance(metrique, Histogramme):
+                lignes.append(f"# TYPE {nom} histogram")
+                cases, total, somme, _ = metrique.copie()
+                cumul = 0
+                for borne, nb in zip(metrique.bornes, cases):
+                    cumul += nb
+                    lignes.append(f'{nom}_bucket{{le="{borne:g}"}} {cumul}')
+                lignes.append(f'{nom}_bucket{{le="+Inf"}} {total}')
+                lignes.append(f"{nom}_sum {somme:.6f}")
+                lignes.append(f"{nom}_count {total}")
+            else:
+                lignes.append(f"# TYPE {nom} {'counter' if isinstance(metrique, Compteur) else 'gauge'}")
+                lignes.append(f"{nom} {metrique.valeur}")
+        return '\n'.join(lignes) + '\n'
+
+    def instantane(self):
+        """
+        Toutes les métriques sous forme de dictionnaire (histogrammes résumés en percentiles).
+        """
+        with self._verrou:
+            metriques = list(self._metriques.values())
+        return {
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'duree_s': round(time.time() - self.t_demarrage, 1),
+            'metriques': {m.nom: m.resume() if isinstance(m, Histogramme) else m.valeur for m in metriques},
+        }
+
+    def servir(self, port, hote='127.0.0.1'):
+        """
+        Exposer texte() en HTTP sur un port local, dans un thread dédié.
+        """
+        registre = self
+
+        class Gestionnaire(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                contenu = registre.texte().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(contenu)))
+                self.end_headers()
+                self.wfile.write(contenu)
+
+            def log_message(self, *args):
+                pass  # Pas de journalisation de chaque requête
+
+        self._serveur = http.server.ThreadingHTTPServer((hote, port), Gestionnaire)
+        threading.Thread(target=self._serveur.serve_forever, name="metriques", daemon=True).start()
+        logging.info(f"Métriques exposées sur http://{hote}:{port}/")
+
+    def ecrire(self, fichier):
+        temporaire = f"{fichier}.tmp"
+        with open(temporaire, 'w') as sortie:
+            json.dump(self.instantane(), sortie, indent=1, ensure_ascii=False)
+        os.replace(temporaire, fichier)
+
+    def ecrire_periodiquement(self, fichier, periode=10.0):
+        """
+        Réécrire `fichier` (JSON, écriture atomique) toutes les `periode` secondes, dans un thread dédié.
+        """
+        def boucle():
+            while not self._arret.wait(periode):
+                try:
+                    self.ecrire(fichier)
+                except OSError as e:
+                    logging.error(f"Écriture des métriques impossible: {e}")
+
+        threading.Thread(target=boucle, name="metriques-fichier", daemon=True).start()
+
+    def arreter(self):
+        self._arret.set()
+        if self._serveur is not None:
+            self._serveur.shutdown()
+            self._serveur.server_close()
+            self._serveur = None
+
+# Registre du processus, activé par POSTURE_METRIQUES=1 (ou REGISTRE.actif = True au démarrage)
+REGISTRE = Registre(actif=os.environ.get('POSTURE_METRIQUES', '0') == '1')
@@ -0,0 +1,141 @@
+import numpy as np            # Importation de NumPy pour le calcul vectorisé des angles
+
+# INDICES DES LANDMARKS DE POSE (MediaPipe, 33 points) ------------------------------------------------------------------------
+
+NEZ = 0
+OREILLE_GAUCHE, OREILLE_DROITE = 7, 8
+EPAULE_GAUCHE, EPAULE_DROITE = 11, 12
+COUDE_GAUCHE, COUDE_DROIT = 13, 14
+POIGNET_GAUCHE, POIGNET_DROIT = 15, 16
+HANCHE_GAUCHE, HANCHE_DROITE = 23, 24
+NB_LANDMARKS = 33
+
+# ARTICULATIONS CALCULÉES -----------------------------------------------------------------------------------------------------
+
+# Colonnes de la matrice d'angles : (nom de la colonne, clé du dictionnaire `thresholds` qui la classe)
+ARTICULATIONS = (
+    ('extension_coude_gauche', 'extension_coudes'),
+    ('extension_coude_droit', 'extension_coudes'),
+    ('rotation_epaule_gauche', 'rotation_epaules'),
+    ('rotation_epaule_droite', 'rotation_epaules'),
+    ('elevation_epaule_gauche', 'elevation_epaules'),
+    ('elevation_epaule_droite', 'elevation_epaules'),
+    ('flexion_cou', 'flexion_cou'),
+    ('rotation_buste', 'rotation_buste'),
+    ('flexion_buste', 'flexion_buste'),
+)
+NOMS_ARTICULATIONS = tuple(nom for nom, _ in ARTICULATIONS)
+INDEX_ARTICULATION = {nom: i for i, nom in enumerate(NOMS_ARTICULATIONS)}
+
+SEUIL_VISIBILITE = 0.5  # Landmarks moins visibles que ce seuil considérés comme absents (entrée à 4 composantes)
+
+# FONCTIONS VECTORISÉES -------------------------------------------------------------------------------------------------------
+
+def _produit_scalaire(u, v):
+    return np.einsum('...i,...i->...', u, v)
+
+def _angle_entre(u, v):
+    """
+    Angle en degrés entre les vecteurs u et v (dernière dimension), NaN si l'un des deux est nul.
+    """
+    normes = np.sqrt(_produit_scalaire(u, u) * _produit_scalaire(v, v))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cos_angle = _produit_scalaire(u, v) / normes
+    cos_angle = np.where(normes > 0, np.clip(cos_angle, -1.0, 1.0), np.nan)
+    return np.degrees(np.arccos(cos_angle))
+
+def _projeter_orthogonal(v, axe):
+    """
+    Composante de v orthogonale à `axe` (projection sur le plan perpendiculaire à l'axe).
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        coefficient = _produit_scalaire(v, axe) / _produit_scalaire(axe, axe)
+    return v - coefficient[..., None] * axe
+
+def angles_au_sommet(a, b, c):
+    """
+    Angle en degrés au point b entre les segments ba et bc, pour des tableaux de points (..., 2|3).
+    """
+    return _angle_entre(a - b, c - b)
+
+def calculer_angles(landmarks, rapport_aspect=1.0, avec_reference=False):
+    """
+    Calculer en une passe vectorisée tous les angles articulaires de ARTICULATIONS.
+
+    `landmarks` : tableau (images, 33, 2|3|4) de coordonnées normalisées MediaPipe (x, y[, z][, visibilité]).
+    `rapport_aspect` : largeur / hauteur de l'image, pour ramener x et z dans l'échelle de y.
+    Retourne une matrice float32 (images, articulations) en degrés. Les angles qui ne peuvent pas être
+    calculés valent NaN : landmark absent ou peu visible, segment de longueur nulle, ou rotation
+    demandant la profondeur (z) alors que l'entrée est en 2D. La flexion du cou ne demande pas les hanches.
+    Avec `avec_reference=True`, retourne (angles, cou_verticale) : `cou_verticale` (images,) indique
+    les images dont la flexion du cou est mesurée par rapport à la verticale de l'image (hanches absentes).
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    if landmarks.ndim == 2:
+        landmarks = landmarks[None]
+    nb_images, _, nb_composantes = landmarks.shape
+    points = landmarks[..., :min(nb_composantes, 3)].copy()
+    points[..., 0] *= rapport_aspect
+    if points.shape[-1] == 3:
+        points[..., 2] *= rapport_aspect  # z MediaPipe est à la même échelle que x
+    if nb_composantes == 4:
+        points[landmarks[..., 3] < SEUIL_VISIBILITE] = np.nan
+    en_3d = points.shape[-1] == 3
+
+    epaule_g, epaule_d = points[:, EPAULE_GAUCHE], points[:, EPAULE_DROITE]
+    coude_g, coude_d = points[:, COUDE_GAUCHE], points[:, COUDE_DROIT]
+    poignet_g, poignet_d = points[:, POIGNET_GAUCHE], points[:, POIGNET_DROIT]
+    hanche_g, hanche_d = points[:, HANCHE_GAUCHE], points[:, HANCHE_DROITE]
+    cou = (epaule_g + epaule_d) / 2                  # Milieu des épaules
+    bassin = (hanche_g + hanche_d) / 2               # Milieu des hanches
+    tete = (points[:, OREILLE_GAUCHE] + points[:, OREILLE_DROITE]) / 2
+    axe_tronc = cou - bassin                         # Axe du tronc, orienté vers le haut
+    verticale = np.zeros_like(axe_tronc)
+    verticale[:, 1] = -1.0                           # y croît vers le bas dans l'image
+
+    angles = np.full((nb_images, len(ARTICULATIONS)), np.nan, dtype=np.float32)
+    i = INDEX_ARTICULATION
+
+    # Extension des coudes : angle épaule-coude-poignet (180° = bras tendu)
+    angles[:, i['extension_coude_gauche']] = angles_au_sommet(epaule_g, coude_g, poignet_g)
+    angles[:, i['extension_coude_droit']] = angles_au_sommet(epaule_d, coude_d, poignet_d)
+
+    # Élévation des épaules : angle hanche-épaule-coude (0° = bras le long du corps)
+    angles[:, i['elevation_epaule_gauche']] = angles_au_sommet(hanche_g, epaule_g, coude_g)
+    angles[:, i['elevation_epaule_droite']] = angles_au_sommet(hanche_d, epaule_d, coude_d)
+
+    # Flexion du buste : inclinaison de l'axe du tronc par rapport à la verticale
+    angles[:, i['flexion_buste']] = _angle_entre(axe_tronc, verticale)
+
+    # Flexion du cou : inclinaison de l'axe cou-tête par rapport à l'axe du tronc,
+    # positive si la tête penche du côté vers lequel pointe le nez, négative en extension.
+    # Sans hanches visibles (opérateur assis, bas du corps masqué par le poste), la référence est
+    # la verticale de l'image redressée perpendiculairement à la ligne des épaules.
+    axe_epaules = _projeter_orthogonal(verticale, epaule_d - epaule_g)
+    axe_epaules = np.where(np.isnan(axe_epaules).any(axis=-1, keepdims=True), verticale, axe_epaules)
+    cou_verticale = np.isnan(axe_tronc).any(axis=-1)
+    reference_cou = np.where(cou_verticale[:, None], axe_epaules, axe_tronc)
+    axe_cou = tete - cou
+    flexion_cou = _angle_entre(axe_cou, reference_cou)
+    sens = np.sign(_produit_scalaire(_projeter_orthogonal(axe_cou, reference_cou), points[:, NEZ] - tete))
+    angles[:, i['flexion_cou']] = np.where(sens < 0, -flexion_cou, flexion_cou)
+
+    if en_3d:
+        # Direction "avant" du tronc : normale au plan frontal (axe du tronc, ligne des épaules)
+        avant = np.cross(axe_tronc, epaule_d - epaule_g)
+
+        # Rotation des épaules : orientation de l'avant-bras autour de l'axe du bras,
+        # mesurée par rapport à la direction avant (0° = avant-bras vers l'avant)
+        for cote, epaule, coude, poignet in (('gauche', epaule_g, coude_g, poignet_g),
+                                             ('droite', epaule_d, coude_d, poignet_d)):
+            bras = coude - epaule
+            angles[:, i[f'rotation_epaule_{cote}']] = _angle_entre(
+                _projeter_orthogonal(poignet - coude, bras), _projeter_orthogonal(avant, bras))
+
+        # Rotation du buste : torsion entre la ligne des épaules et celle des hanches,
+        # toutes deux projetées sur le plan perpendiculaire à l'axe du tronc
+        angles[:, i['rotation_buste']] = _angle_entre(
+            _projeter_orthogonal(epaule_d - epaule_g, axe_tronc),
+            _projeter_orthogonal(hanche_d - hanche_g, axe_tronc))
+
+    return (angles, cou_verticale) if avec_reference else angles
@@ -0,0 +1,225 @@
+import threading                 # Threads des étages capture / inférence / envoi
+import time                      # Horloge monotone pour la mesure des étages
+import logging                   # Pour la gestion des messages de log
+from collections import deque    # File à taille fixe pour les tampons circulaires
+from datetime import datetime    # Horodatage des captures
+from metriques import REGISTRE   # Profondeur des tampons et latence des étages
+
+# TAMPON CIRCULAIRE -----------------------------------------------------------------------------------------------------------
+
+class TamponCirculaire:
+    """
+    File bornée entre deux étages du pipeline.
+    Quand elle est pleine, le dépôt écrase l'élément le plus ancien (politique "drop-oldest") :
+    un étage lent ne bloque jamais l'étage qui l'alimente, il reçoit seulement les données les plus récentes.
+    """
+
+    def __init__(self, capacite, nom=""):
+        self.capacite = capacite
+        self.nom = nom
+        self._elements = deque(maxlen=capacite)
+        self._condition = threading.Condition()
+        self._ferme = False
+        self.nb_deposes = 0       # Nombre total d'éléments déposés
+        self.nb_ecrases = 0       # Nombre d'éléments perdus faute de place (contre-pression)
+        self.occupation_max = 0   # Profondeur maximale atteinte
+        self._profondeur = REGISTRE.jauge(f"tampon_{nom}_profondeur", f"Éléments en attente dans le tampon {nom}")
+        self._ecrases = REGISTRE.compteur(f"tampon_{nom}_ecrases_total", f"Éléments écrasés dans le tampon {nom}")
+
+    def deposer(self, element):
+        """
+        Déposer un élément, en écrasant le plus ancien si le tampon est plein.
+        """
+        with self._condition:
+            if len(self._elements) == self.capacite:
+                self.nb_ecrases += 1
+                self._ecrases.inc()
+            self._elements.append(element)
+            self.nb_deposes += 1
+            self.occupation_max = max(self.occupation_max, len(self._elements))
+            self._profondeur.fixer(len(self._elements))
+            self._condition.notify()
+
+    def retirer(self, timeout=None):
+        """
+        Retirer l'élément le plus ancien, en attendant au plus `timeout` secondes.
+        Retourne None si le délai expire ou si le tampon est fermé et vide.
+        """
+        with self._condition:
+            if not self._elements and not self._ferme:
+                self._condition.wait(timeout)
+            if self._elements:
+                element = self._elements.popleft()
+                self._profondeur.fixer(len(self._elements))
+                return element
+            return None
+
+    def fermer(self):
+        """
+        Fermer le tampon et réveiller les consommateurs en attente.
+        """
+        with self._condition:
+            self._ferme = True
+            self._condition.notify_all()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._elements)
+
+    def statistiques(self):
+        with self._condition:
+            return {
+                'profondeur': len(self._elements),
+                'capacite': self.capacite,
+                'deposes': self.nb_deposes,
+                'ecrases': self.nb_ecrases,
+                'occupation_max': self.occupation_max,
+            }
+
+# PIPELINE CAPTURE / INFÉRENCE / ENVOI ----------------------------------------------------------------------------------------
+
+class PipelineStation:
+    """
+    Exécution en pipeline des trois étages d'un poste : capture, analyse et envoi,
+    chacun dans son propre thread, reliés par des tampons circulaires bornés.
+    Le débit en régime établi est fixé par l'étage le plus lent, et non par la somme des étages.
+
+    - capturer() -> donnée capturée, ou None si la capture a échoué ;
+    - analyser(donnee) -> résultat, ou None pour ne rien envoyer ;
+    - envoyer(horodatage, resultat) : `horodatage` est l'instant de la capture (datetime).
+
+    Avec `periode_envoi`, au plus un résultat est envoyé par période : le premier disponible à chaque
+    échéance. Les images intermédiaires restent capturées et analysées (la porte de mouvement et la
+    prédiction des keypoints les rendent peu coûteuses) pour les indicateurs, mais ne sont pas envoyées.
+
+    Une exception remontée par l'un des trois étages arrête le pipeline et est relancée par executer().
+    """
+
+    def __init__(self, capturer, analyser, envoyer, capacite=2, periode=None, periode_envoi=None):
+        self.capturer = capturer
+        self.analyser = analyser
+        self.envoyer = envoyer
+        self.periode = periode    # Période minimale entre deux captures (None = au rythme de la caméra)
+        self.periode_envoi = periode_envoi  # Période des envois (None = un envoi par image analysée)
+        self._prochain_envoi = None
+        self.tampon_images = TamponCirculaire(capacite, "images")
+        self.tampon_messages = TamponCirculaire(capacite, "messages")
+        self._arret = threading.Event()
+        self._erreur = None
+        self._threads = []
+        self._compteurs = {
+            etage: {'traites': 0, 'ignores': 0, 'duree_totale': 0.0}
+            for etage in ('capture', 'analyse', 'envoi')
+        }
+        self._latences = {
+            etage: REGISTRE.histogramme(f"etage_{etage}_secondes", f"Durée de l'étage {etage} du pipeline")
+            for etage in ('capture', 'analyse', 'envoi')
+        }
+
+    def _compter(self, etage, debut, traite=True):
+        compteur = self._compteurs[etage]
+        duree = time.monotonic() - debut
+        compteur['duree_totale'] += duree
+        self._latences[etage].observer(duree)
+        compteur['traites' if traite else 'ignores'] += 1
+
+    def _boucle(self, etage, fonction):
+        try:
+            while not self._arret.is_set():
+                fonction()
+        except Exception as e:
+            logging.error(f"PipelineStation - étage {etage} - Exception: {e}")
+            self._erreur = e
+            self.arreter()
+
+    def _etage_capture(self):
+        debut = time.monotonic()
+        horodatage = datetime.now()  # Horodatage pris au moment de la capture
+        donnee = self.capturer()
+        self._compter('capture', debut, donnee is not None)
+        if donnee is not None:
+            self.tampon_images.deposer((horodatage, donnee))
+        if self.periode is not None:
+            reste = self.periode - (time.monotonic() - debut)
+            if reste > 0:
+                self._arret.wait(reste)
+
+    def _etage_analyse(self):
+        element = self.tampon_images.retirer(timeout=0.5)
+        if element is None:
+            return
+        horodatage, donnee = element
+        del element
+        debut = time.monotonic()
+        resultat = self.analyser(donnee)
+        del donnee  # Libération au plus tôt de l'image (et du tampon caméra associé)
+        self._compter('analyse', debut, resultat is not None)
+        if resultat is not None:
+            self.tampon_messages.deposer((horodatage, resultat))
+
+    def _etage_envoi(self):
+        element = self.tampon_messages.retirer(timeout=0.5)
+        if element is None:
+            return
+        if self.periode_envoi is not None:
+            maintenant = time.monotonic()
+            if self._prochain_envoi is not None and maintenant < self._prochain_envoi:
+                self._compteurs['envoi']['ignores'] += 1  # Résultat intermédiaire, non envoyé
+                return
+            # Échéances régulières ; après un retard de plus d'une période, reprise à partir de maintenant
+            prochain = (maintenant if self._prochain_envoi is None else self._prochain_envoi) + self.periode_envoi
+            self._prochain_envoi = prochain if prochain > maintenant else maintenant + self.periode_envoi
+        debut = time.monotonic()
+        self.envoyer(*element)
+        self._compter('envoi', debut)
+
+    def demarrer(self):
+        """
+        Démarrer les trois threads du pipeline.
+        """
+        for etage, fonction in (('capture', self._etage_capture),
+                                ('analyse', self._etage_analyse),
+                                ('envoi', self._etage_envoi)):
+            thread = threading.Thread(target=self._boucle, args=(etage, fonction),
+                                      name=f"pipeline-{etage}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def arreter(self):
+        """
+        Demander l'arrêt des trois étages.
+        """
+        self._arret.set()
+        self.tampon_images.fermer()
+        self.tampon_messages.fermer()
+
+    def executer(self):
+        """
+        Démarrer le pipeline et bloquer jusqu'à son arrêt.
+        Relance l'exception qui a provoqué l'arrêt, le cas échéant.
+        """
+        self.demarrer()
+        try:
+            while not self._arret.wait(1.0):
+                pass
+        finally:
+            self.arreter()
+            for thread in self._threads:
+                if thread is not threading.current_thread():
+                    thread.join(timeout=5.0)
+        if self._erreur is not None:
+            raise self._erreur
+
+    def statistiques(self):
+        """
+        Compteurs par étage et par tampon (éléments traités, ignorés, écrasés, temps moyen).
+        """
+        etages = {}
+        for etage, compteur in self._compteurs.items():
+            total = compteur['traites'] + compteur['ignores']
+            etages[etage] = dict(compteur, duree_moyenne=compteur['duree_totale'] / total if total else 0.0)
+        return {
+            'etages': etages,
+            'tampon_images': self.tampon_images.statistiques(),
+            'tampon_messages': self.tampon_messages.statistiques(),
+        }
@@ -0,0 +1,84 @@
+import time                   # Horloge monotone pour l'ancienneté du dernier résultat
+import cv2                    # Réduction de l'image et différence absolue
+import numpy as np            # Moyenne de la différence
+
+# PORTE DE MOUVEMENT ----------------------------------------------------------------------------------------------------------
+
+class PorteMouvement:
+    """
+    Porte placée devant l'analyse : si la scène n'a pas bougé depuis la dernière inférence,
+    le dernier résultat est réutilisé au lieu de relancer prétraitement, inférence et détection.
+
+    Le mouvement est mesuré par la différence absolue moyenne (en niveaux de gris, 0-255) entre une
+    vignette de l'image courante et celle de l'image de la dernière inférence. Comparer à cette image,
+    et non à la précédente, évite qu'une dérive lente passe inaperçue. Une nouvelle inférence est imposée
+    après `anciennete_max` images réutilisées ou `duree_max` secondes.
+    """
+
+    def __init__(self, seuil=2.0, taille=(32, 24), anciennete_max=10, duree_max=5.0):
+        self.seuil = seuil                      # Différence moyenne en dessous de laquelle la scène est statique
+        self.taille = taille                    # Taille (largeur, hauteur) de la vignette
+        self.anciennete_max = anciennete_max    # Nombre maximal d'images consécutives réutilisant le résultat
+        self.duree_max = duree_max              # Âge maximal (s) du résultat réutilisé, None pour l'ignorer
+        self.dernier_resultat = None
+        self.derniere_difference = None
+        self._reference = None                  # Vignette de l'image de la dernière inférence
+        self._vignette = None                   # Vignette de l'image courante
+        self._t_inference = None
+        self._nb_reutilisations = 0
+        self.nb_reutilises = 0                  # Images servies par le dernier résultat (scène statique)
+        self.nb_mouvement = 0                   # Inférences déclenchées par le mouvement
+        self.nb_forces = 0                      # Inférences imposées par l'ancienneté du résultat
+
+    def ouverte(self, image, rgb=False, t=None):
+        """
+        Retourner True si l'image doit être analysée, False si le dernier résultat peut être réutilisé.
+        """
+        t = time.monotonic() if t is None else t
+        vignette = cv2.resize(image, self.taille, interpolation=cv2.INTER_AREA)
+        if vignette.ndim == 3:
+            vignette = cv2.cvtColor(vignette, cv2.COLOR_RGB2GRAY if rgb else cv2.COLOR_BGR2GRAY)
+        self._vignette = vignette
+        if self._reference is None or self.dernier_resultat is None:
+            self.nb_mouvement += 1
+            return True
+        self.derniere_difference = float(np.mean(cv2.absdiff(vignette, self._reference)))
+        if self.derniere_difference >= self.seuil:
+            self.nb_mouvement += 1
+            return True
+        if self._nb_reutilisations >= self.anciennete_max or \
+                (self.duree_max is not None and t - self._t_inference >= self.duree_max):
+            self.nb_forces += 1
+            return True
+        self._nb_reutilisations += 1
+        self.nb_reutilises += 1
+        return False
+
+    def memoriser(self, resultat, t=None):
+        """
+        Enregistrer le résultat de l'inférence qui vient d'être faite sur l'image passée à ouverte().
+        """
+        self.dernier_resultat = resultat
+        self._reference = self._vignette
+        self._t_inference = time.monotonic() if t is None else t
+        self._nb_reutilisations = 0
+
+    def reinitialiser(self):
+        """
+        Oublier le dernier résultat : la prochaine image sera analysée.
+        """
+        self.dernier_resultat = None
+        self._reference = None
+
+    def statistiques(self):
+        """
+        Compteurs de la porte et taux de réutilisation du dernier résultat.
+        """
+        total = self.nb_reutilises + self.nb_mouvement + self.nb_forces
+        return {
+            'reutilises': self.nb_reutilises,
+            'mouvement': self.nb_mouvement,
+            'forces': self.nb_forces,
+            'taux_reutilisation': self.nb_reutilises / total if total else 0.0,
+            'derniere_difference': self.derniere_difference,
+        }
@@ -0,0 +1,144 @@
+import time                   # Horloge monotone par défaut
+import numpy as np            # Importation de NumPy pour le filtre vectorisé sur tous les landmarks
+
+# PRÉDICTEUR DE KEYPOINTS -----------------------------------------------------------------------------------------------------
+
+class PredicteurKeypoints:
+    """
+    Filtre de Kalman à vitesse constante, indépendant pour chaque coordonnée (x, y, z) de chaque landmark,
+    vectorisé sur les 33 landmarks de pose.
+
+    Entre deux inférences réelles, predire() extrapole les landmarks et leur incertitude (écart-type
+    de la position, en coordonnées normalisées). doit_inferer() demande une nouvelle inférence toutes les
+    `une_sur` images, ou plus tôt si l'incertitude d'un landmark visible dépasse `seuil_incertitude`.
+    L'incertitude est gonflée par l'écart observé entre prédictions et mesures lors des dernières inférences
+    (innovation normalisée) : un mouvement brusque raccourcit l'intervalle entre deux inférences.
+    L'inférence peut ainsi tourner à une fraction du rythme d'émission, avec une erreur bornée.
+
+    Le temps du filtre est compté en périodes d'image : `bruit_acceleration` est l'écart-type de la variation
+    de vitesse d'une image à la suivante (coordonnées normalisées par image), si bien que le réglage vaut
+    aussi bien à 30 images/s que pour un poste analysant une image par seconde. La période est mesurée
+    sur les instants passés à doit_inferer() (moyenne glissante), sauf si `periode_image` est fixée.
+    """
+
+    def __init__(self, une_sur=3, seuil_incertitude=0.03, bruit_mesure=0.005, bruit_acceleration=0.002,
+                 seuil_visibilite=0.5, periode_image=None):
+        self.une_sur = une_sur                          # Une inférence réelle toutes les N images au plus
+        self.seuil_incertitude = seuil_incertitude      # Écart-type de position déclenchant une inférence anticipée
+        self.variance_mesure = bruit_mesure ** 2        # Variance du bruit des landmarks MediaPipe
+        self.densite_acceleration = bruit_acceleration ** 2  # Densité du bruit d'accélération, par image
+        self.seuil_visibilite = seuil_visibilite
+        self.periode_fixe = periode_image               # Période entre deux images (s), mesurée si None
+        self.periode_image = periode_image
+        self._t_image = None                            # Instant de la dernière image vue par doit_inferer()
+        self.nb_inferences = 0
+        self.nb_predictions = 0
+        self.nb_anticipees = 0          # Inférences déclenchées par l'incertitude avant l'échéance
+        self.reinitialiser()
+
+    def reinitialiser(self):
+        """
+        Oublier l'état : la prochaine image devra être analysée.
+        """
+        self._t = None                  # Instant de l'état courant
+        self._position = None           # (33, 3)
+        self._vitesse = None            # (33, 3)
+        self._p00 = self._p01 = self._p11 = None  # Covariance 2x2 (position, vitesse) par coordonnée
+        self._visibilite = None         # (33,)
+        self._facteur = None            # (33,) moyenne glissante de l'innovation normalisée (1 = conforme au modèle)
+        self._images_depuis_inference = 0
+
+    def _mesurer_periode(self, t):
+        """
+        Mettre à jour la période entre deux images à partir de l'instant t de l'image courante.
+        """
+        if self.periode_fixe is None and self._t_image is not None and t > self._t_image:
+            ecart = t - self._t_image
+            self.periode_image = ecart if self.periode_image is None else \
+                self.periode_image + 0.1 * (ecart - self.periode_image)
+        self._t_image = t
+
+    def _propager(self, dt):
+        """
+        Covariance et état propagés de dt secondes (sans modifier l'état courant).
+        Le temps est converti en périodes d'image : vitesse et bruit d'accélération sont exprimés par image.
+        """
+        if self.periode_image:
+            dt = dt / self.periode_image
+        q = self.densite_acceleration
+        position = self._position + self._vitesse * dt
+        p00 = self._p00 + 2 * dt * self._p01 + dt * dt * self._p11 + q * dt ** 3 / 3
+        p01 = self._p01 + dt * self._p11 + q * dt ** 2 / 2
+        p11 = self._p11 + q * dt
+        return position, p00, p01, p11
+
+    def corriger(self, t, landmarks):
+        """
+        Intégrer les landmarks (33, 3|4) issus d'une inférence réelle à l'instant t (en secondes).
+        """
+        landmarks = np.asarray(landmarks, dtype=np.float64)
+        mesure = landmarks[:, :3]
+        self._visibilite = landmarks[:, 3].copy() if landmarks.shape[1] >= 4 else np.ones(len(landmarks))
+        self.nb_inferences += 1
+        self._images_depuis_inference = 0
+        if self._position is None:
+            self._t = t
+            self._position = mesure.copy()
+            self._vitesse = np.zeros_like(mesure)
+            self._p00 = np.full_like(mesure, self.variance_mesure)
+            self._p01 = np.zeros_like(mesure)
+            self._p11 = np.full_like(mesure, 1.0)  # Vitesse initiale inconnue
+            self._facteur = np.ones(len(mesure))
+            return
+        position, p00, p01, p11 = self._propager(max(t - self._t, 0.0))
+        innovation = mesure - position
+        s = p00 + self.variance_mesure
+        innovation_normalisee = np.sqrt(np.mean(innovation[:, :2] ** 2 / s[:, :2], axis=1))
+        self._facteur += 0.5 * (innovation_normalisee - self._facteur)
+        k0, k1 = p00 / s, p01 / s
+        self._position = position + k0 * innovation
+        self._vitesse = self._vitesse + k1 * innovation
+        self._p00 = (1 - k0) * p00
+        self._p01 = (1 - k0) * p01
+        self._p11 = p11 - k1 * p01
+        self._t = t
+
+    def predire(self, t):
+        """
+        Retourner (landmarks (33, 4) prédits à l'instant t, incertitude (33,) en coordonnées normalisées).
+        """
+        position, p00, _, _ = self._propager(max(t - self._t, 0.0))
+        landmarks = np.concatenate([position, self._visibilite[:, None]], axis=1).astype(np.float32)
+        # Écart-type de la position dans le plan de l'image, gonflé si le modèle a récemment sous-estimé le mouvement
+        incertitude = np.sqrt(p00[:, 0] + p00[:, 1]) * np.maximum(self._facteur, 1.0)
+        return landmarks, incertitude
+
+    def doit_inferer(self, t=None):
+        """
+        Indiquer si l'image de l'instant t doit être analysée (True) ou peut être prédite (False).
+        Une réponse False compte l'image comme prédite.
+        """
+        t = time.monotonic() if t is None else t
+        self._mesurer_periode(t)
+        if self._position is None or self._images_depuis_inference + 1 >= self.une_sur:
+            return True
+        _, incertitude = self.predire(t)
+        visibles = self._visibilite >= self.seuil_visibilite
+        if visibles.any() and incertitude[visibles].max() > self.seuil_incertitude:
+            self.nb_anticipees += 1
+            return True
+        self._images_depuis_inference += 1
+        self.nb_predictions += 1
+        return False
+
+    def statistiques(self):
+        """
+        Nombre d'inférences réelles, d'images prédites et d'inférences anticipées.
+        """
+        total = self.nb_inferences + self.nb_predictions
+        return {
+            'inferences': self.nb_inferences,
+            'predictions': self.nb_predictions,
+            'anticipees': self.nb_anticipees,
+            'taux_prediction': self.nb_predictions / total if total else 0.0,
+        }
@@ -6,15 +6,18 @@ import time                   # Pour gérer les délais et les temporisations
 from datetime import datetime # Pour gérer les dates et heures
 from openni import openni2    # Pour interfacer avec les caméras OpenNI
 from openni import _openni2 as c_api  # API interne pour des fonctionnalités avancées
-import paramiko               # Pour établir des connexions SSH
 import socket                 # Pour gérer les communications réseau bas niveau
 import sys                    # Pour accéder à certaines variables système
 import os                     # Pour interagir avec le système d'exploitation (suppression de fichiers)
 import numpy as np            # Pour les opérations sur les tableaux numériques
-import cv2                    # Pour le traitement d'images et de vidéos
 import logging                # Pour la gestion avancée des messages de log
+from concurrent.futures import ThreadPoolExecutor  # Étapes du démarrage exécutées en parallèle
 from termcolor import colored # Pour afficher du texte coloré dans le terminal (facultatif avec logging)
-from estimateur_posture import *  # Importation des fonctions d'analyse de posture
+from pipeline_station import PipelineStation  # Exécution en pipeline capture / analyse / envoi
+from transport import ClientConcentrateur  # Connexion persistante et tramée au concentrateur
+from transport import encoder_message  # Message structuré, horodaté à la capture
+from metriques import REGISTRE  # Métriques du poste (activées par POSTURE_METRIQUES=1)
+from export_poste import ExportPoste  # Export en colonnes et cumuls TMS / DUER par équipe
 
 # Configuration du logging ***************************************
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,7 +25,33 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Constantes *****************************************************
 IP_CONCENTRATEUR = 70  # Les deux derniers chiffres de l'adresse IP du concentrateur
 REPERTOIRE_SAUVEGARDE = "/home/Share/Enregistrements/"  # Répertoire pour sauvegarder les images
-PING_TIMEOUT = 100  # Temps d'attente pour le ping (en millisecondes)
+REPERTOIRE_SPOOL = "/var/tmp/spool_concentrateur/"  # Messages conservés sur disque local pendant une coupure
+REPERTOIRE_JOURNAL = "/home/Share/Journaux/"  # Journaux binaires des landmarks, angles et zones ("" = désactivé)
+REPERTOIRE_EXPORT = "/home/Share/Exports/"  # Export en colonnes et cumuls par équipe ("" = désactivé)
+PING_TIMEOUT = 1  # Temps d'attente de la réponse au ping (en secondes)
+DELAI_REDEMARRAGE_CAMERA = 30.0  # Attente maximale de la caméra après un redémarrage du port USB (s)
+DELAI_OUVERTURE_CAMERA = 15.0  # Attente maximale de l'ouverture OpenNI d'une caméra détectée (s)
+PERIODE_SONDAGE = 0.25  # Intervalle entre deux vérifications pendant le démarrage (s)
+MODE_PIPELINE = True  # Capture, analyse et envoi dans des threads séparés (False = boucle séquentielle)
+TAILLE_TAMPONS = 2  # Capacité des tampons circulaires entre les étages du pipeline
+PERIODE_ENVOI = 1.0  # Un message au concentrateur par période (s) ; les images intermédiaires alimentent les indicateurs
+PORT_METRIQUES = 9101  # Port local de l'exposition texte des métriques (si POSTURE_METRIQUES=1)
+FICHIER_METRIQUES = "/var/tmp/metriques_posture.json"  # Statistiques réécrites périodiquement (si activées)
+PROFIL_INFERENCE = os.environ.get("POSTURE_PROFIL", "pose")  # Profil par défaut : 'pose', 'pose_mains' ou 'holistique'
+PROFILS_POSTES = {}  # Profil propre à certains postes, ex. {"3": "pose_mains"} (prioritaire sur PROFIL_INFERENCE)
+SUIVI_ROI = True  # Analyse limitée à la région entourant l'opérateur à l'image précédente
+SEUIL_MOUVEMENT = 2.0  # Différence moyenne (niveaux de gris) sous laquelle le dernier résultat est réutilisé (0 = désactivé)
+ANCIENNETE_MAX = 10  # Nombre maximal d'images consécutives servies par le dernier résultat
+PREDICTION_UNE_SUR = 3  # Inférence réelle au plus 1 image sur N, landmarks prédits entre deux (1 = désactivé)
+BUDGET_LATENCE = 0.8  # Temps d'analyse cible (s) au-delà duquel le modèle le plus léger est utilisé
+ECHANTILLON_AUDIT = 0  # Conserver 1 image sur N sur disque pour audit (0 = aucune écriture disque)
+LARGEUR_IMAGE = 640  # Résolution du flux couleur
+HAUTEUR_IMAGE = 480
+
+# Métriques ******************************************************
+latence_capture = REGISTRE.histogramme('capture_secondes', "Lecture d'une image sur la caméra")
+erreurs_capture = REGISTRE.compteur('erreurs_capture_total', "Échecs de lecture d'une image")
+duree_demarrage = REGISTRE.jauge('demarrage_secondes', "Durée du démarrage jusqu'à la première image analysable")
 
 # Fonctions cycliques ********************************************
 
@@ -32,34 +61,38 @@ def fct_periodique_1s():
     Elle capture une image, l'analyse, et envoie les résultats au concentrateur.
     """
     global num_poste, app_is_on, recordingstr, pres_cam, mdv, result_analyse
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # Création d'un socket TCP
+    prochain_envoi = time.monotonic()
     try:
-        # Connexion au concentrateur
-        client_socket.connect((fullIP_Concentrateur, 50000))
-        logging.info("Connecté au concentrateur.")
-
         while True:
             demande_recording = "yes"  # Demande d'enregistrement (fixée à "yes" par défaut)
             if demande_recording == "yes":
                 recordingstr = "yes"
-                filename = record()  # Capture d'une image
-                if filename != "":
-                    # Analyse de l'image capturée
-                    result_analyse = estimateur([filename])
-                    # Suppression de l'image après analyse pour économiser l'espace disque
-                    try:
-                        os.remove(filename)
-                        logging.debug(f"Fichier {filename} supprimé.")
-                    except Exception as e:
-                        logging.error(f"Erreur lors de la suppression du fichier {filename}: {e}")
+                t_capture = time.time()
+                color_img, color_frame = capture_image()  # Capture d'une image en mémoire
+                if color_img is not None:
+                    # Analyse directe du tampon de la caméra (ordre RGB), sans passage par le disque
+                    analyse = ep.estimateur(color_img, flux=num_poste, rgb=True, profil=profil_poste,
+                                         indicateurs=indicateurs_poste, horodatage=t_capture,
+                                         controleur=controleur_poste, roi=roi_poste, porte=porte_poste,
+                                         predicteur=predicteur_poste, journal=journal_poste, details=True)
+                    result_analyse = analyse['result']
+                    sauvegarder_audit(color_img, analyse)  # Écriture échantillonnée pour audit (optionnelle)
+                    if export_poste is not None:
+                        export_poste.ajouter(analyse, t=t_capture)  # Ligne de l'export, écrite par lots
+                    del color_img, color_frame  # Libération du tampon OpenNI
+                    maintenant = time.monotonic()
+                    if maintenant < prochain_envoi:
+                        continue  # Image intermédiaire : analysée pour les indicateurs, non envoyée
+                    prochain_envoi += PERIODE_ENVOI
+                    if prochain_envoi <= maintenant:
+                        prochain_envoi = maintenant + PERIODE_ENVOI  # Retard de plus d'une période
                     mdv_app()  # Mise à jour du compteur mdv
-                    now_message = datetime.now()
-                    date_message = now_message.strftime("%d_%m_%Y_%H_%M_%S")
                     app_is_on = "yes"
-                    # Préparation du message à envoyer au concentrateur
-                    message_emission = f"{num_poste}_{app_is_on}_{recordingstr}_{pres_cam}_{mdv}_0{result_analyse}"
-                    logging.info(f"Message prêt à être envoyé: {message_emission}")
-                    client_socket.send(message_emission.encode())  # Envoi du message
+                    # Préparation du message à envoyer au concentrateur, horodaté à la capture
+                    message_emission = encoder_message(num_poste, app_is_on, recordingstr, pres_cam, mdv,
+                                                       t_capture, analyse)
+                    logging.debug(f"Message prêt à être envoyé: {message_emission}")
+                    client_concentrateur.envoyer(message_emission)  # Mise en file, envoi par le thread d'émission
             else:
                 recordingstr = "no"
 
@@ -67,34 +100,56 @@ def fct_periodique_1s():
         # Gestion des exceptions éventuelles
         logging.error(f"fct_periodique_1s() - Exception: {e}")
     finally:
-        client_socket.close()  # Fermeture du socket
-        logging.info("Socket fermé.")
+        logging.info(f"Statistiques du transport: {client_concentrateur.statistiques()}")
+
+def demarrer_flux():
+    """
+    Configure et démarre le flux couleur de la caméra, une seule fois pour toute la session.
+    """
+    global color_stream, flux_demarre
+    if flux_demarre:
+        return
+    color_stream.set_video_mode(c_api.OniVideoMode(
+        pixelFormat=c_api.OniPixelFormat.ONI_PIXEL_FORMAT_RGB888,
+        resolutionX=LARGEUR_IMAGE, resolutionY=HAUTEUR_IMAGE, fps=30))
+    color_stream.start()
+    flux_demarre = True
+    logging.info("Flux couleur démarré.")
 
-def record():
+def capture_image():
     """
-    Capture une image depuis la caméra et l'enregistre dans un fichier.
-    Retourne le nom du fichier créé.
+    Capture une image depuis la caméra, sans copie ni écriture disque.
+    Retourne (image, frame) : `image` est une vue NumPy (H, W, 3) en ordre RGB directement
+    sur le tampon de `frame`, qui doit donc rester référencée tant que l'image est utilisée.
+    Retourne (None, None) en cas d'erreur.
     """
-    global dev, color_stream
     try:
-        # Démarrage du flux de la caméra
-        color_stream.start()
-        color_stream.set_video_mode(c_api.OniVideoMode(
-            pixelFormat=c_api.OniPixelFormat.ONI_PIXEL_FORMAT_RGB888,
-            resolutionX=640, resolutionY=480, fps=30))
-        # Lecture d'une frame depuis le flux
+        debut = time.monotonic()
+        demarrer_flux()
         color_frame = color_stream.read_frame()
-        color_frame_data = color_frame.get_buffer_as_uint8()
-        # Conversion des données en image
-        color_img = np.frombuffer(color_frame_data, dtype=np.uint8)
-        color_img.shape = (480, 640, 3)
-        color_img = color_img[..., ::-1]  # Conversion BGR vers RGB
+        color_img = np.frombuffer(color_frame.get_buffer_as_uint8(), dtype=np.uint8)
+        color_img = color_img.reshape(HAUTEUR_IMAGE, LARGEUR_IMAGE, 3)  # Vue sur le tampon, sans copie
+        latence_capture.observer(time.monotonic() - debut)
+        return color_img, color_frame
+    except Exception as e:
+        # Gestion des exceptions éventuelles
+        erreurs_capture.inc()
+        logging.error(f"capture_image() - Exception occurred: {e}")
+        return None, None
+
+def enregistrer_image(color_img):
+    """
+    Enregistre une image RGB capturée dans le répertoire de sauvegarde.
+    Retourne le nom du fichier créé, ou "" en cas d'erreur.
+    """
+    try:
         # Génération du nom de fichier avec la date et l'heure actuelles
         now = datetime.now()
         date = now.strftime("%d_%m_%Y_%H_%M_%S_%f")
         filename = f"{REPERTOIRE_SAUVEGARDE}img_{date}.jpg"
-        # Sauvegarde de l'image
-        cv2.imwrite(filename, color_img)
+        # Sauvegarde de l'image (OpenCV attend l'ordre BGR ; déjà importé avec l'estimateur)
+        import cv2
+        cv2.imwrite(filename, cv2.cvtColor(color_img, cv2.COLOR_RGB2BGR))
         logging.debug(f"Image enregistrée sous {filename}")
         # Enregistrement du dernier fichier capturé
         with open("Last_img.txt", "w") as fichier:
@@ -102,9 +157,82 @@ def record():
         return filename
     except Exception as e:
         # Gestion des exceptions éventuelles
-        logging.error(f"record() - Exception occurred: {e}")
+        logging.error(f"enregistrer_image() - Exception occurred: {e}")
         return ""
 
+def sauvegarder_audit(color_img, analyse=None):
+    """
+    Conserve sur disque une image sur ECHANTILLON_AUDIT pour audit.
+    Si `analyse` (résultat structuré de estimateur()) est fourni, l'image conservée est annotée :
+    le dessin n'est fait que pour les images échantillonnées.
+    Ne fait rien si ECHANTILLON_AUDIT vaut 0.
+    """
+    global nb_images_capturees
+    nb_images_capturees += 1
+    if ECHANTILLON_AUDIT > 0 and nb_images_capturees % ECHANTILLON_AUDIT == 0:
+        if analyse is not None:
+            color_img = ep.dessiner_resultats(color_img, analyse, rgb=True)
+        enregistrer_image(color_img)
+
+def fct_pipeline():
+    """
+    Variante en pipeline de fct_periodique_1s() : la capture, l'analyse et l'envoi tournent
+    dans trois threads reliés par des tampons bornés, de sorte qu'un concentrateur lent
+    ou une inférence lente ne bloque pas la capture.
+    """
+    global app_is_on, recordingstr
+
+    def analyser(capture):
+        color_img, color_frame, t_capture = capture
+        analyse = ep.estimateur(color_img, flux=num_poste, rgb=True, profil=profil_poste,
+                             indicateurs=indicateurs_poste, horodatage=t_capture, controleur=controleur_poste,
+                             roi=roi_poste, porte=porte_poste, predicteur=predicteur_poste, journal=journal_poste,
+                             details=True)
+        sauvegarder_audit(color_img, analyse)  # Écriture échantillonnée pour audit (optionnelle)
+        if export_poste is not None:
+            export_poste.ajouter(analyse, t=t_capture)  # Ligne de l'export, écrite par lots
+        return analyse
+
+    def envoyer(horodatage, analyse):
+        global result_analyse
+        result_analyse = analyse['result']
+        mdv_app()  # Mise à jour du compteur mdv
+        # Message horodaté à la capture (et non à la réception par le concentrateur)
+        message_emission = encoder_message(num_poste, app_is_on, recordingstr, pres_cam, mdv,
+                                           horodatage.timestamp(), analyse)
+        logging.debug(f"Message prêt à être envoyé: {message_emission}")
+        client_concentrateur.envoyer(message_emission)  # Mise en file, envoi par le thread d'émission
+
+    pipeline = PipelineStation(capture_image_pipeline, analyser, envoyer, capacite=TAILLE_TAMPONS,
+                               periode_envoi=PERIODE_ENVOI)
+    try:
+        recordingstr = "yes"
+        app_is_on = "yes"
+        pipeline.executer()
+    except Exception as e:
+        # Gestion des exceptions éventuelles
+        logging.error(f"fct_pipeline() - Exception: {e}")
+    finally:
+        logging.info(f"Statistiques du pipeline: {pipeline.statistiques()}")
+        if porte_poste is not None:
+            logging.info(f"Statistiques de la porte de mouvement: {porte_poste.statistiques()}")
+        if predicteur_poste is not None:
+            logging.info(f"Statistiques de la prédiction des keypoints: {predicteur_poste.statistiques()}")
+        if journal_poste is not None:
+            journal_poste.synchroniser()  # Enregistrements du journal écrits sur disque
+        logging.info(f"Statistiques du transport: {client_concentrateur.statistiques()}")
+
+def capture_image_pipeline():
+    """
+    Étage de capture du pipeline : retourne (image, frame, heure de capture), ou None en cas d'erreur.
+    """
+    t_capture = time.time()
+    color_img, color_frame = capture_image()
+    if color_img is None:
+        time.sleep(0.1)  # Évite de boucler à vide si la caméra ne répond plus
+        return None
+    return color_img, color_frame, t_capture
+
 def Sortie_programme():
     """
     Quitte proprement le programme.
@@ -128,7 +256,7 @@ def ping(host):
     Retourne True si le ping réussit, False sinon.
     """
     try:
-        result = subprocess.run(['ping', '-c', '1', '-w', str(PING_TIMEOUT), host], capture_output=True)
+        result = subprocess.run(['ping', '-c', '1', '-W', str(PING_TIMEOUT), host], capture_output=True)
         return result.returncode == 0
     except Exception as e:
         # Gestion des exceptions éventuelles
@@ -138,9 +266,12 @@ def ping(host):
 def initanyusb():
     """
     Initialise la caméra en redémarrant le port USB distant via SSH.
+    Ne fait qu'envoyer la commande : le retour de la caméra est attendu par preparer_camera().
     """
     global ip_anyusb, portusb
     try:
+        import paramiko  # Pour établir des connexions SSH (importé seulement en cas de redémarrage)
+
         # Détermination de l'IP du hub USB distant en fonction du numéro de poste
         ip_anyusb = 60 if (1 <= int(num_poste) < 9) else 61
         hostname = f'10.10.10.{ip_anyusb}'
@@ -158,8 +289,6 @@ def initanyusb():
         client.exec_command(f'system anywhereusb powercycle port{portusb}')
         logging.info("Reboot caméra en cours...")
         client.close()
-        time.sleep(10)  # Attente du redémarrage
-        logging.info("Redémarrage de la caméra effectué.")
     except Exception as e:
         # Gestion des exceptions éventuelles
         logging.error(f"initanyusb() - Exception: {e}")
@@ -167,17 +296,11 @@ def initanyusb():
 def check_cam():
     """
     Vérifie si la caméra est connectée en utilisant la commande 'lsusb'.
-    Retourne True si la caméra est détectée, False sinon.
+    Retourne True si la caméra est détectée, False sinon (sans tentative de réinitialisation).
     """
     try:
         result = subprocess.run('lsusb | grep "Orbbec"', shell=True, capture_output=True, text=True)
-        if result.returncode == 0 and result.stdout.strip():
-            logging.info("Caméra détectée.")
-            return True
-        else:
-            logging.warning("Caméra non détectée. Tentative de réinitialisation...")
-            initanyusb()  # Tentative de réinitialisation de la caméra
-            return False
+        return result.returncode == 0 and bool(result.stdout.strip())
     except Exception as e:
         # Gestion des exceptions éventuelles
         logging.error(f"check_cam() - Exception: {e}")
@@ -194,6 +317,96 @@ def mdv_app():
         # Gestion des exceptions éventuelles
         logging.error(f"mdv_app() - Exception: {e}")
 
+# Démarrage ******************************************************
+
+def attendre(condition, delai_max, periode=PERIODE_SONDAGE):
+    """
+    Appelle `condition()` toutes les `periode` secondes jusqu'à ce qu'elle retourne une valeur vraie,
+    qui est retournée, ou pendant au plus `delai_max` secondes (retourne alors None).
+    """
+    limite = time.monotonic() + delai_max
+    while True:
+        valeur = condition()
+        if valeur:
+            return valeur
+        if time.monotonic() >= limite:
+            return None
+        time.sleep(periode)
+
+def ouvrir_camera():
+    """
+    Ouvre la caméra OpenNI. Retourne le périphérique, ou None s'il n'est pas encore prêt.
+    """
+    try:
+        return openni2.Device.open_any()
+    except Exception as e:
+        logging.debug(f"ouvrir_camera() - Caméra pas encore prête: {e}")
+        return None
+
+def preparer_camera():
+    """
+    Attend la caméra et démarre son flux couleur. Le port USB n'est redémarré que si la caméra
+    est absente ; son retour est ensuite sondé au lieu d'être attendu pendant une durée fixe.
+    """
+    global dev, color_stream, pres_cam
+    while not check_cam():
+        pres_cam = "no"
+        logging.warning("Caméra non détectée. Tentative de réinitialisation...")
+        initanyusb()
+        if attendre(check_cam, DELAI_REDEMARRAGE_CAMERA):
+            break
+    logging.info("Caméra détectée.")
+
+    # Initialisation du module OpenNI2 pour la caméra
+    openni2.initialize()
+    logging.info("Module OpenNI2 initialisé.")
+    dev = attendre(ouvrir_camera, DELAI_OUVERTURE_CAMERA)
+    if dev is None:
+        raise RuntimeError(f"Caméra détectée mais impossible à ouvrir après {DELAI_OUVERTURE_CAMERA} s.")
+    logging.info("Caméra détectée et connectée.")
+    color_stream = dev.create_color_stream()
+    demarrer_flux()
+    pres_cam = "yes"
+
+def charger_modele():
+    """
+    Importe l'estimateur (OpenCV, MediaPipe) et préchauffe la session de suivi du poste sur une image
+    noire : la première image capturée ne paie ni l'import ni l'initialisation du graphe.
+    """
+    global ep
+    import estimateur_posture  # Import lourd, fait ici en parallèle de la préparation de la caméra
+    ep = estimateur_posture
+    ep.pool_profil(profil_poste).prechauffer(model_complexity=1, flux=num_poste,
+                                             resolution=(HAUTEUR_IMAGE, LARGEUR_IMAGE))
+
+def demarrer_poste():
+    """
+    Démarrage du poste : vérification du concentrateur, préparation de la caméra et chargement
+    du modèle s'exécutent en parallèle. Retourne quand la caméra et le modèle sont prêts ;
+    une erreur de l'une de ces deux étapes est relancée.
+    """
+    debut = time.monotonic()
+
+    def mesurer(nom, fonction, *args):
+        debut_etape = time.monotonic()
+        resultat = fonction(*args)
+        logging.info(f"Démarrage - {nom}: {time.monotonic() - debut_etape:.1f} s.")
+        return resultat
+
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="demarrage") as executeur:
+        concentrateur = executeur.submit(mesurer, "concentrateur", ping, fullIP_Concentrateur)
+        camera = executeur.submit(mesurer, "caméra", preparer_camera)
+        modele = executeur.submit(mesurer, "modèle", charger_modele)
+        if concentrateur.result():
+            logging.info("Concentrateur accessible.")
+        else:
+            logging.warning("Concentrateur inaccessible.")
+        modele.result()
+        camera.result()
+    duree = time.monotonic() - debut
+    duree_demarrage.fixer(duree)
+    logging.info(f"Poste prêt en {duree:.1f} s.")
+
 # =======================================================================================================================
 #                                             *** PROGRAMME PRINCIPAL ***
 # =======================================================================================================================
@@ -206,9 +419,6 @@ if __name__ == "__main__":
     plageIP = "10.10.10."  # Plage d'adresses IP
     fullIP_Concentrateur = f"{plageIP}{IP_CONCENTRATEUR}"  # Adresse IP complète du concentrateur
 
-    color_img = None
-    tps_traitement = 0.4  # Temps de traitement estimé
-    delai_pause = 4.0 - tps_traitement  # Délai de pause entre les traitements
     mdv = 0  # Compteur mdv
     nom_poste = socket.gethostname()  # Nom de la machine
     num_poste = nom_poste.replace("pc-camera", "")  # Extraction du numéro de poste
@@ -216,40 +426,48 @@ if __name__ == "__main__":
     recording = "no"
     pres_cam = "no"
     result_analyse = "_0_1_2_3_4_5_6_7_8_9"  # Valeur par défaut des résultats d'analyse
+    profil_poste = PROFILS_POSTES.get(num_poste, PROFIL_INFERENCE)  # Profil d'inférence du poste
+    ep = None  # Module estimateur_posture, importé par charger_modele()
+    dev = color_stream = None
+    flux_demarre = False
+    nb_images_capturees = 0
 
-    logging.info("Paramètres définis.")
+    logging.info(f"Paramètres définis (profil d'inférence: {profil_poste}).")
 
-    # Vérification de la présence du concentrateur
-    logging.info(f"Vérification de la présence du Concentrateur @{fullIP_Concentrateur}...")
-    success = ping(host=fullIP_Concentrateur)
+    # Connexion persistante au concentrateur (reconnexion automatique, spool sur disque pendant les coupures),
+    # établie en arrière-plan pendant le démarrage
+    client_concentrateur = ClientConcentrateur(fullIP_Concentrateur, 50000, repertoire_spool=REPERTOIRE_SPOOL)
 
-    if success:
-        logging.info("Concentrateur accessible.")
-    else:
-        logging.warning("Concentrateur inaccessible.")
-
-    # Initialisation de la caméra
-    initanyusb()
-
-    # Vérification de la connexion de la caméra
-    if not check_cam():
-        pres_cam = "no"
-        while not check_cam():
-            time.sleep(2)
+    # Vérification du concentrateur, préparation de la caméra et chargement du modèle en parallèle
+    logging.info(f"Vérification de la présence du Concentrateur @{fullIP_Concentrateur}...")
+    demarrer_poste()
 
-    # Initialisation du module OpenNI2 pour la caméra
-    openni2.initialize()
-    logging.info("Module OpenNI2 initialisé.")
-    dev = openni2.Device.open_any()
-    logging.info("Caméra détectée et connectée.")
-    color_stream = dev.create_color_stream()
-    pres_cam = "yes"
+    # État du poste, une fois l'estimateur importé
+    indicateurs_poste = ep.creer_indicateurs()  # Historique des indicateurs temporels du poste
+    controleur_poste = ep.ControleurComplexite(budget_latence=BUDGET_LATENCE)  # Choix adaptatif du model_complexity
+    roi_poste = ep.SuiviROI() if SUIVI_ROI else None  # Recadrage de l'analyse autour de l'opérateur
+    porte_poste = ep.PorteMouvement(seuil=SEUIL_MOUVEMENT, anciennete_max=ANCIENNETE_MAX) if SEUIL_MOUVEMENT > 0 else None
+    predicteur_poste = ep.PredicteurKeypoints(une_sur=PREDICTION_UNE_SUR) if PREDICTION_UNE_SUR > 1 else None
+    journal_poste = ep.JournalLandmarks(os.path.join(REPERTOIRE_JOURNAL, f"poste{num_poste}"),
+                                        rapport_aspect=LARGEUR_IMAGE / HAUTEUR_IMAGE) if REPERTOIRE_JOURNAL else None
+    export_poste = ExportPoste(REPERTOIRE_EXPORT, num_poste) if REPERTOIRE_EXPORT else None
 
     logging.info("********** APPLICATION OPÉRATIONNELLE **********")
     logging.info("Échanges en cours avec le concentrateur.")
 
+    # Exposition des métriques (compteurs, latences, profondeur des files) si elles sont activées
+    if REGISTRE.actif:
+        REGISTRE.servir(PORT_METRIQUES)
+        REGISTRE.ecrire_periodiquement(FICHIER_METRIQUES)
+
     # Démarrage de la fonction principale
-    fct_periodique_1s()
+    if MODE_PIPELINE:
+        fct_pipeline()
+    else:
+        fct_periodique_1s()
+    if export_poste is not None:
+        export_poste.close()  # Dernier lot écrit et cumuls à jour
+    client_concentrateur.fermer()  # Derniers messages envoyés ou conservés dans le spool
 
     logging.info("FIN DE PROGRAMME")
     Sortie_programme()
@@ -0,0 +1,289 @@
+import threading                          # Verrous et conditions pour l'emprunt concurrent des sessions
+from contextlib import contextmanager     # Pour exposer l'emprunt sous forme de bloc "with"
+import numpy as np                        # Pour l'image noire utilisée lors du préchauffage
+import mediapipe as mp                    # Importation de MediaPipe pour la détection des poses humaines
+
+# VARIABLES GLOBALES ----------------------------------------------------------------------------------------------------------
+
+mp_holistic = mp.solutions.holistic       # Module Holistic pour la détection de la posture complète
+mp_pose = mp.solutions.pose               # Module Pose (33 landmarks du corps uniquement)
+mp_hands = mp.solutions.hands             # Module Hands (21 landmarks par main)
+
+# Profils d'inférence : on ne paie que pour les landmarks réellement utilisés
+PROFILS = (
+    'pose',           # Corps seul (solution Pose, la plus légère)
+    'pose_mains',     # Corps + mains (solutions Pose et Hands), pour l'indicateur de préhension
+    'holistique',     # Graphe Holistic complet : corps, visage et mains
+)
+
+# SESSIONS COMPOSÉES ----------------------------------------------------------------------------------------------------------
+
+class ResultatsPoseMains:
+    """
+    Résultats du profil 'pose_mains', avec les mêmes attributs que ceux de Holistic.
+    """
+
+    def __init__(self, pose_landmarks=None, left_hand_landmarks=None, right_hand_landmarks=None):
+        self.pose_landmarks = pose_landmarks
+        self.left_hand_landmarks = left_hand_landmarks
+        self.right_hand_landmarks = right_hand_landmarks
+        self.face_landmarks = None
+
+class SessionPoseMains:
+    """
+    Session du profil 'pose_mains' : une session Pose et une session Hands utilisées ensemble.
+    Les mains ne sont recherchées que si un corps est détecté.
+    """
+
+    def __init__(self, static_image_mode, model_complexity, min_detection_confidence, min_tracking_confidence):
+        self.pose = mp_pose.Pose(
+            static_image_mode=static_image_mode,
+            model_complexity=model_complexity,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+        self.mains = mp_hands.Hands(
+            static_image_mode=static_image_mode,
+            max_num_hands=2,
+            model_complexity=min(model_complexity, 1),  # Hands n'existe qu'en complexité 0 et 1
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+
+    def process(self, image):
+        resultats = ResultatsPoseMains(self.pose.process(image).pose_landmarks)
+        if resultats.pose_landmarks is None:
+            return resultats
+        mains = self.mains.process(image)
+        for landmarks, lateralite in zip(mains.multi_hand_landmarks or [], mains.multi_handedness or []):
+            # Hands suppose une image miroir (selfie) : "Left" désigne la main droite de la personne filmée
+            if lateralite.classification[0].label == 'Left':
+                resultats.right_hand_landmarks = landmarks
+            else:
+                resultats.left_hand_landmarks = landmarks
+        return resultats
+
+    def reset(self):
+        self.pose.reset()
+        self.mains.reset()
+
+    def close(self):
+        self.pose.close()
+        self.mains.close()
+
+# RÉSERVE DE SESSIONS ---------------------------------------------------------------------------------------------------------
+
+class PoolSessions:
+    """
+    Réserve de sessions MediaPipe gardées chaudes entre les appels, pour un profil d'inférence donné
+    ('pose', 'pose_mains' ou 'holistique', voir PROFILS).
+
+    Deux modes d'emprunt :
+    - mode image (flux=None) : sessions en static_image_mode, partagées entre tous les appelants,
+      au plus `taille_max` sessions par model_complexity ;
+    - mode vidéo (flux=<identifiant caméra>) : une session dédiée par flux, en mode suivi,
+      qui conserve l'état de tracking d'une image à la suivante.
+    """
+
+    def __init__(self, min_detection_confidence=0.5, min_tracking_confidence=0.5, taille_max=2, profil='holistique'):
+        if profil not in PROFILS:
+            raise ValueError(f"Profil d'inférence inconnu: {profil} (attendu: {', '.join(PROFILS)})")
+        self.profil = profil
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self.taille_max = taille_max      # Nombre maximal de sessions en mode image par model_complexity
+        self._condition = threading.Condition()
+        self._libres = {}                 # model_complexity -> sessions inactives (mode image)
+        self._nb_creees = {}              # model_complexity -> nombre de sessions existantes (mode image)
+        self._flux = {}                   # flux -> (model_complexity, session) en mode vidéo
+        self._flux_occupes = set()        # Flux dont la session est actuellement empruntée
+        self._ferme = False
+
+    def _creer(self, model_complexity, static_image_mode):
+        """
+        Construire une nouvelle session du profil (chargement du graphe et des modèles TFLite).
+        """
+        if self.profil == 'pose':
+            return mp_pose.Pose(
+                static_image_mode=static_image_mode,
+                min_detection_confidence=self.min_detection_confidence,
+                min_tracking_confidence=self.min_tracking_confidence,
+                model_complexity=model_complexity
+            )
+        if self.profil == 'pose_mains':
+            return SessionPoseMains(static_image_mode, model_complexity,
+                                    self.min_detection_confidence, self.min_tracking_confidence)
+        return mp_holistic.Holistic(
+            static_image_mode=static_image_mode,
+            min_detection_confidence=self.min_detection_confidence,
+            min_tracking_confidence=self.min_tracking_confidence,
+            model_complexity=model_complexity
+        )
+
+    def _emprunter_image(self, model_complexity):
+        with self._condition:
+            while True:
+                if self._ferme:
+                    raise RuntimeError("PoolSessions fermé.")
+                libres = self._libres.setdefault(model_complexity, [])
+                if libres:
+                    return libres.pop()
+                if self._nb_creees.get(model_complexity, 0) < self.taille_max:
+                    # Réservation de la place avant la construction, hors verrou
+                    self._nb_creees[model_complexity] = self._nb_creees.get(model_complexity, 0) + 1
+                    break
+                self._condition.wait()
+        try:
+            return self._creer(model_complexity, static_image_mode=True)
+        except Exception:
+            with self._condition:
+                self._nb_creees[model_complexity] -= 1
+                self._condition.notify_all()
+            raise
+
+    def _rendre_image(self, model_complexity, session, valide):
+        with self._condition:
+            if valide and not self._ferme:
+                self._libres.setdefault(model_complexity, []).append(session)
+                session = None
+            else:
+                self._nb_creees[model_complexity] -= 1
+            self._condition.notify_all()
+        if session is not None:
+            session.close()
+
+    def _emprunter_flux(self, flux, model_complexity):
+        a_fermer = None
+        with self._condition:
+            while flux in self._flux_occupes:
+                self._condition.wait()
+            if self._ferme:
+                raise RuntimeError("PoolSessions fermé.")
+            self._flux_occupes.add(flux)
+            courant = self._flux.get(flux)
+            if courant is not None and courant[0] == model_complexity:
+                return courant[1]
+            # Changement de complexité : l'ancienne session (et son suivi) est abandonnée
+            if courant is not None:
+                a_fermer = courant[1]
+                del self._flux[flux]
+        if a_fermer is not None:
+            a_fermer.close()
+        try:
+            session = self._creer(model_complexity, static_image_mode=False)
+        except Exception:
+            with self._condition:
+                self._flux_occupes.discard(flux)
+                self._condition.notify_all()
+            raise
+        with self._condition:
+            self._flux[flux] = (model_complexity, session)
+        return session
+
+    def _rendre_flux(self, flux, valide):
+        a_fermer = None
+        with self._condition:
+            if not valide or self._ferme:
+                courant = self._flux.pop(flux, None)
+                a_fermer = courant[1] if courant is not None else None
+            self._flux_occupes.discard(flux)
+            self._condition.notify_all()
+        if a_fermer is not None:
+            a_fermer.close()
+
+    @contextmanager
+    def session(self, model_complexity=1, flux=None):
+        """
+        Emprunter une session pour la durée du bloc "with".
+        Si une exception traverse le bloc, la session est fermée plutôt que remise en réserve,
+        car son état interne n'est plus garanti.
+        """
+        if flux is None:
+            holistic = self._emprunter_image(model_complexity)
+            try:
+                yield holistic
+            except BaseException:
+                self._rendre_image(model_complexity, holistic, valide=False)
+                raise
+            self._rendre_image(model_complexity, holistic, valide=True)
+        else:
+            holistic = self._emprunter_flux(flux, model_complexity)
+            try:
+                yield holistic
+            except BaseException:
+                self._rendre_flux(flux, valide=False)
+                raise
+            self._rendre_flux(flux, valide=True)
+
+    def prechauffer(self, model_complexity=1, flux=None, resolution=(480, 640)):
+        """
+        Charger une session à l'avance et lui faire traiter une image noire,
+        pour que la première vraie image ne paie pas l'initialisation du graphe.
+        En mode vidéo, la session préchauffée est conservée pour le flux, et la première vraie image
+        repart d'une détection complète.
+        """
+        image = np.zeros((resolution[0], resolution[1], 3), dtype=np.uint8)
+        with self.session(model_complexity, flux) as holistic:
+            resultats = holistic.process(image)
+        if flux is not None and resultats.pose_landmarks is not None:
+            # L'image de préchauffage ne doit pas servir de point de départ au suivi
+            self.redemarrer(flux)
+
+    def reset(self, flux=None):
+        """
+        Réinitialiser l'état de suivi : d'un flux donné, ou de tous les flux si flux=None.
+        Les sessions en mode image ne gardent pas d'état et ne sont pas concernées.
+        """
+        a_fermer = []
+        with self._condition:
+            cibles = [flux] if flux is not None else list(self._flux)
+            for cible in cibles:
+                while cible in self._flux_occupes:
+                    self._condition.wait()
+                courant = self._flux.pop(cible, None)
+                if courant is not None:
+                    a_fermer.append(courant[1])
+        for session in a_fermer:
+            session.close()
+
+    def redemarrer(self, flux):
+        """
+        Repartir d'une détection complète sur un flux en conservant sa session : le graphe est redémarré
+        (reset() de MediaPipe) sans recharger les modèles. Sans session pour ce flux, rien n'est fait.
+        """
+        with self._condition:
+            while flux in self._flux_occupes:
+                self._condition.wait()
+            courant = self._flux.get(flux)
+            if courant is None:
+                return
+            self._flux_occupes.add(flux)
+        valide = False
+        try:
+            courant[1].reset()
+            valide = True
+        finally:
+            self._rendre_flux(flux, valide)
+
+    def close(self):
+        """
+        Fermer toutes les sessions inactives. Les sessions encore empruntées sont fermées
+        à leur restitution ; tout nouvel emprunt lève une RuntimeError.
+        """
+        with self._condition:
+            self._ferme = True
+            a_fermer = [s for libres in self._libres.values() for s in libres]
+            for complexite, libres in self._libres.items():
+                self._nb_creees[complexite] -= len(libres)
+                libres.clear()
+            for flux in [f for f in self._flux if f not in self._flux_occupes]:
+                a_fermer.append(self._flux.pop(flux)[1])
+            self._condition.notify_all()
+        for session in a_fermer:
+            session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
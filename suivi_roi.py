@@ -0,0 +1,114 @@
+import numpy as np            # Importation de NumPy pour les boîtes englobantes et le recalage des landmarks
+
+# SUIVI DE LA RÉGION D'INTÉRÊT ------------------------------------------------------------------------------------------------
+
+class SuiviROI:
+    """
+    Région d'intérêt (ROI) autour de l'opérateur, construite à partir des landmarks de l'image précédente.
+
+    L'opérateur reste à peu près au même endroit devant un poste fixe : le prétraitement et l'inférence
+    peuvent ne porter que sur une boîte englobante élargie de `marge` (fraction de sa taille).
+    La ROI n'est recalculée que lorsque la personne s'approche de ses bords, de sorte que le recadrage
+    reste stable d'une image à l'autre et ne perturbe pas le suivi MediaPipe.
+    L'image entière est de nouveau analysée si la personne est perdue, et au moins toutes les
+    `intervalle_redetection` images.
+    """
+
+    def __init__(self, marge=0.25, taille_min=0.25, intervalle_redetection=50, seuil_visibilite=0.5, bord=0.1):
+        self.marge = marge                                    # Élargissement de la boîte englobante
+        self.taille_min = taille_min                          # Taille minimale de la ROI (fraction de l'image)
+        self.intervalle_redetection = intervalle_redetection  # Analyse pleine image au moins toutes les N images
+        self.seuil_visibilite = seuil_visibilite              # Landmarks moins visibles ignorés pour la boîte
+        self.bord = bord                                      # Zone de bord (fraction de la ROI) qui déclenche son recalcul
+        self.roi_normalisee = None                            # (x0, y0, x1, y1) en coordonnées normalisées
+        self._images_depuis_plein_cadre = 0
+        self.nb_images = 0
+        self.nb_plein_cadre = 0
+        self.pixels_traites = 0
+        self.pixels_total = 0
+
+    def roi(self, largeur, hauteur):
+        """
+        ROI à utiliser pour la prochaine image, en pixels (x0, y0, x1, y1), ou None pour l'image entière.
+        """
+        self.nb_images += 1
+        self.pixels_total += largeur * hauteur
+        if self.roi_normalisee is None or self._images_depuis_plein_cadre >= self.intervalle_redetection:
+            self._images_depuis_plein_cadre = 0
+            self.nb_plein_cadre += 1
+            self.pixels_traites += largeur * hauteur
+            return None
+        self._images_depuis_plein_cadre += 1
+        x0, y0, x1, y1 = self.roi_normalisee
+        roi = (int(x0 * largeur), int(y0 * hauteur), int(np.ceil(x1 * largeur)), int(np.ceil(y1 * hauteur)))
+        self.pixels_traites += (roi[2] - roi[0]) * (roi[3] - roi[1])
+        return roi
+
+    def recadrer(self, image):
+        """
+        Retourner (vue recadrée, roi) pour l'image courante ; la vue ne copie pas les pixels.
+        """
+        hauteur, largeur = image.shape[:2]
+        roi = self.roi(largeur, hauteur)
+        if roi is None:
+            return image, None
+        x0, y0, x1, y1 = roi
+        return image[y0:y1, x0:x1], roi
+
+    @staticmethod
+    def remapper(landmarks, roi, largeur, hauteur):
+        """
+        Ramener des landmarks normalisés dans la ROI (tableau (..., 2|3|4)) en coordonnées
+        normalisées de l'image entière. z suit l'échelle de x, comme dans MediaPipe.
+        """
+        landmarks = np.array(landmarks, dtype=np.float32)
+        if roi is None:
+            return landmarks
+        x0, y0, x1, y1 = roi
+        echelle_x, echelle_y = (x1 - x0) / largeur, (y1 - y0) / hauteur
+        landmarks[..., 0] = landmarks[..., 0] * echelle_x + x0 / largeur
+        landmarks[..., 1] = landmarks[..., 1] * echelle_y + y0 / hauteur
+        if landmarks.shape[-1] >= 3:
+            landmarks[..., 2] *= echelle_x
+        return landmarks
+
+    def maj(self, landmarks):
+        """
+        Mettre à jour la ROI avec les landmarks de l'image courante, en coordonnées normalisées
+        de l'image entière (tableau (33, 2|3|4)), ou None si personne n'a été détecté.
+        """
+        if landmarks is None:
+            self.roi_normalisee = None  # Personne perdue : analyse de l'image entière à la prochaine image
+            return
+        landmarks = np.asarray(landmarks)
+        visibles = landmarks[landmarks[:, 3] >= self.seuil_visibilite] if landmarks.shape[1] >= 4 else landmarks
+        if len(visibles) < 2:
+            self.roi_normalisee = None
+            return
+        x_min, y_min = np.clip(visibles[:, :2].min(axis=0), 0.0, 1.0)
+        x_max, y_max = np.clip(visibles[:, :2].max(axis=0), 0.0, 1.0)
+
+        if self.roi_normalisee is not None:
+            # ROI conservée tant que la personne reste à distance de ses bords
+            x0, y0, x1, y1 = self.roi_normalisee
+            bord_x, bord_y = self.bord * (x1 - x0), self.bord * (y1 - y0)
+            if (x_min >= x0 + bord_x or x0 <= 0.0) and (x_max <= x1 - bord_x or x1 >= 1.0) and \
+               (y_min >= y0 + bord_y or y0 <= 0.0) and (y_max <= y1 - bord_y or y1 >= 1.0):
+                return
+
+        # Nouvelle ROI : boîte englobante élargie, de taille minimale taille_min, bornée à l'image
+        demi_largeur = max((x_max - x_min) * (1 + 2 * self.marge), self.taille_min) / 2
+        demi_hauteur = max((y_max - y_min) * (1 + 2 * self.marge), self.taille_min) / 2
+        cx, cy = (x_min + x_max) / 2, (y_min + y_max) / 2
+        self.roi_normalisee = (max(0.0, cx - demi_largeur), max(0.0, cy - demi_hauteur),
+                               min(1.0, cx + demi_largeur), min(1.0, cy + demi_hauteur))
+
+    def statistiques(self):
+        """
+        Nombre d'images, part analysée en pleine image et part des pixels effectivement traités.
+        """
+        return {
+            'images': self.nb_images,
+            'plein_cadre': self.nb_plein_cadre,
+            'fraction_pixels': self.pixels_traites / self.pixels_total if self.pixels_total else 1.0,
+        }
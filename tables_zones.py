@@ -0,0 +1,159 @@
+import logging                # Pour signaler les anomalies détectées dans les seuils
+import numpy as np            # Importation de NumPy pour la classification vectorisée
+
+# CONSTANTES ------------------------------------------------------------------------------------------------------------------
+
+ECART_COLONNES = 1.0e6        # Décalage entre colonnes dans une table multi-colonnes (valeurs bornées à ±ECART/2)
+
+# TABLE DE ZONES COMPILÉE -----------------------------------------------------------------------------------------------------
+
+class TableZones:
+    """
+    Table de classification compilée : bornes triées et code de zone de chaque point et de chaque intervalle.
+    Une valeur v est classée en une seule recherche dichotomique (np.searchsorted) :
+    égale à une borne, elle prend le code de ce point ; sinon celui de l'intervalle ouvert qui la contient.
+    Les valeurs NaN sont classées 0 (non classé).
+    """
+
+    def __init__(self, bornes, codes_points, codes_intervalles, nom="", anomalies=()):
+        self.bornes = np.asarray(bornes, dtype=np.float64)                   # n bornes finies triées
+        self.codes_points = np.asarray(codes_points, dtype=np.uint8)         # n codes (v == borne)
+        self.codes_intervalles = np.asarray(codes_intervalles, dtype=np.uint8)  # n + 1 codes (entre les bornes)
+        self.nom = nom
+        self.anomalies = list(anomalies)
+
+    def classer(self, valeurs):
+        """
+        Classer un tableau de valeurs de forme quelconque. Retourne un tableau uint8 de même forme.
+        """
+        valeurs = np.asarray(valeurs, dtype=np.float64)
+        index = np.searchsorted(self.bornes, valeurs, side='left')
+        index_point = np.minimum(index, len(self.bornes) - 1)
+        sur_borne = self.bornes[index_point] == valeurs
+        codes = np.where(sur_borne, self.codes_points[index_point], self.codes_intervalles[index])
+        codes[np.isnan(valeurs)] = 0
+        return codes.astype(np.uint8)
+
+    def __repr__(self):
+        return f"TableZones({self.nom!r}, bornes={self.bornes.tolist()})"
+
+class TableColonnes:
+    """
+    Classification d'une matrice (images, colonnes) où chaque colonne a sa propre TableZones.
+    Les tables des colonnes sont concaténées en une seule table, chaque colonne étant décalée
+    de ECART_COLONNES : la matrice entière est classée en un seul np.searchsorted.
+    """
+
+    def __init__(self, tables):
+        self.tables = list(tables)
+        bornes, codes_points, codes_intervalles = [], [], []
+        for j, table in enumerate(self.tables):
+            decalage = j * ECART_COLONNES
+            # Borne sentinelle en fin de colonne : sépare l'intervalle final de cette colonne
+            # de l'intervalle initial de la suivante ; aucune valeur bornée ne peut l'atteindre
+            bornes.extend(table.bornes + decalage)
+            bornes.append(decalage + ECART_COLONNES / 2)
+            codes_points.extend(table.codes_points)
+            codes_points.append(0)
+            codes_intervalles.extend(table.codes_intervalles)
+        self._table = TableZones(bornes, codes_points, codes_intervalles + [0], nom="colonnes")
+        self._decalages = np.arange(len(self.tables)) * ECART_COLONNES
+        self._limite = ECART_COLONNES / 2 - 1
+
+    def classer(self, matrice):
+        """
+        Classer une matrice (..., colonnes). Retourne une matrice uint8 de même forme.
+        """
+        matrice = np.asarray(matrice, dtype=np.float64)
+        return self._table.classer(np.clip(matrice, -self._limite, self._limite) + self._decalages)
+
+# COMPILATION -----------------------------------------------------------------------------------------------------------------
+
+def _code_reference(valeur, zones):
+    """
+    Classification de référence (scalaire) : code de la première zone dont une plage contient la valeur.
+    """
+    for code, plages in zones:
+        if any(lower <= valeur <= upper for (lower, upper) in plages):
+            return code
+    return 0
+
+def compiler_zones(zones, nom="", strict=False):
+    """
+    Compiler une liste ordonnée de zones [(code, [(min, max), ...]), ...] en TableZones.
+    Les plages sont fermées et la première zone qui contient une valeur l'emporte,
+    comme dans classify_angle(). La table est validée : plages dégénérées ou inversées,
+    recouvrements entre zones différentes et trous entre la plus petite et la plus grande borne.
+    Les anomalies sont journalisées (ou lèvent une ValueError si `strict`).
+    """
+    anomalies = []
+    toutes_plages = [(code, lower, upper) for code, plages in zones for (lower, upper) in plages]
+    for code, lower, upper in toutes_plages:
+        if lower >= upper:
+            anomalies.append(f"zone {code}: plage ({lower}, {upper}) vide ou inversée")
+    for a, (code_a, lower_a, upper_a) in enumerate(toutes_plages):
+        for code_b, lower_b, upper_b in toutes_plages[a + 1:]:
+            if code_a != code_b and max(lower_a, lower_b) < min(upper_a, upper_b):
+                anomalies.append(f"zones {code_a} et {code_b}: recouvrement entre "
+                                 f"({lower_a}, {upper_a}) et ({lower_b}, {upper_b})")
+
+    bornes = sorted({v for _, lower, upper in toutes_plages for v in (lower, upper) if np.isfinite(v)})
+    codes_points = [_code_reference(b, zones) for b in bornes]
+    # Un représentant par intervalle ouvert : sous la première borne, entre deux bornes, au-dessus de la dernière
+    representants = ([bornes[0] - 1.0] if bornes else [0.0]) + \
+                    [(b1 + b2) / 2 for b1, b2 in zip(bornes, bornes[1:])] + \
+                    ([bornes[-1] + 1.0] if bornes else [])
+    codes_intervalles = [_code_reference(v, zones) for v in representants]
+
+    minimum = min((lower for _, lower, _ in toutes_plages), default=0.0)
+    maximum = max((upper for _, _, upper in toutes_plages), default=0.0)
+    for v, code in zip(representants, codes_intervalles):
+        if code == 0 and minimum < v < maximum:
+            anomalies.append(f"trou: valeur {v:g} non classée")
+
+    for anomalie in anomalies:
+        message = f"Seuils '{nom}': {anomalie}"
+        if strict:
+            raise ValueError(message)
+        logging.warning(message)
+    return TableZones(bornes, codes_points, codes_intervalles, nom=nom, anomalies=anomalies)
+
+def compiler_seuils_angle(seuils, nom="", strict=False):
+    """
+    Compiler les seuils d'une articulation ({'green': ..., 'orange': [...], 'red': ...}) en TableZones.
+    Codes : 1 vert, 2 orange, 3 rouge, 0 non classé. Comme dans classify_angle(), la zone rouge
+    couvre toute valeur supérieure ou égale à sa borne basse.
+    """
+    zones = [
+        (1, [seuils['green']]),
+        (2, list(seuils['orange'])),
+        (3, [(seuils['red'][0], float('inf'))]),
+    ]
+    table = compiler_zones(zones, nom=nom, strict=strict)
+    if seuils['red'][0] == seuils['red'][1]:
+        message = f"Seuils '{nom}': zone rouge {tuple(seuils['red'])} de largeur nulle (placeholder)"
+        if strict:
+            raise ValueError(message)
+        logging.warning(message)
+        table.anomalies.append(message)
+    return table
+
+def compiler_seuils_pourcentage(seuils, nom="", strict=False):
+    """
+    Compiler une table de pourcentages ({'reduit': (0, 5), ...}) en TableZones.
+    Les zones sont codées 1, 2, 3... dans l'ordre du dictionnaire (de la plus favorable à la moins favorable).
+    """
+    zones = [(code, [plage]) for code, plage in enumerate(seuils.values(), start=1)]
+    return compiler_zones(zones, nom=nom, strict=strict)
+
+def compiler_seuils_articulations(seuils, articulations, strict=False):
+    """
+    Compiler les seuils de chaque colonne d'une matrice d'angles.
+    `articulations` : séquence de (nom de colonne, clé de `seuils`), comme moteur_angles.ARTICULATIONS.
+    Chaque jeu de seuils n'est compilé (et validé) qu'une fois, même s'il sert à plusieurs colonnes.
+    """
+    tables = {}
+    for _, cle in articulations:
+        if cle not in tables:
+            tables[cle] = compiler_seuils_angle(seuils[cle], nom=cle, strict=strict)
+    return TableColonnes(tables[cle] for _, cle in articulations)
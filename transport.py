@@ -0,0 +1,538 @@
+#!/usr/bin/python
+
+# Bibliothèques **************************************************
+import argparse               # Pour la lecture des arguments du concentrateur de test
+import glob                   # Pour le parcours des segments du spool
+import json                   # Format structuré des messages de poste
+import logging                # Pour la gestion avancée des messages de log
+import os                     # Pour les fichiers du spool
+import random                 # Gigue du délai de reconnexion
+import re                     # Découpage des messages hérités non tramés
+import select                 # Détection de la fermeture de la connexion par le concentrateur
+import socket                 # Pour gérer les communications réseau bas niveau
+import socketserver           # Concentrateur de test local
+import struct                 # En-tête de longueur des trames
+import threading              # Thread d'émission et verrous
+import time                   # Délais de reconnexion
+from collections import deque # File d'émission bornée
+from datetime import datetime, timedelta  # Rattachement des messages aux équipes
+from metriques import REGISTRE # Latence d'envoi, file d'émission et reconnexions
+
+# Constantes *****************************************************
+PORT_CONCENTRATEUR = 50000
+EN_TETE = struct.Struct('>I')         # Longueur de la charge utile, entier non signé 32 bits gros-boutiste
+TAILLE_MAX_TRAME = 64 * 1024          # Une trame plus longue est considérée comme un flux corrompu
+CHAMPS_RESULTAT = ['flexion_cou', 'flexion_cou_score', 'presence_personne', 'risk_zone', 'num_actions',
+                   'repetitivite_score', 'maintien_posture_score', 'recuperation_score', 'prehension_score']
+EQUIPES = (('matin', 5), ('apres_midi', 13), ('nuit', 21))  # Nom et heure de début de chaque équipe
+# Version du contenu des messages. 1 (format hérité) : flexion_cou est l'angle épaule-cou-épaule (≈ 180°).
+# 2 (JSON) : flexion_cou est l'angle signé de la tête par rapport à l'axe du tronc (négatif en extension),
+# ou par rapport à la verticale de l'image si les hanches ne sont pas visibles (cou_verticale = 1).
+VERSION_MESSAGE = 2
+ECART_MAX = 10.0  # Écart maximal (s) compté entre deux messages d'un poste (au-delà : coupure)
+
+# Message hérité : <poste>_<app>_<recording>_<camera>_<mdv>_0_<9 champs de résultat>[_]
+# Scores, présence et zone n'ont qu'un chiffre : deux messages collés ("..._1" + "3_yes...") restent séparables
+MOTIF_HERITE = re.compile(rb'(\d+)_(yes|no)_(yes|no)_(yes|no)_(\d+)_0(_-?\d+_\d_\d_\d_\d+_\d_\d_\d_\d)_?')
+
+# Métriques ******************************************************
+latence_envoi = REGISTRE.histogramme('envoi_lot_secondes', "Durée d'écriture d'un lot vers le concentrateur")
+profondeur_file = REGISTRE.jauge('file_emission_profondeur', "Messages en attente d'envoi")
+messages_envoyes = REGISTRE.compteur('messages_envoyes_total', "Messages écrits vers le concentrateur")
+messages_spool = REGISTRE.compteur('messages_spool_total', "Messages mis de côté dans le spool")
+reconnexions = REGISTRE.compteur('connexions_concentrateur_total', "Connexions établies avec le concentrateur")
+
+# Trames *********************************************************
+
+def encoder_trame(message):
+    """
+    Encoder un message (str ou bytes) en trame : longueur sur 4 octets puis charge utile UTF-8.
+    """
+    charge = message.encode() if isinstance(message, str) else message
+    if len(charge) > TAILLE_MAX_TRAME:
+        raise ValueError(f"Message trop long pour une trame ({len(charge)} octets).")
+    return EN_TETE.pack(len(charge)) + charge
+
+class LecteurTrames:
+    """
+    Découpage incrémental d'un flux d'octets en trames : les messages ne peuvent plus être
+    fusionnés ou coupés à la réception, quel que soit le découpage des segments TCP.
+    """
+
+    def __init__(self, taille_max=TAILLE_MAX_TRAME):
+        self.taille_max = taille_max
+        self._tampon = bytearray()
+
+    def alimenter(self, donnees):
+        """
+        Ajouter des octets reçus et retourner la liste des charges utiles complètes (bytes).
+        Lève ValueError si une longueur annoncée dépasse `taille_max`.
+        """
+        self._tampon += donnees
+        trames = []
+        position = 0
+        while len(self._tampon) - position >= EN_TETE.size:
+            (longueur,) = EN_TETE.unpack_from(self._tampon, position)
+            if longueur > self.taille_max:
+                raise ValueError(f"Trame de {longueur} octets annoncée : flux corrompu.")
+            fin = position + EN_TETE.size + longueur
+            if fin > len(self._tampon):
+                break
+            trames.append(bytes(self._tampon[position + EN_TETE.size:fin]))
+            position = fin
+        del self._tampon[:position]
+        return trames
+
+    @property
+    def en_attente(self):
+        return len(self._tampon)
+
+# Messages des postes ********************************************
+
+def decoder_message(charge):
+    """
+    Décoder la charge utile d'un message de poste (bytes), dans l'un des deux formats :
+    - hérité : "<poste>_<app>_<recording>_<camera>_<mdv>_0_<flexion_cou>_<score>_..._<prehension_score>" ;
+    - structuré (JSON) : {"poste": "3", "app": "yes", "recording": "yes", "camera": "yes", "mdv": 12,
+      "t": <epoch>, "version": 2, "cou_verticale": 0, "resultat": {"flexion_cou": 12, ...}}.
+    Retourne un dictionnaire (poste, app, recording, camera, mdv, t, version, cou_verticale, resultat) ;
+    lève ValueError sinon. `version` (voir VERSION_MESSAGE) donne le sens de flexion_cou : 1 pour le format
+    hérité, 2 pour un JSON qui ne la précise pas.
+    """
+    charge = charge.strip()
+    if charge.startswith(b'{'):
+        message = json.loads(charge)
+        resultat = message.get('resultat', {})
+        return {
+            'poste': str(message['poste']),
+            'app': message.get('app', 'yes'),
+            'recording': message.get('recording', 'yes'),
+            'camera': message.get('camera', 'yes'),
+            'mdv': int(message['mdv']),
+            't': float(message['t']) if message.get('t') is not None else None,
+            'version': int(message.get('version', VERSION_MESSAGE)),
+            'cou_verticale': int(message.get('cou_verticale', 0)),
+            'resultat': {champ: int(resultat.get(champ, 0)) for champ in CHAMPS_RESULTAT},
+        }
+    correspondance = MOTIF_HERITE.fullmatch(charge)
+    if correspondance is None:
+        raise ValueError(f"Message non reconnu: {charge[:80]!r}")
+    return message_herite(correspondance)
+
+def encoder_message(poste, app, recording, camera, mdv, t, resultat):
+    """
+    Message structuré (JSON) d'un poste, relu par decoder_message() : contrairement au format hérité,
+    il transporte l'heure `t` (secondes depuis l'epoch) de la capture analysée, la version VERSION_MESSAGE
+    et l'indicateur `cou_verticale` de la référence de flexion_cou.
+    `resultat` : dictionnaire des champs de CHAMPS_RESULTAT (un champ absent vaut 0), et `cou_verticale`.
+    """
+    return json.dumps({
+        'poste': str(poste),
+        'app': app,
+        'recording': recording,
+        'camera': camera,
+        'mdv': int(mdv),
+        't': round(float(t), 3),
+        'version': VERSION_MESSAGE,
+        'cou_verticale': int(resultat.get('cou_verticale', 0)),
+        'resultat': {champ: int(resultat.get(champ, 0)) for champ in CHAMPS_RESULTAT},
+    }, separators=(',', ':'))
+
+def message_herite(correspondance):
+    poste, app, recording, camera, mdv, resultat = correspondance.groups()
+    valeurs = [int(v) for v in resultat[1:].split(b'_')]
+    return {
+        'poste': poste.decode(),
+        'app': app.decode(),
+        'recording': recording.decode(),
+        'camera': camera.decode(),
+        'mdv': int(mdv),
+        't': None,  # Le format hérité ne transporte pas l'heure : heure de réception
+        'version': 1,  # flexion_cou : angle épaule-cou-épaule
+        'cou_verticale': 0,
+        'resultat': dict(zip(CHAMPS_RESULTAT, valeurs)),
+    }
+
+def debut_equipe(t):
+    """
+    Équipe (quart de travail) contenant l'instant t : (nom, instant de début en secondes depuis l'epoch).
+    L'équipe de nuit déborde sur le lendemain : avant la première équipe, c'est celle de la veille.
+    """
+    instant = datetime.fromtimestamp(t)
+    nom, debut = EQUIPES[-1]
+    for candidat, heure in EQUIPES:
+        if instant.hour >= heure:
+            nom, debut = candidat, heure
+    jour = datetime.combine(instant.date(), datetime.min.time())
+    if instant.hour < EQUIPES[0][1]:
+        jour -= timedelta(days=1)  # Avant la première équipe : fin de l'équipe de nuit de la veille
+    return nom, (jour + timedelta(hours=debut)).timestamp()
+
+def equipe(t):
+    """
+    Clé de l'équipe contenant l'instant t : "AAAA-MM-JJ_<nom>", datée du jour où l'équipe a commencé.
+    """
+    nom, debut = debut_equipe(t)
+    return f"{datetime.fromtimestamp(debut).date().isoformat()}_{nom}"
+
+# Spool sur disque ***********************************************
+
+class SpoolDisque:
+    """
+    Stockage borné des trames non envoyées pendant une coupure, dans des segments `spool_NNNNNN.bin`
+    contenant des trames mises bout à bout. Quand la taille totale dépasse `taille_max`, les segments
+    les plus anciens sont supprimés (politique "drop-oldest", comme les tampons du pipeline).
+    Une trame tronquée par un arrêt brutal en fin de segment est ignorée à la relecture.
+    """
+
+    def __init__(self, repertoire, taille_max=20 * 2**20, taille_segment=2**20):
+        self.repertoire = repertoire
+        self.taille_max = taille_max
+        self.taille_segment = taille_segment
+        self.nb_perdues = 0                     # Trames perdues faute de place
+        self._verrou = threading.Lock()
+        os.makedirs(repertoire, exist_ok=True)
+        segments = self._segments()
+        self._numero = int(os.path.basename(segments[-1])[6:12]) + 1 if segments else 0
+
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.repertoire, 'spool_[0-9][0-9][0-9][0-9][0-9][0-9].bin')))
+
+    def _chemin(self, numero):
+        return os.path.join(self.repertoire, f"spool_{numero:06d}.bin")
+
+    def ajouter(self, trames):
+        """
+        Écrire des trames encodées à la suite du segment courant.
+        """
+        if not trames:
+            return
+        with self._verrou:
+            chemin = self._chemin(self._numero)
+            with open(chemin, 'ab') as fichier:
+                fichier.write(b''.join(trames))
+                fichier.flush()
+                os.fsync(fichier.fileno())
+                taille = fichier.tell()
+            if taille >= self.taille_segment:
+                self._numero += 1
+            self._borner()
+
+    def _borner(self):
+        segments = self._segments()
+        tailles = [os.path.getsize(s) for s in segments]
+        total = sum(tailles)
+        while segments and total > self.taille_max:
+            total -= tailles.pop(0)
+            perdu = segments.pop(0)
+            self.nb_perdues += len(lire_segment(perdu))
+            os.remove(perdu)
+            logging.warning(f"Spool plein : segment {os.path.basename(perdu)} supprimé.")
+
+    def premier_segment(self):
+        """
+        Retourner (chemin, trames encodées) du segment le plus ancien, ou None si le spool est vide.
+        Le segment en cours d'écriture est clos pour que de nouvelles trames n'y soient plus ajoutées.
+        """
+        with self._verrou:
+            segments = self._segments()
+            if not segments:
+                return None
+            if segments[0] == self._chemin(self._numero):
+                self._numero += 1
+            return segments[0], [encoder_trame(t) for t in lire_segment(segments[0])]
+
+    def acquitter(self, chemin):
+        """
+        Supprimer un segment dont toutes les trames ont été envoyées.
+        """
+        with self._verrou:
+            if os.path.exists(chemin):
+                os.remove(chemin)
+
+    def __len__(self):
+        with self._verrou:
+            return len(self._segments())
+
+def lire_segment(chemin):
+    """
+    Charges utiles des trames complètes d'un segment de spool.
+    """
+    lecteur = LecteurTrames()
+    with open(chemin, 'rb') as fichier:
+        try:
+            return lecteur.alimenter(fichier.read())
+        except ValueError:
+            logging.error(f"Segment de spool corrompu ignoré: {chemin}")
+            return []
+
+# Client persistant **********************************************
+
+class ClientConcentrateur:
+    """
+    Connexion persistante d'un poste au concentrateur, gérée par un thread d'émission.
+
+    envoyer() ne bloque jamais : le message est placé dans une file bornée. Le thread d'émission envoie
+    la file par lots (tous les messages en attente, au plus `taille_lot`, en un seul sendall) : un lien
+    lent reçoit moins d'écritures plus grosses au lieu d'accumuler du retard message par message.
+    En cas de coupure, les messages sont écrits dans le spool sur disque (si `repertoire_spool` est fourni),
+    la reconnexion est tentée avec un délai exponentiel borné (avec gigue), et le spool est vidé
+    dans l'ordre avant les nouveaux messages. Un lot dont l'envoi échoue est remis au spool :
+    la livraison est "au moins une fois".
+    """
+
+    def __init__(self, hote, port=PORT_CONCENTRATEUR, repertoire_spool=None, taille_spool_max=20 * 2**20,
+                 capacite=1000, taille_lot=50, delai_min=0.5, delai_max=30.0, timeout=5.0):
+        self.hote = hote
+        self.port = port
+        self.capacite = capacite
+        self.taille_lot = taille_lot
+        self.delai_min = delai_min
+        self.delai_max = delai_max
+        self.timeout = timeout
+        self.spool = SpoolDisque(repertoire_spool, taille_spool_max) if repertoire_spool else None
+        self._file = deque()
+        self._condition = threading.Condition()
+        self._arret = threading.Event()
+        self._socket = None
+        self._delai = delai_min
+        self.connecte = False
+        self.nb_envoyes = 0
+        self.nb_lots = 0
+        self.nb_spoolees = 0
+        self.nb_perdus = 0
+        self.nb_connexions = 0
+        self._thread = threading.Thread(target=self._boucle, name="emission", daemon=True)
+        self._thread.start()
+
+    def envoyer(self, message):
+        """
+        Placer un message dans la file d'émission. Si la file est pleine, le plus ancien message
+        est écrit dans le spool (ou perdu en l'absence de spool).
+        """
+        trame = encoder_trame(message)
+        with self._condition:
+            debordement = self._file.popleft() if len(self._file) >= self.capacite else None
+            self._file.append(trame)
+            profondeur_file.fixer(len(self._file))
+            self._condition.notify()
+        if debordement is not None:
+            self._mettre_de_cote([debordement])
+
+    def _mettre_de_cote(self, trames):
+        if self.spool is not None:
+            self.spool.ajouter(trames)
+            self.nb_spoolees += len(trames)
+            messages_spool.inc(len(trames))
+        else:
+            self.nb_perdus += len(trames)
+
+    def _connecter(self):
+        connexion = socket.create_connection((self.hote, self.port), timeout=self.timeout)
+        connexion.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        connexion.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # Les lots sont déjà regroupés
+        self._socket = connexion
+        self.connecte = True
+        self.nb_connexions += 1
+        reconnexions.inc()
+        self._delai = self.delai_min
+        logging.info(f"Connecté au concentrateur {self.hote}:{self.port}.")
+
+    def _deconnecter(self, erreur=None):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+        if self.connecte and erreur is not None:
+            logging.warning(f"Connexion au concentrateur perdue: {erreur}")
+        self._socket = None
+        self.connecte = False
+
+    def _attendre_reconnexion(self):
+        # Délai exponentiel avec gigue, pour que tous les postes ne se reconnectent pas en même temps
+        self._arret.wait(self._delai * random.uniform(0.8, 1.2))
+        self._delai = min(self._delai * 2, self.delai_max)
+
+    def _verifier_connexion(self):
+        """
+        Le concentrateur n'envoie rien : une connexion lisible est une connexion fermée par l'autre côté.
+        Vérifié avant chaque lot, pour ne pas écrire dans une connexion déjà perdue.
+        """
+        lisible, _, _ = select.select([self._socket], [], [], 0)
+        if lisible and not self._socket.recv(4096):
+            raise ConnectionResetError("connexion fermée par le concentrateur")
+
+    def _prendre_lot(self, attente):
+        with self._condition:
+            if not self._file and attente:
+                self._condition.wait(attente)
+            lot = []
+            while self._file and len(lot) < self.taille_lot:
+                lot.append(self._file.popleft())
+            profondeur_file.fixer(len(self._file))
+            return lot
+
+    def _vider_spool(self):
+        while self.spool is not None and not self._arret.is_set():
+            segment = self.spool.premier_segment()
+            if segment is None:
+                return
+            chemin, trames = segment
+            for debut in range(0, len(trames), self.taille_lot):
+                self._socket.sendall(b''.join(trames[debut:debut + self.taille_lot]))
+            self.spool.acquitter(chemin)
+            self.nb_envoyes += len(trames)
+            logging.info(f"Spool: {len(trames)} messages renvoyés ({os.path.basename(chemin)}).")
+
+    def _boucle(self):
+        while not self._arret.is_set():
+            if self._socket is None:
+                try:
+                    self._connecter()
+                except OSError as e:
+                    logging.debug(f"Concentrateur injoignable: {e}")
+                    self._mettre_de_cote(self._prendre_lot(0))
+                    self._attendre_reconnexion()
+                    continue
+            lot = []
+            try:
+                self._vider_spool()
+                lot = self._prendre_lot(0.5)
+                if lot:
+                    self._verifier_connexion()
+                    debut = time.perf_counter()
+                    self._socket.sendall(b''.join(lot))
+                    latence_envoi.observer(time.perf_counter() - debut)
+                    messages_envoyes.inc(len(lot))
+                    self.nb_envoyes += len(lot)
+                    self.nb_lots += 1
+            except OSError as e:
+                self._deconnecter(e)
+                self._mettre_de_cote(lot)
+                self._attendre_reconnexion()
+
+    def fermer(self, timeout=5.0):
+        """
+        Arrêter le thread d'émission après une dernière tentative d'envoi ;
+        les messages restants sont écrits dans le spool.
+        """
+        fin = time.monotonic() + timeout
+        while self.connecte and len(self) and time.monotonic() < fin:
+            time.sleep(0.05)
+        self._arret.set()
+        with self._condition:
+            self._condition.notify_all()
+        self._thread.join(timeout=max(fin - time.monotonic(), 0.1))
+        with self._condition:
+            restants = list(self._file)
+            self._file.clear()
+        self._mettre_de_cote(restants)
+        self._deconnecter()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+    def statistiques(self):
+        return {
+            'connecte': self.connecte,
+            'connexions': self.nb_connexions,
+            'envoyes': self.nb_envoyes,
+            'lots': self.nb_lots,
+            'en_file': len(self),
+            'spoolees': self.nb_spoolees,
+            'segments_spool': len(self.spool) if self.spool is not None else 0,
+            'perdus': self.nb_perdus + (self.spool.nb_perdues if self.spool is not None else 0),
+        }
+
+# Concentrateur de test ******************************************
+
+class ServeurTest:
+    """
+    Concentrateur minimal local pour les essais : accepte des connexions, découpe les trames
+    et conserve les messages reçus (décodés en str) dans `messages`.
+    """
+
+    def __init__(self, hote='127.0.0.1', port=0, afficher=False):
+        self.messages = []
+        self._verrou = threading.Lock()
+        self._connexions = set()
+        serveur = self
+
+        class Gestionnaire(socketserver.BaseRequestHandler):
+            def handle(self):
+                with serveur._verrou:
+                    serveur._connexions.add(self.request)
+                lecteur = LecteurTrames()
+                try:
+                    while True:
+                        donnees = self.request.recv(65536)
+                        if not donnees:
+                            return
+                        for charge in lecteur.alimenter(donnees):
+                            message = charge.decode(errors='replace')
+                            with serveur._verrou:
+                                serveur.messages.append(message)
+                            if afficher:
+                                logging.info(f"Reçu de {self.client_address[0]}: {message}")
+                except (OSError, ValueError) as e:
+                    logging.warning(f"Connexion {self.client_address[0]} interrompue: {e}")
+                finally:
+                    with serveur._verrou:
+                        serveur._connexions.discard(self.request)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._serveur = socketserver.ThreadingTCPServer((hote, port), Gestionnaire)
+        self._serveur.daemon_threads = True
+        self.adresse = self._serveur.server_address
+        self._thread = None
+
+    def demarrer(self):
+        self._thread = threading.Thread(target=self._serveur.serve_forever, name="serveur-test", daemon=True)
+        self._thread.start()
+        return self
+
+    def arreter(self):
+        """
+        Arrêter le serveur et fermer les connexions en cours (comme un redémarrage du concentrateur).
+        """
+        self._serveur.shutdown()
+        self._serveur.server_close()
+        with self._verrou:
+            for connexion in self._connexions:
+                try:
+                    connexion.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self._connexions.clear()
+
+    def __enter__(self):
+        return self.demarrer()
+
+    def __exit__(self, *exc):
+        self.arreter()
+
+# =======================================================================================================================
+#                                             *** PROGRAMME PRINCIPAL ***
+# =======================================================================================================================
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Concentrateur de test : affiche les messages tramés reçus.")
+    parser.add_argument('--hote', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=PORT_CONCENTRATEUR)
+    args = parser.parse_args()
+    with ServeurTest(args.hote, args.port, afficher=True) as serveur:
+        logging.info(f"Concentrateur de test en écoute sur {serveur.adresse[0]}:{serveur.adresse[1]}.")
+        try:
+            while True:
+                time.sleep(1.0)
+        except KeyboardInterrupt:
+            pass